@@ -0,0 +1,13 @@
+-- Per-hub character data (keys, inventory, desc, latest_area, ...), one row
+-- per character and key so that a change only rewrites its own row.
+-- Values are stored as JSON.
+CREATE TABLE IF NOT EXISTS character_data (
+    hub_id INTEGER NOT NULL,
+    char TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (hub_id, char, key)
+);
+
+-- Assign the user version
+PRAGMA user_version = 8;
@@ -0,0 +1,98 @@
+"""
+Benchmark for AO packet encoding and framing.
+
+Compares `ao_codec.build_frame` against the previous path through
+`Client.send_command` (`encode_ao_packet`, then growing the packet string one
+argument at a time and encoding it), and `ao_codec.split_frames` against the
+previous `AOProtocol.get_messages` loop, which re-split the rest of the
+buffer after every packet.
+
+Usage (from the repository root):
+    python scripts/bench_ao_codec.py [rounds]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from server.network import ao_codec  # noqa: E402
+
+OUTBOUND = [
+    ("CT", ("$H", "Welcome to the server! Type /help for a list of commands.", "1")),
+    ("MC", ("Trial/Cornered.opus", 3, "Phoenix", 1, 0, 0)),
+    ("ARUP", (0, 3, 0, 1, 2, 4, 0, 0)),
+    ("MS", ("chat", "-", "Phoenix", "normal", "Hold it! That's 50% wrong & you know it #1",
+            "def", "1", 0, 3, 0, 0, 0, 1, 0, 2, "Nick", -1, "", "", 0, "0&0", 0, 0, 0, 0, 0, "", "", "", 0, "||")),
+    ("LE", (("Knife #1", "50% & sharp", "knife.png"), ("Map", "Of the $ mansion", "map.png"))),
+]
+
+
+def legacy_encode_ao_packet(params):
+    new_params = []
+    for arg in params:
+        if type(arg) is tuple:
+            encoded = []
+            for tup in arg:
+                encoded.append(
+                    str(tup)
+                    .replace("#", "<num>")
+                    .replace("%", "<percent>")
+                    .replace("$", "<dollar>")
+                    .replace("&", "<and>")
+                )
+            new_params.append(tuple(encoded))
+        else:
+            new_params.append(
+                str(arg)
+                .replace("#", "<num>")
+                .replace("%", "<percent>")
+                .replace("$", "<dollar>")
+                .replace("&", "<and>")
+            )
+    return new_params
+
+
+def legacy_frame(command, args):
+    command, *args = legacy_encode_ao_packet([command] + list(args))
+    message = f"{command}#"
+    for arg in args:
+        if type(arg) is tuple:
+            arg = "&".join(arg)
+        message += f"{arg}#"
+    return (message + "%").encode("utf-8")
+
+
+def legacy_messages(buffer):
+    messages = []
+    while "#%" in buffer:
+        spl = buffer.split("#%", 1)
+        buffer = spl[1]
+        messages.append(spl[0])
+    return messages, buffer
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    for header, args in OUTBOUND:
+        assert ao_codec.build_frame(header, args) == legacy_frame(header, args)
+
+    print(f"{len(OUTBOUND)} outbound packets, {rounds} rounds")
+    for name, frame in (("encode_ao_packet + concat", legacy_frame), ("build_frame", ao_codec.build_frame)):
+        elapsed = timeit.timeit(lambda: [frame(header, args) for header, args in OUTBOUND], number=rounds)
+        print(f"{name:>26}: {elapsed / (rounds * len(OUTBOUND)) * 1e6:.2f} us/packet")
+
+    for count in (10, 100, 1000):
+        buffer = "".join(ao_codec.encode_frame(header, args) for header, args in OUTBOUND * (count // 5))
+        buffer += "MS#chat#-#Pho"
+        assert ao_codec.split_frames(buffer) == legacy_messages(buffer)
+        number = max(1, rounds // count)
+        print(f"buffer holding {count} packets, {number} rounds")
+        for name, split in (("get_messages loop", legacy_messages), ("split_frames", ao_codec.split_frames)):
+            elapsed = timeit.timeit(lambda: split(buffer), number=number)
+            print(f"{name:>26}: {elapsed / (number * count) * 1e6:.2f} us/packet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Memory benchmark for idle clients.
+
+Builds a number of idle `ClientManager.Client` objects against a stub server
+(no sockets, no database) and reports how many bytes each one costs, then
+churns the per-IPID spam-delay store with many distinct IPIDs to show that it
+stays bounded.
+
+Usage (from the repository root):
+    python scripts/bench_client_memory.py [client_count] [ipid_count]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from server.client_manager import ClientManager  # noqa: E402
+
+
+class _StubArea:
+    pass
+
+
+class _StubHub:
+    def __init__(self):
+        self.area = _StubArea()
+
+    def default_area(self):
+        return self.area
+
+
+class _StubHubManager:
+    def __init__(self):
+        self.hub = _StubHub()
+
+    def default_hub(self):
+        return self.hub
+
+
+class _StubServer:
+    def __init__(self):
+        floodguard = {"times_per_interval": 5, "interval_length": 5, "mute_length": 30}
+        self.config = {
+            "playerlimit": 100000,
+            "music_change_floodguard": dict(floodguard),
+            "wtce_floodguard": dict(floodguard),
+            "ooc_floodguard": dict(floodguard),
+        }
+        self.hub_manager = _StubHubManager()
+
+
+def bytes_per_client(count):
+    server = _StubServer()
+    clients = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(count):
+        clients.append(ClientManager.Client(server, None, i, i))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    # Don't count the list holding the clients.
+    total -= sys.getsizeof(clients)
+    return total / count
+
+
+def spam_delay_store_size(ipid_count):
+    server = _StubServer()
+    manager = ClientManager(server)
+    now = round(time.time() * 1000.0)
+    for ipid in range(ipid_count):
+        # Every IPID calls a mod once; half of those cooldowns have already expired.
+        expiry = now - 1000 if ipid % 2 else now + 30000
+        manager.set_spam_delay(ipid, "mod_call", expiry)
+    return len(manager.delays)
+
+
+if __name__ == "__main__":
+    client_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    ipid_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    print(f"Idle client: {bytes_per_client(client_count):.0f} bytes/client ({client_count} clients)")
+    print(f"Spam delay store: {spam_delay_store_size(ipid_count)} entries after {ipid_count} distinct IPIDs")
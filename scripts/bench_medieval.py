@@ -0,0 +1,91 @@
+"""
+Benchmark for Medieval Mode (MedievalParser.degrootify).
+
+Runs a message corpus through the parser and reports messages per second,
+next to a reference parser that scans every replacement rule for each word
+the way the parser used to. It also compares how often each word gets each
+replacement under both, to check the output distribution is unchanged.
+
+Usage (from the repository root):
+    python scripts/bench_medieval.py [autorp.json] [iterations]
+"""
+
+import collections
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from server.medieval_parser import MedievalParser  # noqa: E402
+
+CORPUS = [
+    "Hello there, how are you doing today?",
+    "It is what it is, I guess. I will be going to the market.",
+    "Objection! The witness was lying about the knife.",
+    "Hold it! Wait a second, that doesn't make any sense at all.",
+    "My friends and I were looking for the key, but it was gone.",
+    "I shall not let you get away with this, you fool!",
+    "Did you hear that? Something is coming from the kitchen.",
+    "The defendant is guilty, and the evidence proves it beyond doubt.",
+    "Thank you so much, I really appreciate your help with everything.",
+    "Could you please stop talking? We're trying to think here.",
+]
+
+
+class LinearMedievalParser(MedievalParser):
+    """Reference matcher: every rule, every word, case-insensitive list scans."""
+
+    def _replace_word(self, word, prev_word, symbols=False, word_list_only=False):
+        lowered = word.lower()
+        candidates = []
+        for rep in self.word_replacements:
+            if lowered in (w.lower() for w in rep["words"]):
+                candidates.append((rep, 1))
+            elif lowered in (w.lower() for w in rep["plurals"]):
+                candidates.append((rep, 2))
+        index = self.word_index
+        try:
+            self.word_index = {lowered: candidates}
+            return super()._replace_word(word, prev_word, symbols, word_list_only)
+        finally:
+            self.word_index = index
+
+
+def messages_per_second(parser, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for message in CORPUS:
+            parser.degrootify(message)
+    return iterations * len(CORPUS) / (time.perf_counter() - start)
+
+
+def replacement_counts(parser, samples, seed):
+    random.seed(seed)
+    counts = collections.Counter()
+    words = sorted(parser.word_index)
+    for _ in range(samples):
+        for word in words:
+            counts[(word, parser._replace_word(word, "it")[0])] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "config_sample/text/autorp.json"
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    indexed = MedievalParser(path)
+    linear = LinearMedievalParser(path)
+    if not indexed.datafile_valid:
+        sys.exit(f"Could not load {path}")
+
+    fast = messages_per_second(indexed, iterations)
+    slow = messages_per_second(linear, iterations)
+    print(f"Indexed: {fast:,.0f} messages/s")
+    print(f"Linear:  {slow:,.0f} messages/s ({fast / slow:.1f}x)")
+
+    samples = 500
+    a = replacement_counts(indexed, samples, 1)
+    b = replacement_counts(linear, samples, 2)
+    worst = max(abs(a[key] - b[key]) / samples for key in set(a) | set(b))
+    print(f"Largest replacement frequency difference: {worst:.3f} over {samples} samples/word")
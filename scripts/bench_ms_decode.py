@@ -0,0 +1,93 @@
+"""
+Benchmark for decoding MS (IC message) packets.
+
+Compares the table-driven `decode_ms` against the previous approach of trying
+`AOProtocol.validate_net_cmd` once per client layout until one matched.
+
+Packets come from a capture made with `packet_trace` (see
+server/packet_trace.py) when one is given: every inbound MS frame in it is
+decoded. Without a trace, one sample packet per client layout is used.
+
+Usage (from the repository root):
+    python scripts/bench_ms_decode.py [trace_file] [rounds]
+"""
+
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from server import packet_trace  # noqa: E402
+from server.network import ic_message  # noqa: E402
+from server.network.aoprotocol import AOProtocol  # noqa: E402
+
+ArgType = AOProtocol.ArgType
+_ARG_TYPES = {
+    ic_message.STR: ArgType.STR,
+    ic_message.STR_OR_EMPTY: ArgType.STR_OR_EMPTY,
+    ic_message.INT: ArgType.INT,
+}
+# The old handler tried the layouts in this same order.
+LEGACY_LAYOUTS = [
+    (tuple(_ARG_TYPES[kind] for _, kind in fields), split_pair)
+    for _, fields, split_pair in ic_message.LAYOUTS
+]
+
+_BASE = ["chat", "-", "Phoenix", "normal", "Objection!", "def", "1", "0", "3", "0", "0", "0", "1", "0", "2"]
+_AO28 = _BASE + ["Nick", "5^1", "10&0", "0", "0", "1", "normal^", "normal^", "normal^", "0", "||"]
+SAMPLES = [
+    _BASE,
+    _BASE + ["Nick", "", "0"],
+    _BASE + ["Nick", "5", "0", "0"],
+    _AO28,
+    _AO28 + ["-1"],
+    _AO28 + ["-1", ""],
+]
+
+
+def legacy_decode(protocol, args):
+    args = list(args)
+    for types, split_pair in LEGACY_LAYOUTS:
+        if protocol.validate_net_cmd(args, *types):
+            if split_pair:
+                pair_args = args[16].split("^")
+                args[16] = int(pair_args[0])
+            return args
+    return None
+
+
+def load_trace(path):
+    packets = []
+    buffers = {}
+    for _, conn, kind, data in packet_trace.read_trace(path):
+        if kind != packet_trace.INBOUND:
+            continue
+        *frames, buffers[conn] = (buffers.get(conn, "") + data).split("#%")
+        packets.extend(frame.split("#")[1:] for frame in frames if frame.startswith("MS#"))
+    return packets
+
+
+def main():
+    packets = load_trace(sys.argv[1]) if len(sys.argv) > 1 else SAMPLES
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    if not packets:
+        print("No MS packets found.")
+        return
+    protocol = AOProtocol.__new__(AOProtocol)
+    protocol.client = SimpleNamespace(char_id=0, is_mod=False, area=SimpleNamespace(owners=set()))
+
+    decoded = sum(1 for args in packets if ic_message.decode_ms(args) is not None)
+    print(f"{len(packets)} packets, {decoded} decodable, {rounds} rounds")
+    for name, decode in (
+        ("validate_net_cmd chain", lambda args: legacy_decode(protocol, args)),
+        ("decode_ms", ic_message.decode_ms),
+    ):
+        elapsed = timeit.timeit(lambda: [decode(args) for args in packets], number=rounds)
+        per_packet = elapsed / (rounds * len(packets)) * 1e6
+        print(f"{name:>24}: {per_packet:.2f} us/packet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Replay a packet trace against a fresh server.
+
+Reads a trace captured with `packet_trace` (see server/packet_trace.py and
+config_sample/config.yaml), starts a `TsuServer3` on a loopback port with a
+throwaway database, and opens one TCP connection per recorded connection.
+Each connection's inbound chunks are sent at their recorded times, divided by
+`--speed` (so 10 replays ten times faster, 0 sends as fast as possible while
+keeping each connection's order). Afterwards it reports:
+
+- throughput: inbound and outbound frames per second of wall time
+- latency: time from each inbound chunk to the first reply bytes on the same
+  connection, for chunks that got a reply before the next one was sent and
+  within `--grace` seconds (later bytes are more likely someone else's
+  broadcast than a reply)
+- a diff of each connection's outbound frames against the recording
+
+Run it from the server directory (the one holding config/), like the server
+itself. Every replayed connection comes from 127.0.0.1, so IPID-based state
+(multiclienting, bans, mod logins tied to an IPID) will not match the capture,
+and frames that embed IPIDs, times or random rolls will show up in the diff.
+
+Usage (from the server directory):
+    python scripts/replay_trace.py logs/packets.trace [--speed 1] [--show 3]
+"""
+
+import argparse
+import asyncio
+import bisect
+import difflib
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from server import database  # noqa: E402
+from server import packet_trace  # noqa: E402
+
+
+class Session:
+    """One recorded connection and what happened to it during the replay."""
+
+    def __init__(self, key, opened):
+        self.key = key
+        self.opened = opened
+        self.closed = None
+        self.inbound = []  # (recorded seconds, data)
+        self.recorded_out = []
+        self.writes = []  # replay timestamps of each inbound chunk
+        self.reads = []  # (replay timestamp, data)
+
+    @property
+    def replayed_out(self):
+        return split_frames("".join(data for _, data in self.reads))
+
+
+def split_frames(data):
+    return [frame + "#%" for frame in data.split("#%") if frame]
+
+
+def load_sessions(path):
+    sessions = {}
+    start = None
+    for seconds, conn, kind, data in packet_trace.read_trace(path):
+        if start is None:
+            start = seconds
+        offset = seconds - start
+        if kind == packet_trace.OPEN:
+            sessions[conn] = Session(conn, offset)
+            continue
+        session = sessions.get(conn)
+        if session is None:
+            continue
+        if kind == packet_trace.INBOUND:
+            session.inbound.append((offset, data))
+        elif kind == packet_trace.OUTBOUND:
+            session.recorded_out.extend(split_frames(data))
+        elif kind == packet_trace.CLOSE:
+            session.closed = offset
+    return list(sessions.values())
+
+
+async def drive(session, port, speed, origin, grace):
+    def wait_until(offset):
+        if speed <= 0:
+            return 0
+        return max(0, origin + offset / speed - time.perf_counter())
+
+    await asyncio.sleep(wait_until(session.opened))
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+    async def read():
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                return
+            session.reads.append((time.perf_counter(), data.decode("utf-8", "ignore")))
+
+    read_task = asyncio.ensure_future(read())
+    for offset, data in session.inbound:
+        await asyncio.sleep(wait_until(offset))
+        session.writes.append(time.perf_counter())
+        writer.write(data.encode("utf-8"))
+        await writer.drain()
+    if session.closed is not None:
+        await asyncio.sleep(wait_until(session.closed))
+    await asyncio.sleep(grace)
+    writer.close()
+    try:
+        await asyncio.wait_for(read_task, grace)
+    except (asyncio.TimeoutError, ConnectionError):
+        read_task.cancel()
+
+
+def latencies(session, window):
+    read_times = [t for t, _ in session.reads]
+    result = []
+    for i, sent in enumerate(session.writes):
+        until = sent + window
+        if i + 1 < len(session.writes):
+            until = min(until, session.writes[i + 1])
+        j = bisect.bisect_left(read_times, sent)
+        if j < len(read_times) and read_times[j] < until:
+            result.append(read_times[j] - sent)
+    return result
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def report(sessions, wall, show, window):
+    inbound = sum(len(split_frames("".join(d for _, d in s.inbound))) for s in sessions)
+    outbound = sum(len(s.replayed_out) for s in sessions)
+    print(f"{len(sessions)} connections replayed in {wall:.2f}s")
+    print(f"throughput: {inbound / wall:.0f} inbound frames/s, {outbound / wall:.0f} outbound frames/s")
+
+    lat = [x * 1000 for s in sessions for x in latencies(s, window)]
+    if lat:
+        print(
+            f"latency over {len(lat)} replies: mean {statistics.mean(lat):.2f}ms, "
+            f"p50 {percentile(lat, 50):.2f}ms, p95 {percentile(lat, 95):.2f}ms, "
+            f"p99 {percentile(lat, 99):.2f}ms, max {max(lat):.2f}ms"
+        )
+
+    recorded_total = sum(len(s.recorded_out) for s in sessions)
+    matched = 0
+    differing = []
+    for s in sessions:
+        matcher = difflib.SequenceMatcher(None, s.recorded_out, s.replayed_out, autojunk=False)
+        same = sum(block.size for block in matcher.get_matching_blocks())
+        matched += same
+        if same != len(s.recorded_out) or same != len(s.replayed_out):
+            differing.append((len(s.recorded_out) + len(s.replayed_out) - 2 * same, s))
+    print(f"outbound frames matching the recording: {matched}/{recorded_total}")
+    print(f"connections with differing output: {len(differing)}/{len(sessions)}")
+    differing.sort(key=lambda item: item[0], reverse=True)
+    for _, s in differing[:show]:
+        print(f"\n--- connection {s.key[1]} (recorded) / +++ replayed")
+        diff = difflib.unified_diff(s.recorded_out, s.replayed_out, lineterm="", n=0)
+        for line in list(diff)[2:42]:
+            print(line[:200])
+
+
+async def replay(sessions, speed, grace):
+    from server.network.aoprotocol import AOProtocol
+    from server.tsuserver import TsuServer3
+
+    server = TsuServer3()
+    # Every replayed connection shares 127.0.0.1
+    server.config["multiclient_limit"] = max(server.config["multiclient_limit"], len(sessions) + 1)
+    # ...so per-IP rate limits would throttle the whole replay
+    server.admission = None
+    loop = asyncio.get_running_loop()
+    listener = await loop.create_server(lambda: AOProtocol(server), "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        origin = time.perf_counter()
+        await asyncio.gather(*(drive(s, port, speed, origin, grace) for s in sessions))
+        return time.perf_counter() - origin
+    finally:
+        listener.close()
+        await listener.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("trace", help="trace file (rotated siblings are read too)")
+    parser.add_argument("--speed", type=float, default=1.0, help="time scale, 0 for as fast as possible")
+    parser.add_argument("--grace", type=float, default=0.5, help="seconds to wait for trailing output and for a reply to count")
+    parser.add_argument("--show", type=int, default=3, help="connections to print a diff for")
+    args = parser.parse_args()
+
+    sessions = load_sessions(args.trace)
+    if not sessions:
+        print("No connections found in the trace.")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "replay.sqlite3")
+        wall = asyncio.run(replay(sessions, args.speed, args.grace))
+    report(sessions, wall, args.show, args.grace)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,13 @@ from server import database
 from server import commands
 from server.evidence import EvidenceList
 from server.exceptions import ClientError, AreaError, ArgumentError, ServerError
-from server.constants import MusicEffect, ReportCardReason, derelative, censor
+from server.constants import MusicEffect, ReportCardReason, censor
 from server.timer import Timer
 from server.script_runner import ScriptRunner, parse_demo_description
 from server.remote_client import RemoteClient
 from server.schema.link_props import LINK_PROPERTY_SCHEMA
 
+from bisect import insort
 from collections import OrderedDict
 
 import asyncio
@@ -23,12 +24,138 @@ import logging
 logger = logging.getLogger("area")
 
 
+class InviteList(set):
+    """
+    Set of client IDs invited to an area. Every change is mirrored into the
+    client manager's `invitations` index, so a disconnecting client can be
+    dropped from all invite lists without scanning every area.
+    """
+
+    def __init__(self, area):
+        super().__init__()
+        self.area = area
+
+    @property
+    def _index(self):
+        return self.area.server.client_manager.invitations
+
+    def _forget(self, client_id):
+        areas = self._index.get(client_id)
+        if areas is not None:
+            areas.discard(self.area)
+            if not areas:
+                del self._index[client_id]
+
+    def add(self, client_id):
+        super().add(client_id)
+        self._index.setdefault(client_id, set()).add(self.area)
+
+    def discard(self, client_id):
+        if client_id in self:
+            super().discard(client_id)
+            self._forget(client_id)
+
+    def remove(self, client_id):
+        super().remove(client_id)
+        self._forget(client_id)
+
+    def clear(self):
+        for client_id in self:
+            self._forget(client_id)
+        super().clear()
+
+
+def _client_id(client):
+    return client.id
+
+
+class OwnerSet(set):
+    """
+    Set of owners: the CMs of an area or the GMs of a hub. Every change bumps
+    `version`, so the views areas derive from their owners (see `Ownership`)
+    know to rebuild no matter which code path added or removed someone.
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.version = 0
+
+    def touch(self):
+        """Mark derived views stale without changing membership."""
+        self.version += 1
+
+    def add(self, client):
+        super().add(client)
+        self.version += 1
+
+    def discard(self, client):
+        super().discard(client)
+        self.version += 1
+
+    def remove(self, client):
+        super().remove(client)
+        self.version += 1
+
+    def clear(self):
+        super().clear()
+        self.version += 1
+
+    def update(self, *others):
+        super().update(*others)
+        self.version += 1
+
+
+class Ownership:
+    """
+    An area's owners as of one version of its CM and hub GM sets, with what
+    the hot paths derive from them. `Area.ownership` swaps in a new one after
+    either set changes.
+    """
+
+    __slots__ = ("owners", "cms", "_listeners", "_label_names", "_label")
+
+    def __init__(self, hub_owners, cms):
+        # CMs and GMs, for `client in area.owners`
+        self.owners = frozenset(hub_owners | cms)
+        # CMs that are real players, by ID
+        self.cms = tuple(sorted(
+            (c for c in cms if not isinstance(c, RemoteClient)), key=lambda c: c.id
+        ))
+        self._listeners = None
+        self._label_names = ()
+        self._label = ""
+
+    def remote_listeners(self, cmd):
+        """Owners whose `remote_listen` mode passes `cmd` packets on to them."""
+        if self._listeners is None:
+            self._listeners = {
+                "MS": [c for c in self.owners if c.remote_listen in (1, 3)],
+                "CT": [c for c in self.owners if c.remote_listen in (2, 3)],
+                None: [c for c in self.owners if c.remote_listen == 3],
+            }
+        return self._listeners.get(cmd, self._listeners[None])
+
+    def label(self):
+        """The CM list shown in /getareas and ARUP, e.g. `[1] Phoenix, [4] Maya`."""
+        # Shownames change without the owner sets noticing, so check them
+        names = tuple(c.showname for c in self.cms)
+        if names != self._label_names:
+            self._label_names = names
+            self._label = ", ".join(f"[{c.id}] {name}" for c, name in zip(self.cms, names))
+        return self._label
+
+
 class Area:
     """Represents a single instance of an area."""
 
     def __init__(self, area_manager, name):
         self.clients = set()
-        self.invite_list = set()
+        # Indexes over self.clients, kept by index_client/unindex_client:
+        # char_id -> clients, and pos -> clients sorted by id
+        self._clients_by_char = {}
+        self._clients_by_pos = {}
+        self._indexed = {}
+        self.invite_list = InviteList(self)
         self.area_manager = area_manager
         self._name = name
 
@@ -143,7 +270,7 @@ class Area:
         # /end
 
         self.old_muted = False
-        self.old_invite_list = set()
+        self.old_invite_list = InviteList(self)
 
         # original states for resetting the area after all CMs leave in a single area CM hub
         self.o_name = self._name
@@ -175,7 +302,9 @@ class Area:
 
         self.music_list = []
 
-        self._owners = set()
+        self._owners = OwnerSet()
+        self._ownership = None
+        self._ownership_key = None
         self.afkers = []
 
         # Dictionary of dictionaries with further info, examine def link for more info
@@ -258,8 +387,17 @@ class Area:
 
     @property
     def owners(self):
-        """Area's owners. Also appends Game Masters (Hub Managers)."""
-        return self.area_manager.owners | self._owners
+        """Area's owners. Also appends Game Masters (Hub Managers). Don't modify the returned set."""
+        return self.ownership().owners
+
+    def ownership(self):
+        """The area's current `Ownership`, rebuilt only after its CMs or the hub's GMs change."""
+        hub_owners = self.area_manager.owners
+        key = (self._owners.version, getattr(hub_owners, "version", None))
+        if self._ownership is None or key != self._ownership_key or key[1] is None:
+            self._ownership = Ownership(hub_owners, self._owners)
+            self._ownership_key = key
+        return self._ownership
 
     @property
     def background(self):
@@ -347,6 +485,7 @@ class Area:
                 self.area_manager.owners.add(self._script_client)
             else:
                 self._owners.add(self._script_client)
+                self._script_client.owned_areas.add(self)
         elif self._script_client.area is not self:
             # A GM-level executor may have been moved to another area (e.g. by
             # /area_kick). Pull it back to the area that owns it so the demo or
@@ -379,7 +518,7 @@ class Area:
         if "bglock" in area:
             self.bg_lock = area["bglock"]
         if "accessible" in area:
-            self.links.clear()
+            self.clear_links()
             for link in [s for s in str(area["accessible"]).split(" ")]:
                 self.link(link)
 
@@ -549,7 +688,7 @@ class Area:
             self.broadcast_evidence_list()
 
         if "links" in area and len(area["links"]) > 0:
-            self.links.clear()
+            self.clear_links()
             for key, value in area["links"].items():
                 # Only forward the fields the schema declares, so a new link
                 # property is read here automatically and any unknown/legacy
@@ -693,6 +832,7 @@ class Area:
     def new_client(self, client):
         """Add a client to the area."""
         self.clients.add(client)
+        self.index_client(client)
         # Client not fully initialized yet. The rest will be handled when the client is done loading.
         if client.char_id is None:
             return
@@ -786,6 +926,7 @@ class Area:
         self.trigger("leave", client)
         if client in self.clients:
             self.clients.remove(client)
+        self.unindex_client(client)
         if client in self.afkers:
             self.afkers.remove(client)
             self.server.client_manager.toggle_afk(client)
@@ -872,6 +1013,7 @@ class Area:
                 default = list(default)
             link[prop.name] = kwargs.get(prop.name, default)
         self.links[str(target)] = link
+        self.area_manager.index_link(self, target, link)
         return link
 
     def send_seethrough_presence(self, client):
@@ -908,6 +1050,48 @@ class Area:
             del self.links[str(target)]
         except KeyError:
             raise AreaError(f"Link {target} does not exist in Area {self.name}!")
+        self.area_manager.unindex_link(self, target)
+
+    def clear_links(self):
+        """Remove every link going out of this area."""
+        for target in self.links:
+            self.area_manager.unindex_link(self, target)
+        self.links.clear()
+
+    def index_client(self, client):
+        """
+        File `client` under its current char_id and pos. Called whenever a
+        client enters the area or changes either of them.
+        """
+        self.unindex_client(client)
+        char_id, pos = self._indexed[client] = (client.char_id, client.pos)
+        self._clients_by_char.setdefault(char_id, []).append(client)
+        insort(self._clients_by_pos.setdefault(pos, []), client, key=_client_id)
+
+    def unindex_client(self, client):
+        """Drop `client` from the indexes, under whatever keys it was filed."""
+        keys = self._indexed.pop(client, None)
+        if keys is None:
+            return
+        char_id, pos = keys
+        for index, key in ((self._clients_by_char, char_id), (self._clients_by_pos, pos)):
+            clients = index[key]
+            clients.remove(client)
+            if not clients:
+                del index[key]
+
+    def clients_with_char(self, char_id):
+        """Clients in the area playing `char_id`. Don't modify the returned list."""
+        return self._clients_by_char.get(char_id, ())
+
+    def clients_at_pos(self, pos):
+        """Clients in the area at `pos`, sorted by id. Don't modify the returned list."""
+        return self._clients_by_pos.get(pos, ())
+
+    @property
+    def taken_char_ids(self):
+        """Character IDs in use by anyone in the area."""
+        return self._clients_by_char.keys()
 
     def is_char_available(self, char_id):
         """
@@ -915,14 +1099,12 @@ class Area:
         Area Owners occupying a character is ignored as a condition.
         :param char_id: character ID
         """
-        for c in self.clients:
-            if char_id == c.char_id and c not in self.owners:
-                return False
-        return True
+        owners = self.owners
+        return all(c in owners for c in self.clients_with_char(char_id))
 
     def get_rand_avail_char_id(self):
         """Get a random available character ID."""
-        avail_set = set(range(len(self.area_manager.char_list))) - {x.char_id for x in self.clients}
+        avail_set = set(range(len(self.area_manager.char_list))) - self.taken_char_ids
         if len(avail_set) == 0:
             raise AreaError("No available characters.")
         return random.choice(tuple(avail_set))
@@ -939,25 +1121,24 @@ class Area:
         Send an AO-compatible command to all owners of the area
         that are not currently in the area.
         """
-        for c in self.owners:
+        for c in self.ownership().remote_listeners(cmd):
             if c in self.clients:
                 continue
-            if c.remote_listen == 3 or (cmd == "CT" and c.remote_listen == 2) or (cmd == "MS" and c.remote_listen == 1):
-                c.send_command(cmd, *args)
+            c.send_command(cmd, *args)
 
     def send_owner_ic(self, bg, cmd, *args):
         """
         Send an IC message to all owners of the area
         that are not currently in the area, with the specified bg.
         """
-        for c in self.owners:
+        # IC listeners get MS; anything else only goes to those listening to ALL
+        for c in self.ownership().remote_listeners("MS" if cmd == "MS" else None):
             if c in self.clients:
                 continue
-            if c.remote_listen == 3 or (cmd == "MS" and c.remote_listen == 1):
-                # Make sure the correct listen BG displays
-                if c.area.background != bg:
-                    c.send_command("BN", bg, "", "", 0)
-                c.send_command(cmd, *args)
+            # Make sure the correct listen BG displays
+            if c.area.background != bg:
+                c.send_command("BN", bg, "", "", 0)
+            c.send_command(cmd, *args)
 
     def send_timer_set_time(self, timer_id=None, new_time=None, start=False):
         """Broadcast a timer to all clients in this area."""
@@ -969,38 +1150,37 @@ class Area:
         Broadcast an OOC message to all clients in the area.
         :param msg: message
         """
+        hostname = self.server.settings.hostname
         for c in self.clients:
             if c in exclude_list:
                 continue
-            c.send_command("CT", self.server.config["hostname"], msg, "1")
-        self.send_owner_command("CT", f"[{self.id}]" + self.server.config["hostname"], msg, "1")
+            c.send_command("CT", hostname, msg, "1")
+        self.send_owner_command("CT", f"[{self.id}]" + hostname, msg, "1")
         if relay_seethrough:
             # Clients in areas with a see-through link to this area watch its
             # passing (presence) messages without being in it. The area on the
             # other side of the move is skipped: its users just saw the mover
             # leave/arrive, so the relayed message is redundant for them.
-            for area in self.area_manager.areas:
+            for area, _ in self.area_manager.incoming_links(self, "seethrough"):
                 if area is exclude_seethrough_area:
                     continue
-                link = area.links.get(str(self.id))
-                if link is not None and link.get("seethrough", False):
-                    for c in area.clients:
-                        if c in exclude_list:
-                            continue
-                        # already remote listening, prevents spam
-                        if c in area.owners and (c.remote_listen == 3 or c.remote_listen == 2):
-                            continue
-                        c.send_command("CT", f"[{self.id}] {self.name}:", msg, "1")
+                for c in area.clients:
+                    if c in exclude_list:
+                        continue
+                    # already remote listening, prevents spam
+                    if c in area.owners and (c.remote_listen == 3 or c.remote_listen == 2):
+                        continue
+                    c.send_command("CT", f"[{self.id}] {self.name}:", msg, "1")
         # Discord Bridgebot
+        bridgebot = self.server.settings.bridgebot
         if (
-            "bridgebot" in self.server.config
-            and self.server.config["bridgebot"]["enabled"]
+            bridgebot is not None
+            and bridgebot.ooc_system
             and self.server.bridgebot
             and self.area_manager.id == self.server.bridgebot.hub_id
             and self.id == self.server.bridgebot.area_id
         ):
-            if "ooc_system" in self.server.config["bridgebot"] and self.server.config["bridgebot"]["ooc_system"]:
-                self.server.bridgebot.queue_message(self.server.config["hostname"], msg)
+            self.server.bridgebot.queue_message(hostname, msg)
 
     def broadcast_action(self, client, msg):
         """
@@ -1016,13 +1196,12 @@ class Area:
                 continue
             c.send_command(cmd, self.server.config["hostname"], msg, "1")
 
-        for c in self.owners:
+        for c in self.ownership().remote_listeners("CT"):
             if c in self.clients:
                 continue
             if not c.ooc_actions:
                 continue
-            if c.remote_listen == 3 or c.remote_listen == 2:
-                c.send_command(cmd, f"[{self.id}]" + self.server.config["hostname"], msg, "1")
+            c.send_command(cmd, f"[{self.id}]" + self.server.config["hostname"], msg, "1")
 
     def send_ic(
         self,
@@ -1205,15 +1384,13 @@ class Area:
                             break
                 # If our pair opponent is found
                 if charid_pair != -1:
-                    # Search through clients in area
-                    for target in client.area.clients:
-                        # If we find our target char ID
-                        if target.char_id == charid_pair:
-                            # Set emote, flip and folder properly
-                            other_emote = target.last_sprite
-                            other_flip = target.flip
-                            other_folder = target.claimed_folder
-                            break
+                    # Find whoever plays our target char ID
+                    for target in client.area.clients_with_char(charid_pair):
+                        # Set emote, flip and folder properly
+                        other_emote = target.last_sprite
+                        other_flip = target.flip
+                        other_folder = target.claimed_folder
+                        break
                     # Speaker always goes in front
                     charid_pair = f"{charid_pair}^0"
 
@@ -1246,12 +1423,10 @@ class Area:
             # leave/arrive, so the relayed message is redundant for them.
             if not isinstance(targets, set):
                 targets = set(targets)
-            for area in self.area_manager.areas:
+            for area, _ in self.area_manager.incoming_links(self, "seethrough"):
                 if area is exclude_seethrough_area:
                     continue
-                link = area.links.get(str(self.id))
-                if link is not None and link.get("seethrough", False):
-                    targets.update(area.clients)
+                targets.update(area.clients)
         for c in targets:
             # Blinded clients don't receive IC messages
             if c.blinded:
@@ -1373,11 +1548,11 @@ class Area:
         )
         self.last_ic_message = args
 
+        doorman = self.server.settings.doorman_webhook
         if (
-            "doorman_webhook" in self.server.config
-            and self.server.config["doorman_webhook"]["enabled"]
-            and self.area_manager.id == int(self.server.config["doorman_webhook"]["hub_id"])
-            and self.id == int(self.server.config["doorman_webhook"]["area_id"])
+            doorman is not None
+            and self.area_manager.id == doorman.hub_id
+            and self.id == doorman.area_id
         ):
 
             living_clients = len(self.clients)
@@ -1460,12 +1635,9 @@ class Area:
 
     def set_doorman_call_delay(self):
         """Begin the doorman cooldown."""
-        try:
-            self.doorman_call_time = round(
-                time.time() * 1000.0 + int(self.server.config["doorman_webhook"]["delay"]) * 1000.0
-            )
-        except:
-            self.doorman_call_time = round(time.time() * 1000 + 60000)
+        doorman = self.server.settings.doorman_webhook
+        delay = doorman.delay if doorman is not None else 60
+        self.doorman_call_time = round(time.time() * 1000.0 + delay * 1000.0)
 
     def can_call_doorman(self):
         """Whether or not the area can currently call for a doorman."""
@@ -1601,17 +1773,11 @@ class Area:
         # Our client is narrating or blankposting via slash command
         if client.narrator or client.blankpost:
             return False
-        # Our client is narrating or blankposting via ini editing
-        if anim == "" or derelative(anim) == "misc/blank":
+        # Our client is narrating or blankposting via ini editing (misc/blank
+        # is checked by emote_blocked, which memoizes the rest of the check)
+        if anim == "":
             return False
-        if char.lower() != client.char_name.lower():
-            for char_link in self.server.allowed_iniswaps:
-                # Only allow if both the original character and the
-                # target character are in the allowed INI swap list
-                if client.char_name in char_link and char in char_link:
-                    return False
-            return True
-        return not self.server.char_emotes[char].validate(preanim, anim, sfx)
+        return self.server.emote_blocked(client.char_name, char, preanim, anim)
 
     def clear_music(self):
         self.music_list.clear()
@@ -1999,16 +2165,26 @@ class Area:
         Get the evidence list of the area.
         :param client: requester
         """
-        client.evi_list, evi_list = self.evi_list.create_evi_list(client)
-        # insert another dummy numby to account for the silly inventory/evidence swapper
-        client.evi_list.insert(0, 0)
-        return evi_list
+        client.evi_list, evi_list, _ = self.evi_list.render(client)
+        return list(evi_list)
+
+    def send_evidence_list(self, client):
+        """
+        Send `client` the area evidence list packet for its viewer class,
+        rendered once per evidence version and shared with every client
+        of the same class.
+        """
+        client.evi_list, _, packet = self.evi_list.render(client)
+        client.send_raw_message(packet)
 
     def broadcast_evidence_list(self):
         """
         Broadcast an updated evidence list.
         LE#<name>&<desc>&<img>#<name>
         """
+        # Callers edit `evidences` directly in places, so any broadcast is
+        # treated as a change.
+        self.evi_list.bump()
         for client in self.clients:
             client.update_evidence_list()
 
@@ -2018,25 +2194,21 @@ class Area:
         The script executor may hold CM permission for command checks but must
         not drive CM lifecycle events like area resets or CM listings.
         """
-        return {o for o in self._owners if not isinstance(o, RemoteClient)}
+        return set(self.ownership().cms)
 
     def get_owners(self):
         """
         Get a string of area's owners (CMs).
         :return: message
         """
-        msg = ""
-        for i in self.real_cms():
-            msg += f"[{str(i.id)}] {i.showname}, "
-        if len(msg) > 2:
-            msg = msg[:-2]
-        return msg
+        return self.ownership().label()
 
     def add_owner(self, client):
         """
         Add a CM to the area.
         """
         self._owners.add(client)
+        client.owned_areas.add(self)
 
         # Make sure the client's available areas are updated
         self.broadcast_area_list(client)
@@ -2058,6 +2230,7 @@ class Area:
         Remove a CM from the area.
         """
         self._owners.remove(client)
+        client.owned_areas.discard(self)
         if not dc and len(client.broadcast_list) > 0:
             client.broadcast_list.clear()
             client.send_ooc("Your broadcast list has been cleared.")
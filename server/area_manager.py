@@ -1,11 +1,14 @@
 from server.exceptions import ClientError, AreaError, ArgumentError, ServerError
-from server.area import Area
+from server.area import Area, OwnerSet
 from server.timer import Timer
 from server.remote_client import RemoteClient
 from collections import OrderedDict
-from server.constants import derelative
+from server.constants import derelative, _SYSTEM_IPID
+from server import database
 
 import oyaml as yaml  # ordered yaml
+import asyncio
+import copy
 import os
 import logging
 
@@ -18,7 +21,12 @@ class AreaManager:
     def __init__(self, hub_manager, name):
         self.hub_manager = hub_manager
         self.areas = []
-        self.owners = set()
+        self.owners = OwnerSet()
+        # Reverse link index: str(target_id) -> {source Area: link dict}.
+        # Kept in sync by Area.link/unlink, swap_area and remove_area.
+        self.incoming = {}
+        # Visible user count shown on the hub list, see update_count
+        self.count = 0
 
         # prefs
         self._name = name
@@ -51,6 +59,8 @@ class AreaManager:
         # Save character information for character select screen ID's in the hub data
         # ex. {"1": {"keys": [1, 2, 3, 5], "fatigue": 100.0, "hunger": 34.0}, "2": {"keys": [4, 6, 8]}}
         self.character_data = {}
+        # Whether changes to character_data are written to the database, see restore_character_data
+        self.character_journal = False
 
         # List of characters available for this hub's disposal
         self.char_list_ref = ""
@@ -102,6 +112,17 @@ class AreaManager:
             clients = clients | area.clients
         return clients
 
+    def update_count(self):
+        """Recount the users shown on the hub list for this hub."""
+        count = 0
+        for area in self.areas:
+            if area.hide_clients:
+                continue
+            for c in area.clients:
+                if not c.hidden and c.ipid != _SYSTEM_IPID:
+                    count += 1
+        self.count = count
+
     def abbreviate(self):
         """Abbreviate our name."""
         if self.name.lower().startswith("hub"):
@@ -183,6 +204,7 @@ class AreaManager:
             if "area" in area:
                 self.areas[i].load(area)
                 i += 1
+        self.areas_changed()
 
     def load_characters(self, charlist):
         """Load the character list from a YAML file."""
@@ -318,21 +340,40 @@ class AreaManager:
         except Exception:
             raise AreaError(
                 "Something went wrong while loading the character data!")
+        if self.character_journal:
+            database.replace_character_data(self.id, self.character_data)
 
-    def save_character_data(self, path="config/character_data.yaml"):
+    def save_character_data(self, path="config/character_data.yaml", data=None):
         """
         Save all the character-specific information such as movement delay, keys, etc.
         :param path: filepath to the YAML file.
+        :param data: what to save instead of `character_data`, e.g. a copy taken
+            on the event loop when saving from another thread
 
         """
+        if data is None:
+            data = self.character_data
         try:
             with open(path, "w", encoding="utf-8") as stream:
-                yaml.dump(self.character_data, stream,
+                yaml.dump(data, stream,
                           default_flow_style=False)
         except Exception:
             raise AreaError(
                 f"Hub {self.name} trying to save character data: File path {path} is invalid!")
 
+    def export_character_data(self, path):
+        """
+        `save_character_data` on a worker thread, from a copy of the data taken now.
+        :returns: the Future of the save, or None if there is no running loop and it was saved right away
+        """
+        data = copy.deepcopy(self.character_data)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save_character_data(path, data)
+            return None
+        return loop.run_in_executor(None, self.save_character_data, path, data)
+
     def get_character_data(self, char, key, default_value=None):
         """
         Obtain the character data from the Hub data.
@@ -362,6 +403,41 @@ class AreaManager:
         if char not in self.character_data:
             self.character_data[char] = {}
         self.character_data[char][key] = value
+        if self.character_journal:
+            database.set_character_value(self.id, char, key, value)
+
+    def remove_character_data(self, char, key):
+        """
+        Remove a key from the character data.
+        :param char: The Character Folder or ID
+        :param key: The key to remove
+        :returns: False if the character had no such key
+
+        """
+        if isinstance(char, int) and self.is_valid_char_id(char):
+            char = self.char_list[char]
+        if key not in self.character_data.get(char, {}):
+            return False
+        del self.character_data[char][key]
+        if self.character_journal:
+            database.delete_character_value(self.id, char, key)
+        return True
+
+    def restore_character_data(self):
+        """
+        Start keeping this hub's character data in the database, where every
+        `set_character_data` is written on its own as it happens. Data stored
+        by an earlier run replaces whatever the hub config loaded, so later
+        edits to the YAML file it names only apply through
+        `/load_character_data`; if there is none, the loaded data is stored as
+        the starting point.
+        """
+        stored = database.character_data(self.id)
+        if stored:
+            self.character_data = stored
+        elif self.character_data:
+            database.replace_character_data(self.id, self.character_data)
+        self.character_journal = True
 
     def create_area(self):
         """Create a new area instance and return it."""
@@ -370,6 +446,7 @@ class AreaManager:
             raise AreaError(f"Area limit reached! ({self.max_areas})")
         area = Area(self, f"Area {idx}")
         self.areas.append(area)
+        self.areas_changed()
         return area
 
     def remove_area(self, area):
@@ -395,6 +472,7 @@ class AreaManager:
                 # The automation executor lives and dies with its home area.
                 area.area_manager.owners.discard(client)
                 area._owners.discard(client)
+                client.owned_areas.discard(area)
                 client.leave_area()
                 client.clear()
             else:
@@ -408,7 +486,11 @@ class AreaManager:
                     ar.links[str(int(link) - 1)] = ar.links.pop(link)
                 elif link == str(area.id):
                     del ar.links[link]
+        for client in area._owners:
+            client.owned_areas.discard(area)
         self.areas.remove(area)
+        self.rebuild_link_index()
+        self.areas_changed()
 
     def swap_area(self, area1, area2, fix_links=True):
         """
@@ -449,6 +531,65 @@ class AreaManager:
                 elif b in links:
                     # take link out of b and put it into a
                     area.links[a] = area.links.pop(b)
+            # The incoming links follow their targets too
+            incoming_a = self.incoming.pop(a, None)
+            incoming_b = self.incoming.pop(b, None)
+            if incoming_a:
+                self.incoming[b] = incoming_a
+            if incoming_b:
+                self.incoming[a] = incoming_b
+        self.areas_changed()
+
+    def areas_changed(self):
+        """Tell the GM panel this hub's areas were added, removed, reordered or reloaded."""
+        bridge = getattr(self.server, "gm_panel_bridge", None)
+        if bridge is not None:
+            bridge.on_hub_areas_changed(self)
+
+    def index_link(self, source, target_id, link):
+        """
+        Record that `source` has a link to the area with ID `target_id`.
+        :param source: area instance the link belongs to.
+        :param target_id: target area ID the link points to.
+        :param link: the link dict stored in `source.links`.
+
+        """
+        self.incoming.setdefault(str(target_id), {})[source] = link
+
+    def unindex_link(self, source, target_id):
+        """Forget `source`'s link to the area with ID `target_id`."""
+        target_id = str(target_id)
+        incoming = self.incoming.get(target_id)
+        if incoming is None:
+            return
+        incoming.pop(source, None)
+        if not incoming:
+            del self.incoming[target_id]
+
+    def rebuild_link_index(self):
+        """Rebuild the reverse link index from every area's links."""
+        self.incoming = {}
+        for area in self.areas:
+            for target_id, link in area.links.items():
+                self.index_link(area, target_id, link)
+
+    def incoming_links(self, area, prop=None):
+        """
+        Get the links pointing at an area from other areas in this hub.
+        :param area: target area instance or area ID.
+        :param prop: only return links with this link property set, e.g.
+        "seethrough", "locked", "hidden" or "evidence" (evidence-gated).
+        :returns: list of (source area, link dict) tuples.
+
+        """
+        if not isinstance(area, int):
+            area = area.id
+        incoming = self.incoming.get(str(area))
+        if not incoming:
+            return []
+        if prop is None:
+            return list(incoming.items())
+        return [(source, link) for source, link in incoming.items() if link.get(prop)]
 
     def add_owner(self, client):
         """
@@ -562,9 +703,9 @@ class AreaManager:
 
     def get_area_by_id(self, num):
         """Get an area by ID."""
-        for area in self.areas:
-            if area.id == num:
-                return area
+        # Area IDs are list positions, no need to scan
+        if isinstance(num, int) and 0 <= num < len(self.areas):
+            return self.areas[num]
         raise AreaError("Area not found.")
 
     def get_area_by_abbreviation(self, abbr):
@@ -705,11 +846,13 @@ class AreaManager:
             cms_list = [2, "Double-Click for Hubs"]
         if clients is None:
             clients = self.clients
+        # Each area's label is rendered once, not once per client
+        labels = {}
         for client in clients:
             for area in client.local_area_list:
-                cm = ""
-                if area.get_owners():
-                    cm = area.get_owners()
+                cm = labels.get(area)
+                if cm is None:
+                    cm = labels[area] = area.get_owners()
                 cms_list.append(cm)
             self.server.send_arup(client, cms_list)
 
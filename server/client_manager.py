@@ -4,13 +4,16 @@ import time
 import math
 import os
 import arrow
-from heapq import heappop, heappush
+from collections import OrderedDict
+from heapq import heapify, heappop, heappush
 
 
 from server import database
-from server.constants import TargetType, encode_ao_packet, contains_URL, derelative
+from server.constants import TargetType, contains_URL, derelative
 from server.exceptions import ClientError, AreaError, ServerError
+from server.network.ao_codec import build_frame, unescape
 from server.constants import _SYSTEM_IPID
+from server.pager import OOC_PAGE_CHARS
 
 import oyaml as yaml  # ordered yaml
 import json
@@ -23,8 +26,39 @@ class ClientManager:
         """Represents a single instance of a user.
 
         Clients may only belong to a single area.
+
+        Attributes are kept in slots so that idle connections stay cheap on
+        long-running servers. `__dict__` is still available for the odd
+        attribute stamped on a client from outside (e.g. GM panel bindings).
         """
 
+        __slots__ = (
+            "is_checked", "transport", "hdid", "id", "char_id", "area", "server",
+            "name", "iniswap", "is_mod", "mod_profile_name", "is_dj", "can_wtce", "pos",
+            "evi_list", "disemvowel", "shaken", "charcurse", "muted_global",
+            "muted_adverts", "is_muted", "is_ooc_muted", "pm_mute", "ipid", "version",
+            "software", "first_joined", "joined", "charid_pair", "third_charid",
+            "charid_pair_override", "pair_order", "offset_pair", "last_offset",
+            "last_sprite", "last_pre", "flip", "claimed_folder", "casing_cm",
+            "casing_cases", "casing_def", "casing_pro", "casing_jud", "casing_jur",
+            "casing_steno", "mus_counter", "mus_mute_time", "mus_change_time",
+            "wtce_counter", "wtce_mute_time", "wtce_time", "ooc_counter",
+            "ooc_mute_time", "ooc_time", "gm_save_time", "last_demo_call",
+            "last_move_time", "autogetarea", "pager", "_showname", "blinded", "_hidden",
+            "hidden_in", "sneaking", "listen_pos", "_following", "forced_to_follow",
+            "edit_ambience", "frozen", "editing_minigame_song",
+            "editing_minigame_song_condition", "presenting", "_remote_listen",
+            "narrator", "blankpost", "firstperson", "local_area_list",
+            "local_music_list", "music_ref", "music_list", "replace_music",
+            "broadcast_list", "_viewing_hub_list", "used_showname_command",
+            "ooc_actions", "subtheme", "time_of_day", "char_url",
+            "has_multilayer_audio", "playing_audio", "rainbow", "medieval",
+            "rps_choice", "battle", "available_areas_only", "viewing_inventory",
+            "_listeners", "_monitors_self_intercept", "is_ghost", "ghost_since",
+            "reconnect_grace_timer", "protocol", "owned_areas", "followers",
+            "__dict__", "__weakref__",
+        )
+
         def __init__(self, server, transport, user_id, ipid):
             self.is_checked = False
             self.transport = transport
@@ -108,7 +142,6 @@ class ClientManager:
                 )
             ]
             # security stuff
-            self.clientscon = 0
             self.gm_save_time = 0
             self.last_demo_call = 0
 
@@ -116,6 +149,8 @@ class ClientManager:
             self.last_move_time = 0
             # If true, /getarea is called automatically when moving into a new area
             self.autogetarea = True
+            # The listing /next and /prev page through (see server/pager.py)
+            self.pager = None
 
             # client status stuff
             self._showname = ""
@@ -124,7 +159,9 @@ class ClientManager:
             self.hidden_in = None
             self.sneaking = False
             self.listen_pos = None
-            self.following = None
+            self._following = None
+            # Clients currently following us
+            self.followers = set()
             self.forced_to_follow = False
             self.edit_ambience = False
             # If we're allowed to move or not
@@ -142,7 +179,7 @@ class ClientManager:
             # 1 = listen to IC
             # 2 = listen to OOC
             # 3 = Listen to ALL
-            self.remote_listen = 2
+            self._remote_listen = 2
 
             # if True, this char's msg will be narrating over current IC visuals without showing a character (AO2.9.1+)
             self.narrator = False
@@ -164,7 +201,7 @@ class ClientManager:
             # list of areas to broadcast the message, music and judge buttons to
             self.broadcast_list = []
             # Whether we're viewing hub list or not in the A/M area list
-            self.viewing_hub_list = False
+            self._viewing_hub_list = False
             # Whether or not the client used the /showname command
             self.used_showname_command = False
             # if we're listening to OOC-broadcast actions
@@ -211,12 +248,26 @@ class ClientManager:
             # `_notify_monitors`. Kept on for real clients only.
             self._monitors_self_intercept = True
 
+            # Reconnect grace period state, see mark_ghost
+            self.is_ghost = False
+            self.ghost_since = 0
+            self.reconnect_grace_timer = None
+            self.protocol = None
+
+            # Areas we're a CM of, so disconnecting doesn't have to look for them
+            self.owned_areas = set()
+
         def send_raw_message(self, msg):
             """
             Send a raw packet over TCP.
-            :param msg: string to send
+            :param msg: packet as a string, or as bytes already encoded to UTF-8
             """
-            self.transport.write(msg.encode("utf-8"))
+            if isinstance(msg, str):
+                msg = msg.encode("utf-8")
+            packet_trace = getattr(self.server, "packet_trace", None)
+            if packet_trace is not None:
+                packet_trace.outbound(self, msg.decode("utf-8"))
+            self.transport.write(msg)
 
         def add_listener(self, callback):
             """Register a callback for OOC/IC monitor events: callback(entry_dict)."""
@@ -239,7 +290,7 @@ class ClientManager:
                     "area_name": area.name if area else "?",
                     "hub_id": area.area_manager.id if area and area.area_manager else -1,
                     "hub_name": area.area_manager.name if area and area.area_manager else "?",
-                    "name": str(args[0]).replace("<dollar>", "$"),
+                    "name": unescape(str(args[0])),
                     "msg": str(args[1]) if len(args) > 1 else "",
                     "ts": time.time(),
                 }
@@ -248,11 +299,10 @@ class ClientManager:
                 char_name = ""
                 client_id = -1
                 if area:
-                    for c in area.clients:
-                        if c.char_id == cid:
-                            client_id = c.id
-                            char_name = getattr(c, "char_name", "")
-                            break
+                    for c in area.clients_with_char(cid):
+                        client_id = c.id
+                        char_name = getattr(c, "char_name", "")
+                        break
                     if not char_name:
                         try:
                             char_name = area.area_manager.char_list[cid]
@@ -335,14 +385,14 @@ class ClientManager:
                         self_offset_x = 0
                         self_offset_y = 0
                         if len(args) > 19 and args[19]:
-                            offset = str(args[19]).replace('<and>', '&').split('&')
+                            offset = unescape(str(args[19])).split('&')
                             self_offset_x = offset[0]
                             if len(offset) > 1:
                                 self_offset_y = offset[1]
                         offset_pair_x = 0
                         offset_pair_y = 0
                         if len(args) > 20 and args[20]:
-                            offset = str(args[20]).replace('<and>', '&').split('&')
+                            offset = unescape(str(args[20])).split('&')
                             offset_pair_x = offset[0]
                             if len(offset) > 1:
                                 offset_pair_y = offset[1]
@@ -406,15 +456,7 @@ class ClientManager:
                         lst[21] = 1000  # offset_s
                         args = tuple(lst)
                         # Packet modified!
-            command, *args = encode_ao_packet([command] + list(args))
-            message = f"{command}#"
-            for arg in args:
-                # Evidence packet uses tuples to construct its evidence entries
-                if type(arg) is tuple:
-                    # AO2 evidence packet uses & to separate pieces of evidence
-                    arg = "&".join(arg)
-                message += f"{arg}#"
-            self.send_raw_message(message + "%")
+            self.send_raw_message(build_frame(command, args))
 
         def send_ooc(self, msg):
             """
@@ -729,9 +771,8 @@ class ClientManager:
                         force = True
                     if not self.area.is_char_available(char_id):
                         if force:
-                            for client in self.area.clients:
-                                if client.char_id == char_id:
-                                    client.char_select()
+                            for client in list(self.area.clients_with_char(char_id)):
+                                client.char_select()
                         else:
                             raise ClientError("Character not available.")
             # We're trying to spectate out of our own accord and either hub or area does not allow spectating.
@@ -751,6 +792,7 @@ class ClientManager:
                     1) and self.char_id != char_id
             self.char_id = char_id
             self.pos = ""
+            self.area.index_client(self)
             self.send_command("PV", self.id, "CID", self.char_id)
             # Commented out due to potentially causing clientside lag...
             # self.area.send_command('CharsCheck',
@@ -817,22 +859,14 @@ class ClientManager:
             if len(players) <= 1:
                 return 0
 
+            floodguard = self.server.settings.music_change_floodguard
             if self.mus_mute_time:
-                if (
-                    time.time() - self.mus_mute_time
-                    < self.server.config["music_change_floodguard"]["mute_length"]
-                ):
-                    return self.server.config["music_change_floodguard"][
-                        "mute_length"
-                    ] - (time.time() - self.mus_mute_time)
+                if time.time() - self.mus_mute_time < floodguard.mute_length:
+                    return floodguard.mute_length - (time.time() - self.mus_mute_time)
                 else:
                     self.mus_mute_time = 0
-            times_per_interval = self.server.config["music_change_floodguard"][
-                "times_per_interval"
-            ]
-            interval_length = self.server.config["music_change_floodguard"][
-                "interval_length"
-            ]
+            times_per_interval = floodguard.times_per_interval
+            interval_length = floodguard.interval_length
             if (
                 time.time()
                 - self.mus_change_time[
@@ -841,7 +875,7 @@ class ClientManager:
                 < interval_length
             ):
                 self.mus_mute_time = time.time()
-                return self.server.config["music_change_floodguard"]["mute_length"]
+                return floodguard.mute_length
             self.mus_counter = (self.mus_counter + 1) % times_per_interval
             self.mus_change_time[self.mus_counter] = time.time()
             return 0
@@ -857,10 +891,7 @@ class ClientManager:
                 return
 
             # Decode AO packet
-            song = song.replace("<num>", "#") \
-                .replace("<percent>", "%") \
-                .replace("<dollar>", "$") \
-                .replace("<and>", "&")
+            song = unescape(song)
             try:
                 if song == "~stop.mp3" or song.strip() == "" or self.server.get_song_is_category(
                     self.construct_music_list(), song
@@ -883,7 +914,7 @@ class ClientManager:
                 if (contains_URL(song)):
                     checked = False
                     # Only if url music is configured to be allowed
-                    if self.server.config["music_allow_url"] == True:
+                    if self.server.settings.music_allow_url:
                         if len(self.server.music_whitelist) <= 0:
                             checked = True
                         for line in self.server.music_whitelist:
@@ -1027,20 +1058,14 @@ class ClientManager:
             """
             if self.is_mod or self in self.area.owners:
                 return 0
+            floodguard = self.server.settings.wtce_floodguard
             if self.wtce_mute_time:
-                if (
-                    time.time() - self.wtce_mute_time
-                    < self.server.config["wtce_floodguard"]["mute_length"]
-                ):
-                    return self.server.config["wtce_floodguard"]["mute_length"] - (
-                        time.time() - self.wtce_mute_time
-                    )
+                if time.time() - self.wtce_mute_time < floodguard.mute_length:
+                    return floodguard.mute_length - (time.time() - self.wtce_mute_time)
                 else:
                     self.wtce_mute_time = 0
-            times_per_interval = self.server.config["wtce_floodguard"][
-                "times_per_interval"
-            ]
-            interval_length = self.server.config["wtce_floodguard"]["interval_length"]
+            times_per_interval = floodguard.times_per_interval
+            interval_length = floodguard.interval_length
             if (
                 time.time()
                 - self.wtce_time[
@@ -1049,7 +1074,7 @@ class ClientManager:
                 < interval_length
             ):
                 self.wtce_mute_time = time.time()
-                return self.server.config["music_change_floodguard"]["mute_length"]
+                return self.server.settings.music_change_floodguard.mute_length
             self.wtce_counter = (self.wtce_counter + 1) % times_per_interval
             self.wtce_time[self.wtce_counter] = time.time()
             return 0
@@ -1061,20 +1086,14 @@ class ClientManager:
             """
             if self.is_mod or self in self.area.owners:
                 return 0
+            floodguard = self.server.settings.ooc_floodguard
             if self.ooc_mute_time:
-                if (
-                    time.time() - self.ooc_mute_time
-                    < self.server.config["ooc_floodguard"]["mute_length"]
-                ):
-                    return self.server.config["ooc_floodguard"]["mute_length"] - (
-                        time.time() - self.ooc_mute_time
-                    )
+                if time.time() - self.ooc_mute_time < floodguard.mute_length:
+                    return floodguard.mute_length - (time.time() - self.ooc_mute_time)
                 else:
                     self.ooc_mute_time = 0
-            times_per_interval = self.server.config["ooc_floodguard"][
-                "times_per_interval"
-            ]
-            interval_length = self.server.config["ooc_floodguard"]["interval_length"]
+            times_per_interval = floodguard.times_per_interval
+            interval_length = floodguard.interval_length
             if (
                 time.time()
                 - self.ooc_time[
@@ -1083,7 +1102,7 @@ class ClientManager:
                 < interval_length
             ):
                 self.ooc_mute_time = time.time()
-                return self.server.config["music_change_floodguard"]["mute_length"]
+                return self.server.settings.music_change_floodguard.mute_length
             self.ooc_counter = (self.ooc_counter + 1) % times_per_interval
             self.ooc_time[self.ooc_counter] = time.time()
             return 0
@@ -1292,25 +1311,9 @@ class ClientManager:
             if bridge is not None:
                 bridge.on_client_moved(self, old_area, self.area)
 
-            for hub in self.server.hub_manager.hubs:
-                count = 0
-                for c in hub.clients:
-                    if not c.area.hide_clients and not c.hidden:
-                        if c.ipid != _SYSTEM_IPID:
-                            count = count + 1
-                hub.count = count
-            for c in self.server.client_manager.clients:
-                if c.viewing_hub_list:
-                    c.send_command(
-                        "FA",
-                        *[
-                            "🌐 Hubs 🌐\n Double-Click me to see Areas\n  _______",
-                            *[
-                                f"[{hub.id}] {hub.name} (users: {hub.count})"
-                                for hub in self.server.hub_manager.hubs
-                            ],
-                        ],
-                    )
+            # Only the hubs we moved between can have a different user count
+            hubs = {old_area.area_manager, self.area.area_manager}
+            self.server.hub_manager.broadcast_hub_list(hubs)
 
             # Update everyone's available characters list
             # Commented out due to potentially causing clientside lag...
@@ -1508,7 +1511,7 @@ class ClientManager:
             self.set_area(area, target_pos)
             self.last_move_time = round(time.time() * 1000.0)
 
-            for c in self.server.client_manager.clients:
+            for c in list(self.followers):
                 # If target c is following us
                 if c.following == self:
                     if self.area.area_manager != c.area.area_manager:
@@ -1757,24 +1760,23 @@ class ClientManager:
 
         def get_area_list(self, hidden=False, unlinked=False):
             area_list = []
-            for area in self.area.area_manager.areas:
+            links = self.area.links
+            # Area IDs are list positions; enumerate instead of area.id lookups
+            for area_id, area in enumerate(self.area.area_manager.areas):
                 if self.area != area:
                     if not hidden and area.hidden:
                         continue
-                    if len(self.area.links) > 0:
-                        if not (str(area.id) in self.area.links):
+                    if len(links) > 0:
+                        link = links.get(str(area_id))
+                        if link is None:
                             if not unlinked:
                                 continue
-                        if (
-                            not hidden
-                            and self.area.links[str(area.id)]["hidden"] is True
-                        ):
+                        elif not hidden and link["hidden"] is True:
                             continue
-                        if (
+                        elif (
                             not hidden
-                            and len(self.area.links[str(area.id)]["evidence"]) > 0
-                            and self.hidden_in
-                            not in self.area.links[str(area.id)]["evidence"]
+                            and len(link["evidence"]) > 0
+                            and self.hidden_in not in link["evidence"]
                         ):
                             continue
 
@@ -1817,9 +1819,9 @@ class ClientManager:
             status = ""
             if self.area.area_manager.arup_enabled:
                 status = f" [{area.status}]"
-            owner = ""
-            if area.get_owners():
-                owner = f"[CM(s): {area.get_owners()}]"
+            owner = area.get_owners()
+            if owner:
+                owner = f"[CM(s): {owner}]"
             hidden = "📦" if area.hidden else ""
             locked = "🔒" if area.locked else ""
             pathlocked = (
@@ -1945,10 +1947,18 @@ class ClientManager:
         def send_areas_clients(self, mods=False, afk_check=False, show_links=False):
             """
             Send information over OOC about all areas of the client's hub.
-            :param area_id: area ID
             :param mods: if true, limit player list to mods
             :param afk_check: if true, limit player list to afks
             """
+            for page in self.areas_clients_pages(mods, afk_check, show_links):
+                if page:
+                    self.send_ooc(page)
+
+        def areas_clients_pages(self, mods=False, afk_check=False, show_links=False):
+            """
+            Generate `send_areas_clients`' listing as OOC pages, yielding
+            None after every area so a sliced command can pause there.
+            """
             if (
                 not self.is_mod
                 and self not in self.area.area_manager.owners
@@ -1963,6 +1973,9 @@ class ClientManager:
             info = "🗺️ Clients in Areas 🗺️\n"
             cnt = 0
             for i in range(len(self.area.area_manager.areas)):
+                if i >= len(self.area.area_manager.areas):
+                    # Areas were removed while we were paused
+                    break
                 area = self.area.area_manager.areas[i]
                 if afk_check:
                     client_list = area.afkers
@@ -1989,16 +2002,29 @@ class ClientManager:
                 ):
                     cnt += len(client_list)
                     info += f"{area_info}\n"
+                    if len(info) >= OOC_PAGE_CHARS:
+                        yield info
+                        info = ""
+                yield None
             if afk_check:
                 info += f"Current AFK-ers: {cnt}"
             else:
                 info += f"Current online: {cnt}"
-            self.send_ooc(info)
+            yield info
 
         def send_hubs_clients(self, mods=False, afk_check=False, show_links=False):
             """
             Send information over OOC about all hubs.
             """
+            for page in self.hubs_clients_pages(mods, afk_check, show_links):
+                if page:
+                    self.send_ooc(page)
+
+        def hubs_clients_pages(self, mods=False, afk_check=False, show_links=False):
+            """
+            Generate `send_hubs_clients`' listing as OOC pages, yielding
+            None after every area so a sliced command can pause there.
+            """
             if (
                 not self.is_mod
                 and self not in self.area.area_manager.owners
@@ -2022,6 +2048,8 @@ class ClientManager:
                     info += f"\n⛩[{hub.id}]{hub.name}⛩: ❌\n"
                 else:
                     for i in range(len(hub.areas)):
+                        if i >= len(hub.areas):
+                            break
                         area = hub.areas[i]
                         if afk_check:
                             client_list = area.afkers
@@ -2047,6 +2075,7 @@ class ClientManager:
                         if len(client_list) > 0 or len(area.owners) > 0:
                             cnt += len(client_list)
                             hub_info += f"{area_info}\n"
+                        yield None
                 if not hub_info == "" and (
                     hub.can_getareas or self.is_mod or self in hub.owners
                 ):
@@ -2059,11 +2088,14 @@ class ClientManager:
                         info += f"\n⛩[{hub.id}]{hub.name} (users: {hub_count})⛩:\n{hub_info}\n"
                     else:
                         info += f"\n⛩[{hub.id}]{hub.name} (users: {len([c for c in hub.clients if c.ipid != _SYSTEM_IPID])})⛩:\n{hub_info}\n"
+                if len(info) >= OOC_PAGE_CHARS:
+                    yield info
+                    info = ""
             if afk_check:
                 info += f"Current AFK-ers: {cnt}"
             else:
                 info += f"Current online: {cnt}"
-            self.send_ooc(info)
+            yield info
 
         def send_area_info(self, area_id, mods=False, afk_check=False, show_links=False):
             """
@@ -2105,6 +2137,7 @@ class ClientManager:
             selection screen, even if the client has already joined.
             """
             self.char_id = -1
+            self.area.index_client(self)
             self.send_command("CharsCheck", *self.get_available_char_list())
             self.send_command("DONE")
 
@@ -2146,9 +2179,7 @@ class ClientManager:
                     self.charcurse
                 )
             else:
-                avail_char_ids = set(range(len(self.area.area_manager.char_list))) - {
-                    x.char_id for x in self.area.clients
-                }
+                avail_char_ids = set(range(len(self.area.area_manager.char_list))) - self.area.taken_char_ids
             char_list = [-1] * len(self.area.area_manager.char_list)
             for x in avail_char_ids:
                 char_list[x] = 0
@@ -2269,6 +2300,49 @@ class ClientManager:
         def showname(self, value):
             self._showname = value
 
+        @property
+        def remote_listen(self):
+            """What this client hears from areas they own but are not in, see `Area.send_owner_command`."""
+            return self._remote_listen
+
+        @remote_listen.setter
+        def remote_listen(self, value):
+            self._remote_listen = value
+            # Owned areas keep lists of the owners listening in
+            for area in self.owned_areas:
+                area._owners.touch()
+            hub_owners = self.area.area_manager.owners
+            if self in hub_owners:
+                hub_owners.touch()
+
+        @property
+        def following(self):
+            """Get the client we're following, if any."""
+            return self._following
+
+        @following.setter
+        def following(self, value):
+            """Follow a client, keeping both sides' follower sets in sync."""
+            if self._following is not None:
+                self._following.followers.discard(self)
+            self._following = value
+            if value is not None:
+                value.followers.add(self)
+
+        @property
+        def viewing_hub_list(self):
+            """Whether we're viewing hub list or not in the A/M area list."""
+            return self._viewing_hub_list
+
+        @viewing_hub_list.setter
+        def viewing_hub_list(self, value):
+            self._viewing_hub_list = value
+            viewers = self.server.client_manager.hub_list_viewers
+            if value:
+                viewers.add(self)
+            else:
+                viewers.discard(self)
+
         @property
         def move_delay(self):
             """Get the character's movement delay."""
@@ -2466,6 +2540,7 @@ class ClientManager:
                 self.hide(False)
                 self.area.broadcast_area_list(self)
             self.pos = pos
+            self.area.index_client(self)
             self.send_ooc(f"Position set to {pos}.")
             # Send a "Set Position" packet
             self.send_command("SP", self.pos)
@@ -2553,43 +2628,57 @@ class ClientManager:
                 evi_list.insert(0, ("Blinded!", "You are blind!\n\nYou are unable to see any IC messages or edit any evidence at this time.", "BLIND\n🕶️"))
                 self.send_command("LE", *evi_list)
                 return
-            if self.viewing_inventory:
-                for inv_item in self.inventory:
-                    # Add a tuple of the inventory item
-                    evi_list.append((inv_item[0], inv_item[1], inv_item[2]))
-            else:
-                evi_list = self.area.get_evidence_list(self)
-            if self.viewing_inventory:
-                evi_list.insert(0, ("Inventory", "Delete this piece of evidence to swap to 🌐Area Evidence!\n\nYou can 'present' things in your inventory to drop it into the Area Evidence.\n\n⚠️Deleting evidence in your Inventory will permanently get rid of it!", "INV.\n🎒"))
-            else:
-                evi_list.insert(0, ("Area", "Delete this piece of evidence to swap to 🎒Inventory Evidence!\n\nIf you want to take things in the area into your evidence, you need to press 'Delete' for that evidence as well.", "AREA\n🌐"))
+            if not self.viewing_inventory:
+                self.area.send_evidence_list(self)
+                return
+            for inv_item in self.inventory:
+                # Add a tuple of the inventory item
+                evi_list.append((inv_item[0], inv_item[1], inv_item[2]))
+            evi_list.insert(0, ("Inventory", "Delete this piece of evidence to swap to 🌐Area Evidence!\n\nYou can 'present' things in your inventory to drop it into the Area Evidence.\n\n⚠️Deleting evidence in your Inventory will permanently get rid of it!", "INV.\n🎒"))
             self.send_command("LE", *evi_list)
 
     def __init__(self, server):
         self.clients = set()
         self.server = server
         self.cur_id = [i for i in range(self.server.config["playerlimit"])]
-        self.delays = {}
+        # str(ipid) -> {spam_type: cooldown end in ms}, least recently set first
+        self.delays = OrderedDict()
+        # ipid -> number of open connections from it
+        self.connections = {}
+        # Client IDs -> areas whose invite list has them, see Area.invite_list
+        self.invitations = {}
+        # Clients viewing the hub list, see Client.viewing_hub_list
+        self.hub_list_viewers = set()
 
     def set_spam_delay(self, ipid, spam_type, value):
-        if not str(ipid) in self.delays:
-            self.delays[str(ipid)] = {}
-        self.delays[str(ipid)][spam_type] = value
+        key = str(ipid)
+        if key not in self.delays:
+            self.delays[key] = {}
+        else:
+            self.delays.move_to_end(key)
+        self.delays[key][spam_type] = value
+        self.prune_spam_delays()
 
     def get_spam_delay(self, ipid, spam_type):
-        if not str(ipid) in self.delays:
-            return 0
-        if not spam_type in self.delays[str(ipid)]:
-            return 0
-        return self.delays[str(ipid)][spam_type]
+        return self.delays.get(str(ipid), {}).get(spam_type, 0)
+
+    def prune_spam_delays(self):
+        """
+        Drop spam delays that can no longer matter so the store doesn't grow
+        with every IPID ever seen. Expired entries are evicted from the least
+        recently set end, and the store is capped at `spam_delay_limit` IPIDs.
+        """
+        limit = self.server.config.get("spam_delay_limit", 4096)
+        now = time.time() * 1000.0
+        while self.delays:
+            key, delays = next(iter(self.delays.items()))
+            if len(self.delays) <= limit and max(delays.values(), default=0) > now:
+                break
+            del self.delays[key]
 
     def new_client_preauth(self, client):
         maxclients = self.server.config["multiclient_limit"]
-        for c in self.server.client_manager.clients:
-            if c.ipid == client.ipid:
-                if c.clientscon > maxclients:
-                    return False
-        return True
+        return self.connections.get(client.ipid, 0) <= maxclients
 
     def new_client(self, transport):
         """
@@ -2607,10 +2696,23 @@ class ClientManager:
         c = self.Client(self.server, transport, user_id,
                         database.ipid(peername))
         self.clients.add(c)
-        temp_ipid = c.ipid
-        for client in self.server.client_manager.clients:
-            if client.ipid == temp_ipid:
-                client.clientscon += 1
+        self.connections[c.ipid] = self.connections.get(c.ipid, 0) + 1
+        return c
+
+    def restore_client(self, transport, user_id, ipid):
+        """
+        Recreate a client handed over by the previous server process under
+        its old player ID (see server/handoff.py).
+        :param transport: asyncio transport
+        """
+        try:
+            self.cur_id.remove(user_id)
+        except ValueError:
+            raise ClientError(f"Player ID {user_id} is already taken.")
+        heapify(self.cur_id)
+        c = self.Client(self.server, transport, user_id, ipid)
+        self.clients.add(c)
+        self.connections[ipid] = self.connections.get(ipid, 0) + 1
         return c
 
     def remove_client(self, client):
@@ -2620,21 +2722,23 @@ class ClientManager:
         """
         if client in client.area.area_manager.owners:
             client.area.area_manager.owners.remove(client)
-        for hub in self.server.hub_manager.hubs:
-            for a in hub.areas:
-                if client in a._owners:
-                    a.remove_owner(client, dc=True)
-                # This discards the client's ID from any of the area invite lists
-                # as that ID will no longer refer to this specific player.
-                if client.id in a.invite_list:
-                    a.invite_list.discard(client.id)
+        for a in list(client.owned_areas):
+            if client in a._owners:
+                a.remove_owner(client, dc=True)
+        # This discards the client's ID from any of the area invite lists
+        # as that ID will no longer refer to this specific player.
+        for a in self.invitations.pop(client.id, set()):
+            a.invite_list.discard(client.id)
         heappush(self.cur_id, client.id)
-        temp_ipid = client.ipid
-        for c in self.server.client_manager.clients:
-            if c.ipid == temp_ipid:
-                c.clientscon -= 1
-            if c.following == client:
-                c.unfollow()
+        connections = self.connections.get(client.ipid, 0) - 1
+        if connections > 0:
+            self.connections[client.ipid] = connections
+        else:
+            self.connections.pop(client.ipid, None)
+        for c in list(client.followers):
+            c.unfollow()
+        client.following = None
+        self.hub_list_viewers.discard(client)
         self.clients.remove(client)
 
         # TODO: Maybe take into account than sending the "CU" packet can reveal your cover.
@@ -2646,24 +2750,7 @@ class ClientManager:
             clients = (c for c in client.area.clients if c.id != client.id)
             for c in clients:
                 c.remove_user_link(client.char_name)
-        for hub in self.server.hub_manager.hubs:
-            count = 0
-            for c in hub.clients:
-                if not c.area.hide_clients and not c.hidden and c.ipid != _SYSTEM_IPID:
-                    count = count + 1
-            hub.count = count
-        for c in self.server.client_manager.clients:
-            if c.viewing_hub_list:
-                c.send_command(
-                    "FA",
-                    *[
-                        "🌐 Hubs 🌐\n Double-Click me to see Areas\n  _______",
-                        *[
-                            f"[{hub.id}] {hub.name} (users: {hub.count})"
-                            for hub in self.server.hub_manager.hubs
-                        ],
-                    ],
-                )
+        self.server.hub_manager.broadcast_hub_list([client.area.area_manager])
 
     def get_targets(self, client, key, value, local=False, single=False, all_hub=False):
         """
@@ -1,12 +1,19 @@
+import asyncio
 import functools
 import inspect
 import shlex
+import time
 
+from .. import stall_watchdog
 from ..exceptions import ArgumentError
+from ..pager import Pager, listing_key
 
 
 _UNSET = object()
 
+# How long a generator command may hold the event loop before yielding it
+SLICE_BUDGET_MS = 5
+
 
 def tokens_str(text):
     """Shlex-split and rejoin text, unquoting quoted words while keeping
@@ -226,7 +233,7 @@ def _extract_usage(func):
     return ""
 
 
-def command(*args, usage=None):
+def command(*args, usage=None, budget_ms=SLICE_BUDGET_MS, paged=False):
     """Declare the argument spec of an `ooc_cmd_*` function.
 
     The decorated function keeps its `ooc_cmd_<name>` identity and can still
@@ -235,6 +242,11 @@ def command(*args, usage=None):
     arguments and conversion errors raise a standardized `ArgumentError`
     that includes the docstring's `Usage:` line.
 
+    The body may be a generator (see `call`); `budget_ms` is then how long
+    each of its slices may run before the loop gets control back. A generator
+    that yields a listing can set `paged` to have players read it a page at
+    a time with /next and /prev (see server/pager.py).
+
     Use inside `@mod_only(...)`: `@mod_only() @command(...) def ooc_cmd_x(client, ...)`.
     """
     specs = [a if isinstance(a, Arg) else Arg(a) for a in args]
@@ -265,6 +277,8 @@ def command(*args, usage=None):
 
         wrapper.command_spec = tuple(specs)
         wrapper.command_usage = usage_line
+        wrapper.command_budget = budget_ms
+        wrapper.command_paged = paged
         return wrapper
 
     return decorator
@@ -287,14 +301,140 @@ def resolve_command(server, cmd):
     return getattr(me, called_function)
 
 
-def call(client, cmd, arg):
+def _loop_running():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _drive(gen, send, deadline):
+    """
+    Advance a generator command until it finishes or `deadline` passes,
+    sending every string it yields as an OOC page.
+    :returns: True if the command finished
+    """
+    while True:
+        try:
+            page = next(gen)
+        except StopIteration:
+            return True
+        if page:
+            send(page)
+        if time.perf_counter() >= deadline:
+            return False
+
+
+def _continue_sliced(client, label, gen, send, budget):
+    """Run the rest of a generator command one slice per loop iteration."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def step():
+        if future.cancelled():
+            gen.close()
+            return
+        stall_watchdog.enter(label, client)
+        try:
+            finished = _drive(gen, send, time.perf_counter() + budget)
+        except Exception as ex:
+            future.set_exception(ex)
+            return
+        finally:
+            stall_watchdog.leave()
+        if finished:
+            future.set_result(None)
+        else:
+            loop.call_soon(step)
+
+    loop.call_soon(step)
+    return future
+
+
+def _page(client, name, arg, gen):
+    """Send the first page of a paged listing and keep the rest for /next."""
+    key = listing_key(client, name, arg)
+    pager = client.pager
+    if pager is not None and pager.fresh(key):
+        # Same listing moments ago: reuse what it rendered
+        gen.close()
+        page = pager.page(0)
+    else:
+        pager = Pager(key, gen)
+        page = pager.page(0)
+        if client.pager is not None:
+            client.pager.close()
+        client.pager = pager
+    if page:
+        client.send_ooc(page)
+
+
+def _command_ran(client, func):
+    # Paged listings only read
+    if getattr(func, "command_paged", False):
+        return
+    bridge = getattr(client.server, "gm_panel_bridge", None)
+    if bridge is not None:
+        bridge.on_command_run(client)
+
+
+def call(client, cmd, arg, send=None, sliced=True, paged=False):
+    """
+    Run the command `cmd` with the raw argument string `arg` as `client`.
+
+    Most commands run to completion right here. A command whose body is a
+    generator does its work in chunks instead: every string it yields is sent
+    to the client as its own OOC page, a bare `yield` just marks a point where
+    it may be paused. Its first slice runs here, for up to its `budget_ms`; if
+    it isn't done by then, the rest runs one slice per loop iteration so other
+    clients are served in between. An `async def` command is scheduled as a
+    task and reports through `client.send_ooc` like a plain command.
+
+    :param send: where generator pages go (default `client.send_ooc`)
+    :param sliced: if False, generator commands run to completion here
+    :param paged: if True, commands declared with `paged` only render and
+        send their first page; the client reads on with /next
+    :returns: None if the command has finished, otherwise an awaitable that
+        completes with it (errors past the first slice are raised from it)
+    """
     func = resolve_command(client.server, cmd)
     if func is None:
         client.send_ooc(
             f"Invalid command: {cmd}. Use /help to find up-to-date commands."
         )
-        return
-    func(client, arg)
+        return None
+    paged = paged and send is None and getattr(func, "command_paged", False)
+    if send is None:
+        send = client.send_ooc
+    sliced = sliced and _loop_running()
+    budget = getattr(func, "command_budget", SLICE_BUDGET_MS) / 1000
+    done = True
+    stall_watchdog.enter(func.__name__, client)
+    try:
+        result = func(client, arg)
+        if paged and inspect.isgenerator(result):
+            _page(client, func.__name__, arg, result)
+        elif inspect.isgenerator(result):
+            deadline = time.perf_counter() + budget if sliced else float("inf")
+            done = _drive(result, send, deadline)
+        elif inspect.iscoroutine(result):
+            if not _loop_running():
+                asyncio.run(result)
+            else:
+                done = False
+    finally:
+        stall_watchdog.leave()
+        if done:
+            _command_ran(client, func)
+    if done:
+        return None
+    if inspect.iscoroutine(result):
+        pending = asyncio.ensure_future(result)
+    else:
+        pending = _continue_sliced(client, func.__name__, result, send, budget)
+    pending.add_done_callback(lambda _: _command_ran(client, func))
+    return pending
 
 
 def submodules():
@@ -403,7 +543,7 @@ def mod_only(area_owners=False, hub_owners=False):
                 and (not hub_owners or not (client in client.area.area_manager.owners or is_gm))
             ):
                 raise ClientError("You must be authorized to do that.")
-            func(client, arg, *args, **kwargs)
+            return func(client, arg, *args, **kwargs)
 
         return wrapper_mod_only
 
@@ -3,9 +3,10 @@ import shlex
 import arrow
 import pytimeparse
 
-from server import database
+from server import database, handoff
 from server.constants import TargetType
 from server.exceptions import ClientError, ServerError, ArgumentError
+from server.pager import line_pages
 import asyncio
 
 from . import mod_only, list_commands, list_submodules, help, Arg, command
@@ -13,6 +14,8 @@ from . import mod_only, list_commands, list_submodules, help, Arg, command
 __all__ = [
     "ooc_cmd_motd",
     "ooc_cmd_help",
+    "ooc_cmd_next",
+    "ooc_cmd_prev",
     "ooc_cmd_kick",
     "ooc_cmd_ban",
     "ooc_cmd_banhdid",
@@ -45,7 +48,7 @@ def ooc_cmd_motd(client):
     client.send_motd()
 
 
-@command(Arg("topic", rest=True, default="", help="command or category"))
+@command(Arg("topic", rest=True, default="", help="command or category"), paged=True)
 def ooc_cmd_help(client, topic):
     """
     Show help for a command, or show general help.
@@ -70,22 +73,43 @@ def ooc_cmd_help(client, topic):
         )
         msg += "\n"
         msg += list_submodules()
-        client.send_ooc(msg)
     else:
         arg = topic.lower()
         try:
             if arg in client.server.command_aliases:
                 arg = client.server.command_aliases[arg]
-            client.send_ooc(help(f"ooc_cmd_{arg}"))
+            msg = help(f"ooc_cmd_{arg}")
         except AttributeError:
             try:
                 msg = f'Submodule "{arg}" commands:\n\n'
                 msg += list_commands(arg)
-                client.send_ooc(msg)
             except AttributeError:
-                client.send_ooc(
-                    f"No such command or submodule ({arg}) has been found in the help docs."
-                )
+                msg = f"No such command or submodule ({arg}) has been found in the help docs."
+    yield from line_pages(msg.split("\n"))
+
+
+@command()
+def ooc_cmd_next(client):
+    """
+    Show the next page of the last long listing, such as /getareas or /help.
+    Usage: /next
+    """
+    page = client.pager.next() if client.pager is not None else None
+    if page is None:
+        raise ClientError("There is no next page.")
+    client.send_ooc(page)
+
+
+@command()
+def ooc_cmd_prev(client):
+    """
+    Show the previous page of the last long listing.
+    Usage: /prev
+    """
+    page = client.pager.prev() if client.pager is not None else None
+    if page is None:
+        raise ClientError("There is no previous page.")
+    client.send_ooc(page)
 
 
 @mod_only()
@@ -540,17 +564,29 @@ def ooc_cmd_whois(client, query):
 @command(Arg("password", rest=True, default="", help="restart password"))
 def ooc_cmd_restart(client, password):
     """
-    Restart the server (WARNING: The server will be *stopped* unless you set up a restart batch/bash file!)
+    Restart the server (WARNING: The server will be *stopped* unless you set up a restart batch/bash file,
+    or enabled restart_handoff in config.yaml to hand players over to a new server process!)
     Usage: /restart
     """
     if password != client.server.config["restartpass"]:
         raise ArgumentError("no")
     print(f"!!!{client.name} called /restart!!!")
+    if client.server.config.get("restart_handoff", False):
+        return _restart_handoff(client)
     client.server.send_all_cmd_pred(
         "CT", "WARNING", "Restarting the server...")
     asyncio.get_running_loop().stop()
 
 
+async def _restart_handoff(client):
+    server = client.server
+    client.send_ooc("Starting a new server process...")
+    # Kept open until this process exits, which tells the new one the ports are free
+    server.handoff_conn = await handoff.hand_over(server)
+    database.log_misc("restart.handoff", client)
+    asyncio.get_running_loop().stop()
+
+
 @command()
 def ooc_cmd_myid(client):
     """
@@ -1,4 +1,5 @@
 from server.exceptions import ClientError, ArgumentError, AreaError
+from server.pager import line_pages
 from . import mod_only, command, Arg, tokens_str
 
 __all__ = [
@@ -244,7 +245,7 @@ def ooc_cmd_link(client, areas):
     Usage:  /link <id(s)>
     """
     if not areas:
-        ooc_cmd_links(client, "")
+        _send_links(client)
         return
     try:
         links = []
@@ -316,13 +317,22 @@ def ooc_cmd_unlink(client, areas):
         raise
 
 
-@command()
+@command(paged=True)
 def ooc_cmd_links(client):
     """
     Display this area's information about area links.
     Usage:  /links
     """
-    links = ""
+    yield from line_pages(_link_lines(client))
+
+
+def _send_links(client):
+    for page in line_pages(_link_lines(client)):
+        client.send_ooc(page)
+
+
+def _link_lines(client):
+    yield "Current area links are: "
     for key, value in sorted(client.area.links.items(), key=lambda x: int(x[0])):
         hidden = ""
         if value["hidden"] is True:
@@ -356,9 +366,7 @@ def ooc_cmd_links(client):
         target_pos = value["target_pos"]
         if target_pos != "":
             target_pos = f", pos: {target_pos}"
-        links += f"\n!{key}{area_name}{locked}{hidden}{seethrough}{target_pos}"
-
-    client.send_ooc(f"Current area links are: {links}")
+        yield f"!{key}{area_name}{locked}{hidden}{seethrough}{target_pos}"
 
 
 @mod_only(area_owners=True)
@@ -369,7 +377,7 @@ def ooc_cmd_onelink(client, areas):
     Usage:  /onelink <id(s)>
     """
     if not areas:
-        ooc_cmd_links(client, "")
+        _send_links(client)
         return
     try:
         links = []
@@ -322,21 +322,21 @@ def ooc_cmd_getarea(client, area_id):
     client.area.broadcast_player_list_to_target(client)
 
 
-@command()
+@command(paged=True)
 def ooc_cmd_getareas(client):
     """
     Show information about all areas.
     Usage: /getareas
     """
-    client.send_areas_clients()
+    yield from client.areas_clients_pages()
 
-@command()
+@command(paged=True)
 def ooc_cmd_gethubs(client):
     """
     Show information about all hubs.
     Usage: /gethubs
     """
-    client.send_hubs_clients()
+    yield from client.hubs_clients_pages()
 
 @command(Arg("area_id", type=int, default=None, help="area id (blank = current)"))
 def ooc_cmd_getlink(client, area_id):
@@ -356,23 +356,25 @@ def ooc_cmd_getlink(client, area_id):
     client.send_area_info(aid, show_links=True)
 
 
-@command()
+@command(paged=True)
 def ooc_cmd_getlinks(client):
     """
     Show information about all areas.
     Including the client's link.
     Usage: /getlinks
     """
-    client.send_areas_clients(show_links=True)
+    yield from client.areas_clients_pages(show_links=True)
 
-@command(Arg("scope", default="", choices=("", "all"), help="all or blank"))
+@command(Arg("scope", default="", choices=("", "all"), help="all or blank"), paged=True)
 def ooc_cmd_getafk(client, scope):
     """
     Show currently AFK-ing players in the current area or in all areas.
     Usage: /getafk [all]
     """
-    aid = -1 if scope == "all" else client.area.id
-    client.send_area_info(aid, afk_check=True)
+    if scope == "all":
+        yield from client.areas_clients_pages(afk_check=True)
+    else:
+        client.send_area_info(client.area.id, afk_check=True)
 
 
 @mod_only(area_owners=True)
@@ -519,13 +521,15 @@ def ooc_cmd_area_kick(client, target, destination, target_pos):
             )
 
     if len(targets) == 0:
-        client.send_ooc(
-            f"No targets found by search term '{target}'."
-        )
+        yield f"No targets found by search term '{target}'."
         return
 
     try:
         for c in targets:
+            # Mass kicks run in slices; skip anyone who left in the meantime
+            yield
+            if c not in client.server.client_manager.clients:
+                continue
             # We're a puny CM, we can't do this.
             if (
                 not client.is_mod
@@ -559,9 +563,7 @@ def ooc_cmd_area_kick(client, target, destination, target_pos):
                 "area_kick", client, client.area, target=c, message=area.id
             )
             client.area.invite_list.discard(c.id)
-            client.send_ooc(
-                f"Kicked [{c.id}] {c.showname} from [{old_area.id}] {old_area.name} to [{area.id}] {area.name}."
-            )
+            yield f"Kicked [{c.id}] {c.showname} from [{old_area.id}] {old_area.name} to [{area.id}] {area.name}."
     except AreaError:
         raise
     except ClientError:
@@ -5,6 +5,7 @@ import shlex
 
 from server.client_manager import ClientManager
 from server.constants import derelative
+from server import storage_index
 
 from . import mod_only, command, Arg
 from .. import commands
@@ -109,7 +110,7 @@ def ooc_cmd_choose_fighter(client, arg):
     You will receive its stats and its moves.
     Usage: /choose_fighter NameFighter
     """
-    if f"{arg.lower()}.yaml" in os.listdir("storage/battlesystem"):
+    if storage_index.has_file("storage/battlesystem", f"{arg.lower()}.yaml"):
         with open(
             f"storage/battlesystem/{arg.lower()}.yaml", "r", encoding="utf-8"
         ) as c_load:
@@ -161,10 +162,8 @@ def ooc_cmd_create_fighter(client, name, hp, mana, atk, defe, spa, spd, spe):
         )
         return
 
-    fighter_list = os.listdir("storage/battlesystem")
-
     path = derelative(name.lower())
-    if f"{path}.yaml" in fighter_list:
+    if storage_index.has_file("storage/battlesystem", f"{path}.yaml"):
         client.send_ooc("This fighter has already been created.")
         return
 
@@ -279,7 +278,7 @@ def ooc_cmd_modify_stat(client, name, stat, value):
     Usage: /modify_stat FighterName Stat Value
     """
     path = derelative(name.lower())
-    if f"{path}.yaml" not in os.listdir("storage/battlesystem"):
+    if not storage_index.has_file("storage/battlesystem", f"{path}.yaml"):
         client.send_ooc("No fighter has this name!")
         return
 
@@ -308,7 +307,7 @@ def ooc_cmd_delete_fighter(client, arg):
     Allow you to delete a fighter.
     Usage: /delete_move FighterName
     """
-    if f"{arg.lower()}.yaml" in os.listdir("storage/battlesystem"):
+    if storage_index.has_file("storage/battlesystem", f"{arg.lower()}.yaml"):
         os.remove(f"storage/battlesystem/{arg.lower()}.yaml")
         client.send_ooc(f"{arg} has been deleted!")
     else:
@@ -7,6 +7,8 @@ import re
 from server import database
 from server.constants import TargetType, derelative
 from server.exceptions import ClientError, ServerError, ArgumentError, AreaError
+from server.pager import line_pages
+from server import storage_index
 
 from . import mod_only, command, Arg, tokens_str
 
@@ -1003,22 +1005,18 @@ def ooc_cmd_time_of_day(client, arg):
 
 
 @mod_only(hub_owners=True)
-@command()
+@command(paged=True)
 def ooc_cmd_evidence_lists(client):
     """
     Show all evidence lists available on the server.
     Usage: /evidence_lists
     """
-    msg = "Available Evidence Lists:"
-    for F in os.listdir("storage/evidence/"):
-        if F.lower().endswith(".yaml"):
-            msg += "\n- {}".format(F[:-5])
-
-    client.send_ooc(msg)
+    names = storage_index.yaml_names("storage/evidence/")
+    yield from line_pages(["Available Evidence Lists:"] + [f"- {name}" for name in names])
 
 
 def evidence_load(client, name, overlay = False):
-    if f"{name}.yaml" not in os.listdir("storage/evidence"):
+    if not storage_index.has_file("storage/evidence", f"{name}.yaml"):
         client.send_ooc(f"Evidence List {name} not found!")
         return
 
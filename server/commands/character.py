@@ -5,6 +5,8 @@ import random
 from server import database
 from server.constants import TargetType, derelative
 from server.exceptions import ClientError, ServerError, ArgumentError, AreaError
+from server.pager import line_pages
+from server import storage_index
 
 from . import mod_only, command, Arg, tokens_str
 
@@ -439,16 +441,18 @@ def ooc_cmd_uncharcurse(client, id):
         client.send_ooc("No targets found.")
 
 
-@command()
+@command(paged=True)
 def ooc_cmd_charids(client):
     """
     Show character IDs corresponding to each character name.
     Usage: /charids
     """
-    msg = "Here is a list of all available characters on the server:"
-    for c in range(0, len(client.area.area_manager.char_list)):
-        msg += "\n[" + str(c) + "] " + client.area.area_manager.char_list[c]
-    client.send_ooc(msg)
+    def lines():
+        yield "Here is a list of all available characters on the server:"
+        for char_id, name in enumerate(client.area.area_manager.char_list):
+            yield f"[{char_id}] {name}"
+
+    yield from line_pages(lines())
 
 
 @command()
@@ -826,19 +830,22 @@ def ooc_cmd_unlisten_pos(client):
 def ooc_cmd_save_character_data(client, arg):
     """
     Save the move_delay, keys, etc. for characters into a file in the storage/character_data/ folder.
+    Character data is already kept across restarts on its own; this exports a copy.
     Usage: /save_character_data <path>
     """
     if len(arg) < 3:
         client.send_ooc("Filename must be at least 3 symbols long!")
         return
 
-    try:
-        path = "storage/character_data"
-        arg = f"{path}/{derelative(arg)}.yaml"
-        client.area.area_manager.save_character_data(arg)
-        client.send_ooc(f"Saving as {arg} character data...")
-    except AreaError:
-        raise
+    path = "storage/character_data"
+    arg = f"{path}/{derelative(arg)}.yaml"
+    future = client.area.area_manager.export_character_data(arg)
+    client.send_ooc(f"Saving as {arg} character data...")
+    if future is not None:
+        def report(future):
+            if not future.cancelled() and future.exception() is not None:
+                client.send_ooc(str(future.exception()))
+        future.add_done_callback(report)
 
 
 @mod_only(hub_owners=True)
@@ -846,6 +853,7 @@ def ooc_cmd_save_character_data(client, arg):
 def ooc_cmd_load_character_data(client, arg):
     """
     Load the move_delay, keys, etc. for characters from a file in the storage/character_data/ folder.
+    This replaces all of the hub's current character data.
     Usage: /load_character_data <path>
     """
     try:
@@ -908,17 +916,14 @@ def ooc_cmd_set_char_data(client, target, key, value):
     """
     hub = client.area.area_manager
     folder = hub.char_list[_resolve_char_arg(hub, target)]
-    data = hub.character_data.setdefault(folder, {})
     if not value.strip():
-        if key in data:
-            del data[key]
+        if hub.remove_character_data(folder, key):
             client.send_ooc(f"Removed '{folder}.{key}'.")
         else:
             client.send_ooc(f"Character '{folder}' has no data key '{key}'.")
     else:
         hub.set_character_data(folder, key, value)
         client.send_ooc(f"Set '{folder}.{key}' = {value}.")
-    hub.save_character_data()
 
 
 def mod_keys(client, arg, mod=0):
@@ -1306,11 +1311,8 @@ def ooc_cmd_charlists(client):
     Usage: /charlists
     """
     text = "Available charlists:"
-    from os import listdir
-
-    for F in listdir("storage/charlists/"):
-        if F.lower().endswith(".yaml"):
-            text += "\n- {}".format(F[:-5])
+    for name in storage_index.yaml_names("storage/charlists/"):
+        text += "\n- {}".format(name)
 
     client.send_ooc(text)
 
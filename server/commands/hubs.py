@@ -8,6 +8,7 @@ from server.constants import TargetType, derelative
 from server.exceptions import ClientError, ArgumentError, AreaError
 from server.constants import dezalgo
 from server.schema.area_fields import AREA_PREF_CM_ALLOWED
+from server import storage_index
 
 from . import mod_only, command, Arg
 
@@ -122,16 +123,13 @@ def ooc_cmd_save_hub(client, arg):
                 path = "storage/hubs/read_only"
             else:
                 path = "storage/hubs"
-            num_files = len(
-                [f for f in os.listdir(path) if os.path.isfile(
-                    os.path.join(path, f))]
-            )
+            num_files = storage_index.count_files(path)
             if num_files >= 1000:  # yikes
                 raise AreaError(
                     "Server storage full! Please contact the server host to resolve this issue."
                 )
             try:
-                if os.path.isfile(f"storage/hubs/read_only/{name}.yaml"):
+                if storage_index.has_file("storage/hubs/read_only", f"{name}.yaml"):
                     raise ArgumentError(f"Hub {name} already exists and it is read-only!")
                 if os.path.isfile(f"storage/hubs/{name}.yaml") and len(args) > 2 and args[1].lower() == "read_only":
                     try:
@@ -254,23 +252,9 @@ def ooc_cmd_list_hubs(client):
     Show all the available hubs for loading in the storage/hubs/ folder.
     Usage: /list_hubs
     """
-    hubs_editable = []
-    hubs_read_only = []
-    for F in os.listdir("storage/hubs/read_only/"):
-        try:
-            if F.lower().endswith(".yaml"):
-                hubs_read_only.append(F[:-5])
-        except:
-            continue
-
-    for F in os.listdir("storage/hubs/"):
-        try:
-            if F.lower().endswith(".yaml"):
-                hubs_editable.append(F[:-5])
-        except:
-            continue
+    hubs_read_only = storage_index.yaml_names("storage/hubs/read_only/")
+    hubs_editable = storage_index.yaml_names("storage/hubs/")
 
-    hubs_read_only.sort()
     msg = "\n⛩️ Available Read Only Hubs: ⛩️\n"
     for hub in hubs_read_only:
         msg += f"\n🌎 [👀]{hub}"
@@ -842,10 +826,11 @@ def ooc_cmd_unfollow(client, arg):
         except Exception:
             client.following = None
             counter = 0
-            for c in client.area.area_manager.clients:
+            for c in list(client.followers):
                 if (
-                    # Target is following us
+                    # Target is following us from this hub
                     c.following == client
+                    and c.area.area_manager == client.area.area_manager
                     # Target is not mod or area owner, OR we are a mod/hub owner giving us ability to stop them from following
                     and ((not c.is_mod and c not in c.area.area_manager.owners) or allowed)
                     # Target is in the same area as us, OR we are a mod/hub owner
@@ -6,6 +6,7 @@ import yaml
 from server import database
 from server.constants import TargetType, derelative, contains_URL
 from server.exceptions import ClientError, ServerError, ArgumentError, AreaError
+from server import storage_index
 
 from . import mod_only, command, Arg
 
@@ -239,23 +240,9 @@ def ooc_cmd_musiclists(client):
     Usage: /musiclists
     """
 
-    musiclist_editable = []
-    musiclist_read_only = []
-    for F in os.listdir("storage/musiclists/read_only/"):
-        try:
-            if F.lower().endswith(".yaml"):
-                musiclist_read_only.append(F[:-5])
-        except:
-            continue
-
-    for F in os.listdir("storage/musiclists/"):
-        try:
-            if F.lower().endswith(".yaml"):
-                musiclist_editable.append(F[:-5])
-        except:
-            continue
+    musiclist_read_only = storage_index.yaml_names("storage/musiclists/read_only/")
+    musiclist_editable = storage_index.yaml_names("storage/musiclists/")
 
-    musiclist_read_only.sort()
     msg = "\n🎶 Available Read Only Musiclists: 🎶\n"
     for ml in musiclist_read_only:
         msg += f"\n🎜 [👀]{ml}"
@@ -2,6 +2,8 @@ import re
 from enum import Enum
 from enum import IntFlag
 
+from server.network.ao_codec import escape_args
+
 
 # Reserved ipid for remote/system clients. Ensures FK constraints are satisfied
 # without polluting the database with fake connection records.
@@ -91,28 +93,8 @@ def contains_URL(sample):
 
 
 def encode_ao_packet(params):
-    new_params = []
-    for arg in params:
-        if type(arg) is tuple:
-            encoded = []
-            for tup in arg:
-                encoded.append(
-                    str(tup)
-                    .replace("#", "<num>")
-                    .replace("%", "<percent>")
-                    .replace("$", "<dollar>")
-                    .replace("&", "<and>")
-                )
-            new_params.append(tuple(encoded))
-        else:
-            new_params.append(
-                str(arg)
-                .replace("#", "<num>")
-                .replace("%", "<percent>")
-                .replace("$", "<dollar>")
-                .replace("&", "<and>")
-            )
-    return new_params
+    """Escape packet arguments, see `server.network.ao_codec.escape_args`."""
+    return escape_args(params)
 
 def derelative(sample):
     while '../' in sample or '/..' in sample or '..\\' in sample or '\\..' in sample:
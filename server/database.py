@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
 from functools import reduce
@@ -19,6 +20,8 @@ logger = logging.getLogger("database")
 
 
 DB_FILE = "storage/db.sqlite3"
+# Looks up the id `Database._subtype_atom` made sure exists, by name
+_SUBTYPE_ID = "(SELECT type_id FROM {}_event_types WHERE type_name = ?)"
 _database_singleton = None
 
 
@@ -33,10 +36,19 @@ class Database:
     """
     Represents a connection to an SQLite database that persists
     information about the server, such as users, bans, and logs.
+
+    Everything the connect handshake needs is cached in memory when the
+    database is opened: the IP -> IPID map, the known HDID/IPID pairs and
+    every ban. `ipid`, `add_hdid`, `find_ban` and `log_connect` answer from
+    that cache, and every write -- logs, bans and unbans included -- goes to
+    a single writer thread with its own connection. Writes run in submission
+    order, so a row referencing a brand new IPID always lands after it, and
+    the loop never waits on SQLite's write lock behind a writer transaction.
+    Reads on the loop connection don't wait for writes (WAL mode).
     """
 
     def __init__(self):
-        new = not os.path.exists("storage/db.sqlite3")
+        new = not os.path.exists(DB_FILE)
         self.db = sqlite3.connect(DB_FILE, check_same_thread=False)
         self.db.execute("PRAGMA foreign_keys = ON")
         self.db.row_factory = sqlite3.Row
@@ -44,6 +56,80 @@ class Database:
         if new:
             self.migrate_json_to_v1()
         self.migrate()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._writer_db = None
+        self._load_identity_cache()
+
+    def _load_identity_cache(self):
+        """Load IPIDs, HDIDs and bans for the connect handshake."""
+        with self.db as conn:
+            self._ipids = {
+                row["ip_address"]: row["ipid"]
+                for row in conn.execute("SELECT ipid, ip_address FROM ipids")
+            }
+            self._known_ipids = set(self._ipids.values())
+            self._next_ipid = max(self._known_ipids, default=0) + 1
+            self._hdids = {
+                (row["hdid"], row["ipid"])
+                for row in conn.execute("SELECT hdid, ipid FROM hdids")
+            }
+            self._bans = {
+                row["ban_id"]: Database.Ban(**row)
+                for row in conn.execute("SELECT * FROM bans")
+            }
+            # Same numbering SQLite would use for a new ban
+            self._next_ban_id = max(self._bans, default=0) + 1
+            self._ipid_bans = {
+                row["ipid"]: row["ban_id"]
+                for row in conn.execute("SELECT ipid, ban_id FROM ip_bans")
+            }
+            self._hdid_bans = {
+                row["hdid"]: row["ban_id"]
+                for row in conn.execute("SELECT hdid, ban_id FROM hdid_bans")
+            }
+        logger.debug(
+            "Cached %d IPIDs, %d HDIDs and %d bans",
+            len(self._ipids), len(self._hdids), len(self._bans),
+        )
+
+    def _write(self, query, params):
+        """Run a write on the writer thread, in submission order."""
+        self._writer.submit(self._run_write, query, params)
+
+    def _write_batch(self, batch):
+        """Run several (query, params) pairs on the writer thread as one transaction."""
+        self._writer.submit(self._run_batch, batch)
+
+    def _writer_conn(self):
+        # Only ever called on the writer thread, which owns _writer_db
+        if self._writer_db is None:
+            self._writer_db = sqlite3.connect(DB_FILE, check_same_thread=False)
+            self._writer_db.execute("PRAGMA foreign_keys = ON")
+        return self._writer_db
+
+    def _run_write(self, query, params):
+        try:
+            with self._writer_conn() as conn:
+                conn.execute(query, params)
+        except sqlite3.Error:
+            logger.exception("Background write failed: %s %s", query.strip(), params)
+
+    def _run_batch(self, batch):
+        try:
+            with self._writer_conn() as conn:
+                for query, params in batch:
+                    conn.execute(query, params)
+        except sqlite3.Error:
+            logger.exception("Background batch of %d writes failed", len(batch))
+
+    def flush(self):
+        """Wait for every queued background write to finish."""
+        self._writer.submit(lambda: None).result()
+
+    def reload(self):
+        """Re-read the identity cache after another process wrote to the database."""
+        self.flush()
+        self._load_identity_cache()
 
     def migrate_json_to_v1(self):
         """Migrate to v1 of the database from JSON."""
@@ -149,7 +235,7 @@ class Database:
             logger.debug("Migration to v1 complete")
 
     def migrate(self):
-        for version in [2, 3, 4, 5, 6, 7]:
+        for version in [2, 3, 4, 5, 6, 7, 8]:
             self.migrate_to_version(version)
 
     def migrate_to_version(self, version):
@@ -165,36 +251,36 @@ class Database:
 
     def ipid(self, ip):
         """Get an IPID from an IP address."""
-        with self.db as conn:
-            conn.execute(
+        ipid = self._ipids.get(ip)
+        if ipid is None:
+            # This connection is the only writer of ipids, so the next free
+            # number can be handed out before the row is written.
+            ipid = self._ipids[ip] = self._next_ipid
+            self._next_ipid += 1
+            self._known_ipids.add(ipid)
+            self._write(
                 dedent(
                     """
-                INSERT OR IGNORE INTO ipids(ipid, ip_address) VALUES (NULL, ?)
+                INSERT OR IGNORE INTO ipids(ipid, ip_address) VALUES (?, ?)
                 """
                 ),
-                (ip,),
+                (ipid, ip),
             )
-            ipid = conn.execute(
-                dedent(
-                    """
-                SELECT ipid FROM ipids WHERE ip_address = ?
-                """
-                ),
-                (ip,),
-            ).fetchone()["ipid"]
-            return ipid
+        return ipid
 
     def add_hdid(self, ipid, hdid):
         """Associate an HDID with an IPID."""
-        with self.db as conn:
-            conn.execute(
-                dedent(
-                    """
-                INSERT OR IGNORE INTO hdids(hdid, ipid) VALUES (?, ?)
+        if (hdid, ipid) in self._hdids:
+            return
+        self._hdids.add((hdid, ipid))
+        self._write(
+            dedent(
                 """
-                ),
-                (hdid, ipid),
-            )
+            INSERT OR IGNORE INTO hdids(hdid, ipid) VALUES (?, ?)
+            """
+            ),
+            (hdid, ipid),
+        )
 
     def ban(
         self,
@@ -210,49 +296,42 @@ class Database:
         These should be used sparingly, as they can affect large swaths
         of web users if used incorrectly.
         """
-        with self.db as conn:
-            if ban_id is None:
-                logger.info(
-                    f"{banned_by.name} ({banned_by.ipid}) "
-                    + f"banned {target_id}: '{reason}'."
-                )
-                ban_id = conn.execute(
-                    dedent(
-                        """
-                    INSERT INTO bans(reason, banned_by, unban_date)
-                    VALUES (?, ?, ?)
+        if ban_type == "ipid":
+            targets, insert = self._ipid_bans, "INSERT INTO ip_bans(ipid, ban_id) VALUES (?, ?)"
+            if target_id not in self._known_ipids:
+                raise ServerError(f"Error inserting ban: IPID {target_id} does not exist")
+        elif ban_type == "hdid":
+            targets, insert = self._hdid_bans, "INSERT INTO hdid_bans(hdid, ban_id) VALUES (?, ?)"
+        else:
+            raise ServerError(f"unknown ban type {ban_type}")
+        if target_id in targets:
+            raise ServerError(f"Error inserting ban: {target_id} is already under ban {targets[target_id]}")
+        batch = []
+        if ban_id is None:
+            logger.info(
+                f"{banned_by.name} ({banned_by.ipid}) "
+                + f"banned {target_id}: '{reason}'."
+            )
+            ban_id = self._next_ban_id
+            self._next_ban_id += 1
+            # The format CURRENT_TIMESTAMP uses, which /bans sorts by
+            ban_date = arrow.utcnow().format("YYYY-MM-DD HH:mm:ss")
+            batch.append((
+                dedent(
                     """
-                    ),
-                    (reason, banned_by.ipid, unban_date),
-                ).lastrowid
-            if ban_type == "ipid":
-                try:
-                    conn.execute(
-                        dedent(
-                            """
-                        INSERT INTO ip_bans(ipid, ban_id) VALUES (?, ?)
-                        """
-                        ),
-                        (target_id, ban_id),
-                    )
-                except sqlite3.IntegrityError as exc:
-                    raise ServerError(
-                        f"Error inserting ban: {exc}" " (the IPID may not exist)"
-                    )
-            elif ban_type == "hdid":
-                try:
-                    conn.execute(
-                        dedent(
-                            """
-                        INSERT INTO hdid_bans(hdid, ban_id) VALUES (?, ?)
-                        """
-                        ),
-                        (target_id, ban_id),
-                    )
-                except sqlite3.IntegrityError as exc:
-                    raise ServerError(f"Error inserting ban: {exc}")
-            else:
-                raise ServerError(f"unknown ban type {ban_type}")
+                INSERT INTO bans(ban_id, ban_date, reason, banned_by, unban_date)
+                VALUES (?, ?, ?, ?, ?)
+                """
+                ),
+                (ban_id, ban_date, reason, banned_by.ipid, unban_date),
+            ))
+            self._bans[ban_id] = Database.Ban(
+                ban_id, ban_date, unban_date, banned_by.ipid, reason)
+        elif ban_id not in self._bans:
+            raise ServerError(f"Error inserting ban: ban ID {ban_id} does not exist")
+        batch.append((insert, (target_id, ban_id)))
+        self._write_batch(batch)
+        targets[target_id] = ban_id
 
         if unban_date is not None:
             self._schedule_unban(ban_id)
@@ -295,34 +374,18 @@ class Database:
         @property
         def ipids(self):
             """Find IPIDs affected by this ban."""
-            with _database_singleton.db as conn:
-                return [
-                    row["ipid"]
-                    for row in conn.execute(
-                        dedent(
-                            """
-                        SELECT ipid FROM ip_bans WHERE ban_id = ?
-                        """
-                        ),
-                        (self.ban_id,),
-                    ).fetchall()
-                ]
+            return sorted(
+                ipid for ipid, ban_id in _database_singleton._ipid_bans.items()
+                if ban_id == self.ban_id
+            )
 
         @property
         def hdids(self):
             """Find HDIDs affected by this ban."""
-            with _database_singleton.db as conn:
-                return [
-                    row["hdid"]
-                    for row in conn.execute(
-                        dedent(
-                            """
-                        SELECT hdid FROM hdid_bans WHERE ban_id = ?
-                        """
-                        ),
-                        (self.ban_id,),
-                    ).fetchall()
-                ]
+            return sorted(
+                hdid for hdid, ban_id in _database_singleton._hdid_bans.items()
+                if ban_id == self.ban_id
+            )
 
         @property
         def banned_by_name(self):
@@ -334,49 +397,23 @@ class Database:
 
     def find_ban(self, ipid=None, hdid=None, ban_id=None):
         """Check if an IPID and/or HDID are banned."""
-        with self.db as conn:
-            # Why is this query so complicated? The answer is that I am
-            # offloading most of the work to SQLite. This query first
-            # finds HDID or IPID bans, then looks up the associated ban
-            # information. Then it finds the last known OOC name of the
-            # player who issued that ban, purely as a convenience
-            # for later use. Use `EXPLAIN QUERY PLAN` for a breakdown.
-            #   LEFT OUTER JOIN area_events ON
-            #      area_events.ipid = banned_by AND
-            #      ooc_name IS NOT NULL
-            #   ORDER BY event_time DESC LIMIT 1
-            ban = conn.execute(
-                dedent(
-                    """
-                SELECT *
-                FROM (
-                    SELECT ban_id FROM ip_bans WHERE ipid = ?
-                    UNION SELECT ban_id FROM hdid_bans WHERE hdid = ?
-                    UNION SELECT ban_id FROM bans WHERE ban_id = ?
-                )
-                JOIN bans USING (ban_id)
-                """
-                ),
-                (ipid, hdid, ban_id),
-            ).fetchone()
+        for found in (self._ipid_bans.get(ipid), self._hdid_bans.get(hdid), ban_id):
+            ban = self._bans.get(found)
             if ban is not None:
-                return Database.Ban(**ban)
-            else:
-                return None
+                return ban
+        return None
 
     def unban(self, ban_id):
         """Remove a ban entry."""
         logger.info("Unbanning %s", ban_id)
-        with self.db as conn:
-            unbans = conn.execute(
-                dedent(
-                    """
-                DELETE FROM bans WHERE ban_id = ?
-                """
-                ),
-                (ban_id,),
-            ).rowcount
-            return unbans > 0
+        if self._bans.pop(ban_id, None) is None:
+            return False
+        # The DELETE cascades to ip_bans and hdid_bans
+        self._write("DELETE FROM bans WHERE ban_id = ?", (ban_id,))
+        for targets in (self._ipid_bans, self._hdid_bans):
+            for target in [t for t, b in targets.items() if b == ban_id]:
+                del targets[target]
+        return True
 
     def schedule_unbans(self):
         """
@@ -387,41 +424,22 @@ class Database:
         schedule_unbans will only get the unbans for the next 12 hours
         and then will have to be called again 12 hours later.
         """
-        dated_bans = []
-        with self.db as conn:
-            dated_bans = conn.execute(
-                dedent(
-                    """
-                SELECT ban_id FROM bans
-                WHERE unban_date IS NOT NULL AND
-                    datetime(unban_date) < datetime(?, '+12 hours')
-                """
-                ),
-                (arrow.utcnow().datetime,),
-            ).fetchall()
-
-        for ban in dated_bans:
-            self._schedule_unban(ban["ban_id"])
+        horizon = arrow.utcnow().shift(hours=12).datetime
+        for ban in list(self._bans.values()):
+            if ban.unban_date is not None and ban.unban_date < horizon:
+                self._schedule_unban(ban.ban_id)
 
     def _schedule_unban(self, ban_id):
-        with self.db as conn:
-            ban = conn.execute(
-                dedent(
-                    """
-                SELECT unban_date FROM bans WHERE ban_id = ?
-                """
-                ),
-                (ban_id,),
-            ).fetchone()
-            time_to_unban = (
-                arrow.get(ban["unban_date"]) - arrow.utcnow()
-            ).total_seconds()
+        ban = self._bans.get(ban_id)
+        if ban is None or ban.unban_date is None:
+            return
+        time_to_unban = (arrow.get(ban.unban_date) - arrow.utcnow()).total_seconds()
 
-            def auto_unban():
-                self.unban(ban_id)
-                self.log_misc("auto_unban", data={"id": ban_id})
+        def auto_unban():
+            self.unban(ban_id)
+            self.log_misc("auto_unban", data={"id": ban_id})
 
-            asyncio.get_running_loop().call_later(time_to_unban, auto_unban)
+        asyncio.get_running_loop().call_later(time_to_unban, auto_unban)
 
     def log_area(self, event_subtype, client, area, message=None, target=None):
         """
@@ -434,7 +452,6 @@ class Database:
             else (None, None, None)
         )
         target_ipid = target.ipid if target is not None else None
-        subtype_id = self._subtype_atom("area", event_subtype)
         if isinstance(message, dict):
             message = json.dumps(message)
 
@@ -446,13 +463,14 @@ class Database:
             f"[H{area.area_manager.id} A{area.id} '{area.name}'] {showname}"
             + f"/{client.name} ({client.ipid}): event {event_subtype} ({message})"
         )
-        with self.db as conn:
-            conn.execute(
+        self._write_batch([
+            self._subtype_atom("area", event_subtype),
+            (
                 dedent(
-                    """
+                    f"""
                 INSERT INTO area_events(ipid, hub_id, hub_name, area_id, area_name, ic_name, char_name, ooc_name,
                     event_subtype, message, target_ipid)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, {_SUBTYPE_ID.format("area")}, ?, ?)
                 """
                 ),
                 (
@@ -464,11 +482,12 @@ class Database:
                     client._showname,
                     char_name,
                     ooc_name,
-                    subtype_id,
+                    event_subtype,
                     message,
                     target_ipid,
                 ),
-            )
+            ),
+        ])
         self._notify_subscribers("area", {
             "event_time": arrow.utcnow().isoformat(),
             "ipid": ipid,
@@ -490,15 +509,14 @@ class Database:
             f"{client.ipid} (HDID: {client.hdid}) "
             + f'{"was blocked from connecting" if failed else "connected"}.'
         )
-        with self.db as conn:
-            conn.execute(
-                dedent(
-                    """
-                INSERT INTO connect_events(ipid, hdid, failed) VALUES (?, ?, ?)
+        self._write(
+            dedent(
                 """
-                ),
-                (client.ipid, client.hdid, failed),
-            )
+            INSERT INTO connect_events(ipid, hdid, failed) VALUES (?, ?, ?)
+            """
+            ),
+            (client.ipid, client.hdid, failed),
+        )
         self._notify_subscribers("connect", {
             "event_time": arrow.utcnow().isoformat(),
             "ipid": client.ipid,
@@ -513,21 +531,22 @@ class Database:
         """
         client_ipid = client.ipid if client is not None else None
         target_ipid = target.ipid if target is not None else None
-        subtype_id = self._subtype_atom("misc", event_subtype)
         data_json = json.dumps(data)
         logger.info(
             "%s (%s onto %s): %s", event_subtype, client_ipid, target_ipid, data)
 
-        with self.db as conn:
-            conn.execute(
+        self._write_batch([
+            self._subtype_atom("misc", event_subtype),
+            (
                 dedent(
-                    """
+                    f"""
                 INSERT INTO misc_events(ipid, target_ipid, event_subtype,
-                    event_data) VALUES (?, ?, ?, ?)
+                    event_data) VALUES (?, ?, {_SUBTYPE_ID.format("misc")}, ?)
                 """
                 ),
-                (client_ipid, target_ipid, subtype_id, data_json),
-            )
+                (client_ipid, target_ipid, event_subtype, data_json),
+            ),
+        ])
         self._notify_subscribers("misc", {
             "event_time": arrow.utcnow().isoformat(),
             "ipid": client_ipid,
@@ -536,6 +555,52 @@ class Database:
             "event_data": data,
         })
 
+    def character_data(self, hub_id):
+        """The stored character data of a hub, as {char: {key: value}}."""
+        self.flush()
+        data = {}
+        with self.db as conn:
+            for row in conn.execute(
+                "SELECT char, key, value FROM character_data WHERE hub_id = ?",
+                (hub_id,),
+            ):
+                data.setdefault(row["char"], {})[row["key"]] = json.loads(row["value"])
+        return data
+
+    def set_character_value(self, hub_id, char, key, value):
+        """Store one character data key in the background."""
+        self._write(
+            dedent(
+                """
+            INSERT OR REPLACE INTO character_data(hub_id, char, key, value)
+            VALUES (?, ?, ?, ?)
+            """
+            ),
+            (hub_id, str(char), str(key), json.dumps(value, default=str)),
+        )
+
+    def delete_character_value(self, hub_id, char, key):
+        """Remove one character data key in the background."""
+        self._write(
+            "DELETE FROM character_data WHERE hub_id = ? AND char = ? AND key = ?",
+            (hub_id, str(char), str(key)),
+        )
+
+    def replace_character_data(self, hub_id, data):
+        """Replace all of a hub's stored character data in the background."""
+        batch = [("DELETE FROM character_data WHERE hub_id = ?", (hub_id,))]
+        for char, values in data.items():
+            for key, value in (values or {}).items():
+                batch.append((
+                    "INSERT OR REPLACE INTO character_data(hub_id, char, key, value) VALUES (?, ?, ?, ?)",
+                    (hub_id, str(char), str(key), json.dumps(value, default=str)),
+                ))
+        self._write_batch(batch)
+
+    def delete_character_data(self, first_hub_id):
+        """Forget the stored character data of every hub from `first_hub_id` on, in the background."""
+        self._write("DELETE FROM character_data WHERE hub_id >= ?", (first_hub_id,))
+
     def subscribe(self):
         """
         Subscribe to live log events. Returns an asyncio.Queue that will
@@ -563,26 +628,15 @@ class Database:
         """
         Get the most recent bans in chronological order.
         """
-        with self.db as conn:
-            return [
-                Database.Ban(**row)
-                for row in conn.execute(
-                    dedent(
-                        """
-                    SELECT * FROM (SELECT * FROM bans
-                        WHERE ban_date IS NOT NULL
-                        ORDER BY ban_date DESC LIMIT ?)
-                    ORDER BY ban_date ASC
-                    """
-                    ),
-                    (count,),
-                ).fetchall()
-            ]
+        bans = sorted(
+            (ban for ban in self._bans.values() if ban.ban_date is not None),
+            key=lambda ban: ban.ban_date,
+        )
+        return bans[-count:]
 
     def checkpoint_wal(self):
         """Force a WAL checkpoint to keep the WAL file from growing too large."""
-        with self.db as conn:
-            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        self._write("PRAGMA wal_checkpoint(PASSIVE)", ())
 
     def query_area_events(self, hub_id=None, area_id=None, event_subtype=None,
                           ipid=None, since=None, until=None, limit=100, offset=0):
@@ -807,25 +861,20 @@ class Database:
             return [dict(row) for row in rows]
 
     def _subtype_atom(self, event_type, event_subtype):
+        """
+        The write that makes sure `event_subtype` has a row in the event
+        type table, for the batch that logs the event. The event's INSERT
+        looks the id up with `_SUBTYPE_ID`.
+        """
         if event_type not in ("area", "misc"):
             raise AssertionError()
 
-        with self.db as conn:
-            conn.execute(
-                dedent(
-                    f"""
-                INSERT OR IGNORE INTO {event_type}_event_types(type_name)
-                VALUES (?)
-                """
-                ),
-                (event_subtype,),
-            )
-            return conn.execute(
-                dedent(
-                    f"""
-                SELECT type_id FROM {event_type}_event_types
-                WHERE type_name = ?
-                """
-                ),
-                (event_subtype,),
-            ).fetchone()["type_id"]
+        return (
+            dedent(
+                f"""
+            INSERT OR IGNORE INTO {event_type}_event_types(type_name)
+            VALUES (?)
+            """
+            ),
+            (event_subtype,),
+        )
@@ -3,11 +3,30 @@ from configparser import ConfigParser
 
 import logging
 
+from server.constants import derelative
+
 logger = logging.getLogger("emotes")
 
 char_dir = "characters"
 
 
+def emote_key(name):
+    """The normalized form emote names are stored and compared in."""
+    return derelative(name).lower()
+
+
+def compile_iniswaps(links):
+    """
+    Turn the iniswaps.yaml link lists into a char -> {chars it may swap to}
+    map, so a swap check is one lookup instead of a scan of every list.
+    """
+    allowed = {}
+    for char_link in links or ():
+        for char in char_link:
+            allowed.setdefault(char, set()).update(char_link)
+    return {char: frozenset(chars) for char, chars in allowed.items()}
+
+
 class Emotes:
     """
     Represents a list of emotes read in from a character INI file
@@ -16,7 +35,10 @@ class Emotes:
 
     def __init__(self, name):
         self.name = name
+        # (preanim, anim) pairs, plus each side alone for the wildcard checks
         self.emotes = set()
+        self.preanims = set()
+        self.anims = set()
         self.read_ini()
 
     def read_ini(self):
@@ -56,9 +78,10 @@ class Emotes:
                     #     sfx = ""
 
                     # sfx checking is not performed due to custom sfx being possible, so don't bother for now
-                    sfx = ""
-                    self.emotes.add(
-                        (preanim.lower(), anim.lower(), sfx.lower()))
+                    preanim, anim = emote_key(preanim), emote_key(anim)
+                    self.emotes.add((preanim, anim))
+                    self.preanims.add(preanim)
+                    self.anims.add(anim)
                 except KeyError as e:
                     logger.warning(
                         "Broken key %s in character file %s. "
@@ -77,19 +100,18 @@ class Emotes:
             )
             return
 
-    def validate(self, preanim, anim, sfx):
+    def validate(self, preanim, anim, sfx=""):
         """
         Determines whether or not an emote canonically belongs to this
-        character (that is, it is defined server-side).
+        character (that is, it is defined server-side). An empty preanim or
+        anim matches any. sfx checking is skipped due to custom sound lists.
         """
         # There are no emotes loaded, so allow anything
         if len(self.emotes) == 0:
             return True
-        # sfx checking is skipped due to custom sound list
-        sfx = ""
-        # Loop through emotes
-        for emote in self.emotes:
-            # If we find an emote that matches all 3, allow it
-            if (preanim == "" or emote[0] == preanim) and (anim == "" or emote[1] == anim) and (sfx == "" or emote[2] == sfx):
-                return True
-        return False
+        preanim, anim = emote_key(preanim), emote_key(anim)
+        if preanim == "":
+            return anim == "" or anim in self.anims
+        if anim == "":
+            return preanim in self.preanims
+        return (preanim, anim) in self.emotes
@@ -1,10 +1,20 @@
 import re
 
+from server.network.ao_codec import build_frame
+
+
 class EvidenceList:
     """Contains a list of evidence items."""
 
     limit = 50
-    
+
+    # First entry of every area evidence list: the inventory/evidence swapper
+    area_header = (
+        "Area",
+        "Delete this piece of evidence to swap to 🎒Inventory Evidence!\n\nIf you want to take things in the area into your evidence, you need to press 'Delete' for that evidence as well.",
+        "AREA\n🌐",
+    )
+
     class Evidence:
         """Represents a single evidence item."""
 
@@ -53,6 +63,43 @@ class EvidenceList:
 
     def __init__(self):
         self.evidences = []
+        # Bumped on every change to the list; rendered views are only reused
+        # within one version.
+        self.version = 0
+        # viewer class -> (index mapping, evidence tuples, LE packet)
+        self._rendered = {}
+
+    def bump(self):
+        """Mark the evidence as changed, dropping every cached rendering."""
+        self.version += 1
+        self._rendered.clear()
+
+    def viewer_class(self, client):
+        """
+        The key that decides what `client` sees of this list: owners and mods
+        see everything (with metadata in HiddenCM), everyone else sees what
+        their pos can see, filtered by the area's darkness.
+        """
+        area = client.area
+        if client in area.owners or client.is_mod:
+            return ("owner", area.evidence_mod == "HiddenCM")
+        return ("pos", client.pos.strip(" "), bool(area.dark))
+
+    def render(self, client):
+        """
+        The cached `(evi_list mapping, evidence tuples, LE packet bytes)` for
+        `client`'s viewer class. The mapping already holds the dummy entry for
+        the inventory/evidence swapper and is shared between clients, so it
+        is a tuple.
+        """
+        key = self.viewer_class(client)
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            nums_list, evi_list = self.create_evi_list(client)
+            packet = build_frame("LE", [self.area_header] + evi_list)
+            rendered = (tuple([0] + nums_list), tuple(evi_list), packet)
+            self._rendered[key] = rendered
+        return rendered
 
     def can_see(self, evi, pos):  # used with hiddenCM ebidense
         pos = pos.strip(" ")
@@ -188,6 +235,7 @@ class EvidenceList:
 
         self.evidences.append(self.Evidence(
             name, desc, image, pos, can_hide_in, show_in_dark, can_take, editable))
+        self.bump()
         id = len(self.evidences)
         # Inform the CMs of evidence manupulation
         client.area.send_owner_command(
@@ -225,6 +273,7 @@ class EvidenceList:
             self.evidences[id2],
             self.evidences[id1],
         )
+        self.bump()
 
         # Inform the CMs of evidence manupulation
         client.area.send_owner_command(
@@ -262,10 +311,7 @@ class EvidenceList:
                     can_take = int(evi.can_take)
                     editable = int(evi.editable)
                     desc = f"<owner={evi.pos}>\n<can_hide_in={can_hide_in}>\n<show_in_dark={show_in_dark}>\n<can_take={can_take}>\n<editable={editable}>\n{evi.desc}"
-                evi_list.append(
-                    self.Evidence(evi.name, desc, evi.image,
-                                  evi.pos).to_tuple()
-                )
+                evi_list.append((evi.name, desc, evi.image))
             elif self.can_see(self.evidences[i], client.pos):
                 # show_in_dark:
                 # 0 - Do not show evidence in dark areas.
@@ -302,6 +348,7 @@ class EvidenceList:
                 triggers = evi["triggers"]
             self.evidences.append(self.Evidence(
                 name, desc, image, pos, can_hide_in, show_in_dark, can_take, editable, triggers))
+        self.bump()
 
     def export_evidence(self):
         return [e.to_dict() for e in self.evidences]
@@ -338,6 +385,7 @@ class EvidenceList:
         else:
             evi = self.evidences[id]
             self.evidences.pop(id)
+        self.bump()
 
         # Inform the CMs of evidence manupulation
         client.area.send_owner_command(
@@ -443,6 +491,7 @@ class EvidenceList:
             )
             new_name = evi.name
 
+        self.bump()
         namechange = f"'{old_name}' to '{new_name}'" if new_name != old_name else f"'{old_name}'"
         # Inform the CMs of evidence manupulation
         client.area.send_owner_command(
@@ -0,0 +1,388 @@
+"""Restart the server without dropping its TCP players.
+
+With `restart_handoff: true` in config.yaml, `/restart` starts a new server
+process (the same command line, with `TSU_HANDOFF` set to a Unix socket path)
+instead of stopping. Once the new process has loaded its configuration it
+connects to that socket, and the old one:
+
+1. stops accepting connections and detaches its AO clients, so that nothing
+   it still runs reads from or writes to them,
+2. sends a JSON snapshot of its state: every hub as `/save_hub` would write
+   it, the hub and area timers, CM/GM rosters and invite lists, and one
+   session per client (player ID, IPID, HDID, character, position, client
+   software and a handful of per-player flags, see `SESSION_FIELDS`),
+3. passes its listening sockets and every client socket over with SCM_RIGHTS,
+4. waits for the new process to confirm, then exits without closing the
+   connections it handed over.
+
+The new process serves the listening sockets straight away, recreates each
+client under its old player ID, and pushes the current state to it with
+`Client.resync_session`, like a ghost resuming its session. Players see the
+server pause for as long as the handover takes. The new process binds its
+other ports (websockets, admin and GM panels) in the background once the
+old process has exited, without holding up the players it adopted.
+
+What does not survive: WebSocket (webAO) clients, who reconnect as usual;
+per-player state not listed in `SESSION_FIELDS` (pairing, following, battle,
+floodguard counters); area state `hub.save()` does not record, such as the
+last IC message, testimony and running demos. If the new process does not
+answer within `HANDOFF_TIMEOUT` seconds, or fails to restore the state, the
+old one serves its listening sockets and clients again, and sends each
+client its current state to make up for what it missed.
+
+Unix only: `socket.send_fds` does not exist on Windows.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import subprocess
+import sys
+
+from server import database
+from server.exceptions import ClientError, ServerError
+
+logger = logging.getLogger("main")
+
+HANDOFF_ENV = "TSU_HANDOFF"
+HANDOFF_TIMEOUT = 60
+# File descriptors per message, under Linux's SCM_MAX_FD of 253
+FDS_PER_MESSAGE = 200
+
+# Client attributes carried over verbatim
+SESSION_FIELDS = (
+    "id", "ipid", "hdid", "name", "_showname", "char_id", "pos", "iniswap",
+    "is_mod", "mod_profile_name", "software", "version", "has_multilayer_audio",
+    "is_checked", "joined", "first_joined", "is_dj", "can_wtce", "is_muted",
+    "is_ooc_muted", "pm_mute", "muted_global", "muted_adverts", "charcurse",
+    "_hidden", "sneaking", "blinded", "narrator", "blankpost", "firstperson",
+    "remote_listen", "ooc_actions", "char_url", "autogetarea",
+)
+
+
+def available():
+    return hasattr(socket, "send_fds") and hasattr(socket, "AF_UNIX")
+
+
+def _handed_over(client):
+    """Whether `client` is on a plain TCP connection that can change hands."""
+    from server.network.aoprotocol import AOProtocol
+
+    return (
+        type(client.protocol) is AOProtocol
+        and client.joined
+        and client.transport.get_extra_info("socket") is not None
+    )
+
+
+def snapshot_session(client):
+    session = {name: getattr(client, name) for name in SESSION_FIELDS}
+    area = client.area
+    session["hub"] = area.area_manager.id
+    session["area"] = area.id
+    session["gm"] = client in area.area_manager.owners
+    session["cm_areas"] = [(a.area_manager.id, a.id) for a in client.owned_areas]
+    session["buffer"] = client.protocol.buffer
+    return session
+
+
+def snapshot_state(server, clients):
+    hubs = server.hub_manager.hubs
+    return {
+        "hubs": [hub.save() for hub in hubs],
+        "timers": [
+            [hub.timer.snapshot(), [[t.snapshot() for t in area.timers] for area in hub.areas]]
+            for hub in hubs
+        ],
+        "invites": [[sorted(area.invite_list) for area in hub.areas] for hub in hubs],
+        "clients": [snapshot_session(c) for c in clients],
+    }
+
+
+def send_state(sock, state, listen_fds, client_fds):
+    """Send a snapshot and its sockets over a blocking Unix socket, for `Receiver.receive`."""
+    state = dict(state, listeners=len(listen_fds))
+    payload = json.dumps(state).encode("utf-8")
+    sock.sendall(struct.pack("!I", len(payload)) + payload)
+    fds = list(listen_fds) + list(client_fds)
+    for i in range(0, len(fds), FDS_PER_MESSAGE):
+        socket.send_fds(sock, [b"F"], fds[i:i + FDS_PER_MESSAGE])
+
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ServerError("The handoff connection closed early.")
+        data += chunk
+    return data
+
+
+class _Detached:
+    """
+    Stands in for the transport of a client being handed over. Timers,
+    broadcasts and WebSocket players keep running in this process meanwhile,
+    and must not write to a socket the new process is writing to as well.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def get_extra_info(self, name, default=None):
+        return self.transport.get_extra_info(name, default)
+
+    def write(self, data):
+        pass
+
+    def close(self):
+        pass
+
+    def is_closing(self):
+        return False
+
+
+def _detach(server, clients):
+    for c in clients:
+        c.transport.pause_reading()
+        c.transport = _Detached(c.transport)
+        server.client_manager.clients.discard(c)
+
+
+def _reattach(server, clients):
+    for c in clients:
+        c.transport = c.transport.transport
+        server.client_manager.clients.add(c)
+        c.transport.resume_reading()
+        # Catch up on whatever was not sent while detached
+        c.resync_session()
+
+
+async def serve(server, socks):
+    """
+    Serve AO clients on sockets that are already listening.
+    :returns: the server of the first socket
+    """
+    from server.network.aoprotocol import AOProtocol
+
+    loop = asyncio.get_running_loop()
+    servers = [await loop.create_server(lambda: AOProtocol(server), sock=sock) for sock in socks]
+    return servers[0]
+
+
+async def hand_over(server):
+    """
+    Start a new server process and give it this one's connections.
+    :returns: the connection to the new process, to be kept open until this process exits
+    :raises ServerError: if the handoff could not be done; this server keeps running
+    """
+    if not available():
+        raise ServerError("Restart handoff needs Unix sockets with SCM_RIGHTS.")
+    loop = asyncio.get_running_loop()
+    path = server.config.get("handoff_socket", "storage/handoff.sock")
+    if os.path.exists(path):
+        os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(1)
+    listener.setblocking(False)
+    child = subprocess.Popen([sys.executable] + sys.argv, env=dict(os.environ, **{HANDOFF_ENV: path}))
+    try:
+        conn, _ = await asyncio.wait_for(loop.sock_accept(listener), HANDOFF_TIMEOUT)
+    except asyncio.TimeoutError:
+        child.kill()
+        raise ServerError("The new server process did not start in time.")
+    finally:
+        listener.close()
+        os.unlink(path)
+    try:
+        count = await send_over(server, conn)
+    except ServerError:
+        child.kill()
+        raise
+    logger.info("Handed %d clients over to process %d", count, child.pid)
+    return conn
+
+
+async def send_over(server, conn):
+    """
+    Give this process's listening sockets and TCP clients to the new process
+    connected on `conn`.
+    :returns: how many clients were handed over
+    :raises ServerError: if the new process did not take them; this server keeps running
+    """
+    loop = asyncio.get_running_loop()
+    # Stop accepting, on copies of the listening sockets that keep them open:
+    # connections arriving meanwhile wait in the backlog for the new process.
+    listen_socks = [s.dup() for s in server.ao_server.sockets]
+    server.ao_server.close()
+    clients = [c for c in server.client_manager.clients if _handed_over(c)]
+    _detach(server, clients)
+    try:
+        database.flush()
+        conn.settimeout(HANDOFF_TIMEOUT)
+        send_state(
+            conn,
+            snapshot_state(server, clients),
+            [s.fileno() for s in listen_socks],
+            [c.transport.get_extra_info("socket").fileno() for c in clients],
+        )
+        conn.setblocking(False)
+        reply = await asyncio.wait_for(loop.sock_recv(conn, 2), HANDOFF_TIMEOUT)
+        if reply != b"OK":
+            raise ServerError("The new server process could not restore the handed over state.")
+    except (OSError, TypeError, ValueError, asyncio.TimeoutError, ServerError) as ex:
+        conn.close()
+        server.ao_server = await serve(server, listen_socks)
+        _reattach(server, clients)
+        if isinstance(ex, ServerError):
+            raise
+        raise ServerError(f"Restart handoff failed: {ex}")
+
+    # Let go of the sockets without disconnecting anyone: the new process
+    # holds its own copies, so closing ours does not end the connections.
+    for sock in listen_socks:
+        sock.close()
+    for c in clients:
+        c.protocol.client = None
+        c.transport.transport.abort()
+    return len(clients)
+
+
+class Receiver:
+    """The new process's end of a handoff."""
+
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(HANDOFF_TIMEOUT)
+        self.sock.connect(path)
+
+    def receive(self):
+        """
+        Read the old process's snapshot and sockets.
+        :returns: (state, listening sockets, client sockets in `state["clients"]` order)
+        """
+        (size,) = struct.unpack("!I", _recv_exact(self.sock, 4))
+        state = json.loads(_recv_exact(self.sock, size).decode("utf-8"))
+        count = state["listeners"] + len(state["clients"])
+        fds = []
+        while len(fds) < count:
+            _, received, _, _ = socket.recv_fds(self.sock, 1, FDS_PER_MESSAGE)
+            if not received:
+                raise ServerError("The handoff connection closed early.")
+            fds.extend(received)
+        socks = [socket.socket(fileno=fd) for fd in fds]
+        return state, socks[:state["listeners"]], socks[state["listeners"]:]
+
+    def confirm(self, ok=True):
+        self.sock.sendall(b"OK" if ok else b"NO")
+
+    async def wait_for_exit(self):
+        """Wait until the old process has exited and closed its end."""
+        loop = asyncio.get_running_loop()
+        self.sock.setblocking(False)
+        try:
+            while await loop.sock_recv(self.sock, 1):
+                pass
+        except OSError:
+            pass
+        self.sock.close()
+
+
+async def take_over(server, receiver):
+    """
+    Serve the listening sockets and adopt the clients the old process sends
+    over `receiver`, then tell it whether that worked.
+    :returns: (the AO server on the first listening socket, the adopted clients)
+    """
+    from server.network.aoprotocol import AOProtocol
+
+    state, listeners, client_socks = receiver.receive()
+    try:
+        database.reload()
+        ao_server = await serve(server, listeners)
+        restore_state(server, state)
+        clients = await restore_clients(
+            server, state, client_socks,
+            lambda session: AOProtocol(server, session=session),
+        )
+    except Exception:
+        receiver.confirm(ok=False)
+        raise
+    receiver.confirm()
+    return ao_server, clients
+
+
+def restore_state(server, state):
+    """Apply the hub, area and timer state from a handoff snapshot."""
+    manager = server.hub_manager
+    manager.load_hubs(state["hubs"])
+    for hub, data in zip(manager.hubs, state["hubs"]):
+        for area in hub.areas[len(data.get("areas", ())):]:
+            hub.remove_area(area)
+        # The old process kept writing character data after this one started
+        hub.restore_character_data()
+    for hub, (hub_timer, area_timers) in zip(manager.hubs, state["timers"]):
+        hub.timer.restore(hub_timer)
+        for area, timers in zip(hub.areas, area_timers):
+            for timer, timer_state in zip(area.timers, timers):
+                timer.restore(timer_state)
+
+
+def resume_client(server, protocol, transport, session):
+    """
+    Recreate a handed over client on `transport` (see `AOProtocol.connection_made`).
+    The client is placed back in its area but not told anything yet; `finish`
+    does that once every client is back.
+    """
+    client = server.client_manager.restore_client(transport, session["id"], session["ipid"])
+    for name in SESSION_FIELDS:
+        setattr(client, name, session[name])
+    manager = server.hub_manager
+    try:
+        area = manager.hubs[session["hub"]].areas[session["area"]]
+    except IndexError:
+        area = manager.default_hub().default_area()
+    client.area = area
+    area.clients.add(client)
+    area.index_client(client)
+    if session["gm"]:
+        area.area_manager.owners.add(client)
+    for hub_id, area_id in session["cm_areas"]:
+        try:
+            owned = manager.hubs[hub_id].areas[area_id]
+        except IndexError:
+            continue
+        owned._owners.add(client)
+        client.owned_areas.add(owned)
+    client.protocol = protocol
+    protocol.buffer = session["buffer"]
+    return client
+
+
+async def restore_clients(server, state, socks, protocol_factory):
+    """Adopt the handed over client sockets and bring every client up to date."""
+    loop = asyncio.get_running_loop()
+    clients = []
+    for session, sock in zip(state["clients"], socks):
+        try:
+            _, protocol = await loop.connect_accepted_socket(
+                lambda session=session: protocol_factory(session), sock=sock
+            )
+        except (OSError, ClientError):
+            logger.exception("Could not resume client %s", session["id"])
+            sock.close()
+            continue
+        if protocol.client is not None:
+            clients.append(protocol.client)
+    for hub, hub_invites in zip(server.hub_manager.hubs, state["invites"]):
+        for area, invites in zip(hub.areas, hub_invites):
+            for client_id in invites:
+                area.invite_list.add(client_id)
+    for client in clients:
+        server.player_state_observer.register_client(client)
+        client.resync_session()
+    return clients
@@ -1,6 +1,8 @@
 import oyaml as yaml  # ordered yaml
 
+from server import database
 from server.area_manager import AreaManager
+from server.network.ao_codec import build_frame
 from server.exceptions import AreaError
 
 
@@ -10,6 +12,8 @@ class HubManager:
     def __init__(self, server):
         self.server = server
         self.hubs = []
+        # Set by restore_character_data once the server is up
+        self.character_journal = False
         self.load()
 
     @property
@@ -19,6 +23,34 @@ class HubManager:
             clients = clients | hub.clients
         return clients
 
+    def hub_list_message(self):
+        """Build the raw "FA" packet (as bytes) listing every hub and its user count."""
+        return build_frame(
+            "FA",
+            [
+                "🌐 Hubs 🌐\n Double-Click me to see Areas\n  _______",
+                *[
+                    f"[{hub_id}] {hub.name} (users: {hub.count})"
+                    for hub_id, hub in enumerate(self.hubs)
+                ],
+            ],
+        )
+
+    def broadcast_hub_list(self, hubs=None):
+        """
+        Recount users and send the hub list to every client viewing it.
+        The packet is only encoded once no matter how many clients get it.
+        :param hubs: hubs whose user count changed (Default value = all hubs)
+        """
+        for hub in self.hubs if hubs is None else hubs:
+            hub.update_count()
+        viewers = self.server.client_manager.hub_list_viewers
+        if not viewers:
+            return
+        msg = self.hub_list_message()
+        for c in list(viewers):
+            c.send_raw_message(msg)
+
     def load(self, path="config/areas.yaml", hub_id=-1):
         try:
             with open(path, "r", encoding="utf-8") as stream:
@@ -26,7 +58,10 @@ class HubManager:
         except Exception:
             raise AreaError(
                 f"Trying to load Hub list: File path {path} is invalid!")
+        self.load_hubs(hubs, hub_id)
 
+    def load_hubs(self, hubs, hub_id=-1):
+        """Apply a list of saved hubs, or only the hub `hub_id` of it."""
         if hub_id != -1:
             try:
                 self.hubs[hub_id].load(hubs[hub_id], destructive=True)
@@ -74,10 +109,16 @@ class HubManager:
         for hub in hubs:
             while len(self.hubs) < len(hubs):
                 # Make sure that the hub manager contains enough hubs to update with new information
-                self.hubs.append(AreaManager(self, f"Hub {len(self.hubs)}"))
+                new_hub = AreaManager(self, f"Hub {len(self.hubs)}")
+                self.hubs.append(new_hub)
+                if self.character_journal:
+                    new_hub.restore_character_data()
             while len(self.hubs) > len(hubs):
                 # Clean up excess hubs
                 h = self.hubs.pop()
+                if h.character_journal:
+                    # A hub added later in its place must not inherit its characters
+                    database.delete_character_data(len(self.hubs))
                 clients = h.clients.copy()
                 for client in clients:
                     client.set_area(self.default_hub().default_area())
@@ -87,6 +128,14 @@ class HubManager:
             self.hubs[i].o_abbreviation = self.hubs[i].abbreviation
             i += 1
 
+    def restore_character_data(self):
+        """Keep every hub's character data in the database from now on."""
+        self.character_journal = True
+        # Left behind by hubs that areas.yaml no longer has
+        database.delete_character_data(len(self.hubs))
+        for hub in self.hubs:
+            hub.restore_character_data()
+
     def save(self, path="config/areas.yaml"):
         try:
             with open(path, "w", encoding="utf-8") as stream:
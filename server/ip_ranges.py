@@ -0,0 +1,169 @@
+"""Range bans from `config/iprange_ban.txt`, and cached ASN lookups.
+
+Each non-blank line of the ban file is one rule; its line number is the ban
+ID shown to the client. A rule is one of:
+
+- a CIDR block, IPv4 or IPv6: `185.220.100.0/22`, `2a0b:f4c0::/32`
+- a legacy prefix ending in `.` or `:`, matched against the peer's address
+  text exactly like before: `23.129.64.`, `2001:db8:`
+- an autonomous system number, `13335` (or `AS13335`), matched against the
+  peer's ASN from the GeoLite2 database
+
+Lines starting with `#` are comments. Anything else never matched under the
+old loader either and is skipped with a debug message.
+
+`IpRangeBans.match_address` costs a few dict lookups per connection however long the
+list is: CIDR blocks are bucketed by prefix length, and legacy prefixes are
+looked up at each separator of the address.
+"""
+
+import asyncio
+import ipaddress
+import logging
+import re
+from collections import OrderedDict
+
+import geoip2.errors
+
+logger = logging.getLogger("main")
+
+_ASN_RE = re.compile(r"^(?:AS)?(\d+)$", re.IGNORECASE)
+
+
+class IpRangeBans:
+    """A compiled ban list. Matching methods return the rule's line number."""
+
+    def __init__(self, lines=()):
+        # ip version -> prefix length -> network address as int -> line
+        self.networks = {4: {}, 6: {}}
+        self.prefixes = {}
+        self.asns = {}
+        for line, rule in enumerate(lines):
+            self._add(line, rule.strip())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(f.read().splitlines())
+
+    def __len__(self):
+        return (
+            sum(len(nets) for buckets in self.networks.values() for nets in buckets.values())
+            + len(self.prefixes)
+            + len(self.asns)
+        )
+
+    def _add(self, line, rule):
+        if rule == "" or rule.startswith("#"):
+            return
+        if "/" in rule:
+            try:
+                net = ipaddress.ip_network(rule, strict=False)
+            except ValueError:
+                logger.debug("iprange_ban.txt line %d: bad CIDR block %r", line, rule)
+                return
+            bucket = self.networks[net.version].setdefault(net.prefixlen, {})
+            bucket.setdefault(int(net.network_address), line)
+        elif rule.endswith(".") or rule.endswith(":"):
+            self.prefixes.setdefault(rule, line)
+        else:
+            match = _ASN_RE.match(rule)
+            if match is None:
+                logger.debug("iprange_ban.txt line %d: ignoring %r", line, rule)
+                return
+            self.asns.setdefault(match.group(1), line)
+
+    def _match_network(self, address):
+        found = None
+        value = int(address)
+        width = address.max_prefixlen
+        for prefixlen, nets in self.networks[address.version].items():
+            line = nets.get(value >> (width - prefixlen) << (width - prefixlen))
+            if line is not None and (found is None or line < found):
+                found = line
+        return found
+
+    def _match_prefix(self, peername):
+        found = None
+        for i, char in enumerate(peername):
+            if char in ".:":
+                line = self.prefixes.get(peername[: i + 1])
+                if line is not None and (found is None or line < found):
+                    found = line
+        return found
+
+    def match_address(self, peername):
+        """Check the address rules. Returns the first matching line, or None."""
+        candidates = []
+        if self.prefixes:
+            candidates.append(self._match_prefix(peername))
+        if self.networks[4] or self.networks[6]:
+            try:
+                address = ipaddress.ip_address(peername.split("%", 1)[0])
+            except ValueError:
+                address = None
+            if address is not None:
+                candidates.append(self._match_network(address))
+                mapped = getattr(address, "ipv4_mapped", None)
+                if mapped is not None:
+                    candidates.append(self._match_network(mapped))
+        candidates = [line for line in candidates if line is not None]
+        return min(candidates) if candidates else None
+
+    def match_asn(self, asn):
+        """Check the ASN rules. Returns the matching line, or None."""
+        if asn is None:
+            return None
+        return self.asns.get(str(asn))
+
+
+class AsnLookup:
+    """
+    ASN lookups against a GeoLite2-ASN reader, memoized per address in a
+    bounded LRU. Misses are resolved on the default executor, so the MMDB read
+    never runs on the event loop.
+    """
+
+    def __init__(self, reader, max_entries=4096):
+        self.reader = reader
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self._pending = {}
+
+    def cached(self, peername):
+        """The cached ASN for `peername` (None if unknown or unlisted), and whether it was cached."""
+        if peername not in self.cache:
+            return None, False
+        self.cache.move_to_end(peername)
+        return self.cache[peername], True
+
+    def _store(self, peername, asn):
+        self.cache[peername] = asn
+        self.cache.move_to_end(peername)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+    def _read(self, peername):
+        try:
+            return str(self.reader.asn(peername).autonomous_system_number)
+        except (geoip2.errors.AddressNotFoundError, ValueError):
+            return None
+
+    def lookup(self, peername):
+        """
+        Resolve the ASN of `peername` off the loop.
+        :returns: a future with the ASN as a string, or None if it isn't listed
+        """
+        loop = asyncio.get_running_loop()
+        future = self._pending.get(peername)
+        if future is not None:
+            return future
+        future = self._pending[peername] = loop.run_in_executor(None, self._read, peername)
+
+        def done(fut):
+            self._pending.pop(peername, None)
+            if not fut.cancelled() and fut.exception() is None:
+                self._store(peername, fut.result())
+
+        future.add_done_callback(done)
+        return future
@@ -0,0 +1,285 @@
+"""On-demand profiling of the event loop, for the admin endpoints.
+
+Two tools, both time-bounded and meant to be started on a live server:
+
+- `sample_loop` runs a background thread that snapshots the event-loop
+  thread's Python stack every few milliseconds (via `sys._current_frames`)
+  and counts identical stacks. The loop itself is never paused or traced, so
+  the cost is one stack walk per sample. Results render as collapsed stacks
+  (the flamegraph.pl / speedscope text format) or as speedscope JSON.
+- `trace_slow_callbacks` wraps `asyncio.Handle._run` for the duration and
+  records every callback that ran longer than a threshold, with where it came
+  from: a task's coroutine and the line it next suspended at, or the function
+  called. This is asyncio's debug-mode slow callback warning without debug
+  mode's overhead on everything else.
+
+Only one profile or trace runs at a time; starting another raises ServerError.
+`run_profile` and `run_slow_callback_trace` take the admin endpoints' JSON
+options and return their JSON responses; `respond` runs either one for an
+endpoint request, for both the admin panel and the GM panel.
+"""
+
+import asyncio
+import collections
+import functools
+import os
+import sys
+import threading
+import time
+
+from aiohttp import web
+
+from server.exceptions import ServerError
+
+MAX_DURATION = 60.0
+MAX_SLOW_CALLBACKS = 1000
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_active = False
+
+
+def _claim():
+    global _active
+    if _active:
+        raise ServerError("A profile is already running.")
+    _active = True
+
+
+def _release():
+    global _active
+    _active = False
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def _short_path(filename):
+    if filename.startswith(_ROOT):
+        return os.path.relpath(filename, _ROOT)
+    return filename
+
+
+def _frame_key(code):
+    return (_short_path(code.co_filename), getattr(code, "co_qualname", code.co_name), code.co_firstlineno)
+
+
+class LoopProfile:
+    """Stack counts collected by `sample_loop`."""
+
+    def __init__(self, stacks, interval, duration):
+        self.stacks = stacks  # tuple of (file, function, line), outermost first -> count
+        self.interval = interval
+        self.duration = duration
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    @staticmethod
+    def frame_name(frame):
+        filename, function, line = frame
+        return f"{function} ({filename}:{line})"
+
+    def collapsed(self):
+        """One `outer;...;inner count` line per distinct stack, heaviest first."""
+        lines = []
+        for stack, count in self.stacks.most_common():
+            lines.append(";".join(self.frame_name(frame) for frame in stack) + f" {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def speedscope(self, name="KFO-Server event loop"):
+        """The profile as a speedscope "sampled" file (https://www.speedscope.app)."""
+        frames = []
+        index = {}
+        samples = []
+        weights = []
+        ms = self.interval * 1000
+        for stack, count in self.stacks.most_common():
+            sample = []
+            for frame in stack:
+                i = index.get(frame)
+                if i is None:
+                    i = index[frame] = len(frames)
+                    filename, function, line = frame
+                    frames.append({"name": function, "file": filename, "line": line})
+                sample.append(i)
+            samples.append(sample)
+            weights.append(count * ms)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "KFO-Server",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+
+def _sample(thread_id, interval, stop, stacks):
+    current_frames = sys._current_frames
+    while not stop.wait(interval):
+        frame = current_frames().get(thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(_frame_key(frame.f_code))
+            frame = frame.f_back
+        if stack:
+            stack.reverse()
+            stacks[tuple(stack)] += 1
+
+
+async def sample_loop(duration=10.0, interval_ms=5):
+    """
+    Sample the running event loop's stack for `duration` seconds.
+    Must be awaited on the loop being profiled.
+    :returns: a LoopProfile
+    """
+    duration = _clamp(float(duration), 0.1, MAX_DURATION)
+    interval = _clamp(float(interval_ms), 1, 1000) / 1000
+    _claim()
+    try:
+        stacks = collections.Counter()
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=_sample,
+            args=(threading.get_ident(), interval, stop, stacks),
+            name="loop-profiler",
+            daemon=True,
+        )
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            stop.set()
+            sampler.join()
+        return LoopProfile(stacks, interval, time.perf_counter() - start)
+    finally:
+        _release()
+
+
+def callback_source(callback):
+    """Describe a loop callback as `(name, "file:line")`."""
+    while isinstance(callback, functools.partial):
+        callback = callback.func
+    owner = getattr(callback, "__self__", None)
+    if isinstance(owner, asyncio.Task):
+        coro = owner.get_coro()
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        code = getattr(coro, "cr_code", None) or getattr(coro, "gi_code", None)
+        name = f"{owner.get_name()}: {getattr(coro, '__qualname__', repr(coro))}"
+        if frame is not None:
+            return name, f"{_short_path(frame.f_code.co_filename)}:{frame.f_lineno}"
+        if code is not None:
+            return name, f"{_short_path(code.co_filename)}:{code.co_firstlineno}"
+        return name, "?"
+    func = getattr(callback, "__func__", callback)
+    name = getattr(func, "__qualname__", None) or repr(func)
+    protocol = getattr(owner, "_protocol", None)
+    if protocol is not None:
+        # Transport callbacks: the protocol says more than the transport does
+        name = f"{name} -> {type(protocol).__qualname__}"
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return name, "?"
+    return name, f"{_short_path(code.co_filename)}:{code.co_firstlineno}"
+
+
+async def trace_slow_callbacks(duration=10.0, threshold_ms=100):
+    """
+    Record every event-loop callback slower than `threshold_ms` for
+    `duration` seconds.
+    :returns: list of dicts, slowest first (at most MAX_SLOW_CALLBACKS)
+    """
+    duration = _clamp(float(duration), 0.1, MAX_DURATION)
+    threshold = max(0.0, float(threshold_ms)) / 1000
+    _claim()
+    slow = []
+    original = asyncio.events.Handle._run
+
+    def _run(handle):
+        callback = handle._callback
+        start = time.perf_counter()
+        try:
+            original(handle)
+        finally:
+            elapsed = time.perf_counter() - start
+            if elapsed >= threshold and len(slow) < MAX_SLOW_CALLBACKS:
+                name, source = callback_source(callback)
+                slow.append({"callback": name, "source": source, "ms": round(elapsed * 1000, 3), "at": time.time()})
+
+    asyncio.events.Handle._run = _run
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        asyncio.events.Handle._run = original
+        _release()
+    slow.sort(key=lambda entry: entry["ms"], reverse=True)
+    return slow
+
+
+PROFILE_FORMATS = ("speedscope", "collapsed")
+
+
+async def run_profile(options):
+    """
+    Run `sample_loop` from endpoint options
+    `{"duration": s, "interval_ms": ms, "format": "speedscope"|"collapsed"}`.
+    :raises ValueError: on bad options
+    :raises ServerError: if a profile is already running
+    """
+    fmt = options.get("format", "speedscope")
+    if fmt not in PROFILE_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(PROFILE_FORMATS)}")
+    profile = await sample_loop(options.get("duration", 10), options.get("interval_ms", 5))
+    return {
+        "format": fmt,
+        "duration": round(profile.duration, 3),
+        "interval_ms": profile.interval * 1000,
+        "samples": profile.samples,
+        "profile": profile.speedscope() if fmt == "speedscope" else profile.collapsed(),
+    }
+
+
+async def run_slow_callback_trace(options):
+    """
+    Run `trace_slow_callbacks` from endpoint options
+    `{"duration": s, "threshold_ms": ms}`.
+    :raises ValueError: on bad options
+    :raises ServerError: if a profile is already running
+    """
+    duration = _clamp(float(options.get("duration", 10)), 0.1, MAX_DURATION)
+    threshold_ms = float(options.get("threshold_ms", 100))
+    callbacks = await trace_slow_callbacks(duration, threshold_ms)
+    return {"duration": duration, "threshold_ms": threshold_ms, "callbacks": callbacks}
+
+
+async def respond(request, tool):
+    """
+    Run `tool` (`run_profile` or `run_slow_callback_trace`) with the JSON
+    options of an endpoint `request` and answer with its result or error.
+    The caller has already checked that the requester is an admin.
+    """
+    try:
+        options = await request.json()
+    except Exception:
+        options = {}
+    if not isinstance(options, dict):
+        return web.json_response({"error": "invalid_request"}, status=400)
+    try:
+        return web.json_response(await tool(options))
+    except ServerError as ex:
+        return web.json_response({"error": str(ex)}, status=409)
+    except (TypeError, ValueError) as ex:
+        return web.json_response({"error": str(ex)}, status=400)
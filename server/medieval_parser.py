@@ -19,7 +19,9 @@ class MedievalParser:
         self.prepended_words = []
         self.appended_words = []
         self.word_replacements = []
-        self.word_vector = []
+        # Lowercase word -> [(replacement, match_type), ...] in rule order,
+        # see _word_matches for the match types
+        self.word_index = {}
 
         # For pseudo-random word selection
         self._prev_pre = 0
@@ -72,13 +74,17 @@ class MedievalParser:
                 "prev_words": rep_obj.get("prev", []),
             }
 
-            # Add words to the word vector for lookup
-            for word in replacement["words"]:
-                self.word_vector.append(word.lower())
-            for word in replacement["plurals"]:
-                self.word_vector.append(word.lower())
-            for word in replacement["prev_words"]:
-                self.word_vector.append(word.lower())
+            # Lowercase lookup sets, so matching a word is a hash lookup
+            replacement["word_set"] = {word.lower() for word in replacement["words"]}
+            replacement["plural_set"] = {word.lower() for word in replacement["plurals"]}
+            replacement["prev_set"] = {word.lower() for word in replacement["prev_words"]}
+
+            # Index the rule under every word it can match. A word listed as
+            # both singular and plural matches as singular.
+            for word in replacement["plural_set"] - replacement["word_set"]:
+                self.word_index.setdefault(word, []).append((replacement, 2))
+            for word in replacement["word_set"]:
+                self.word_index.setdefault(word, []).append((replacement, 1))
 
             self.word_replacements.append(replacement)
 
@@ -131,14 +137,9 @@ class MedievalParser:
 
         return self.appended_words[self._prev_post]
 
-    def _contains_case_insensitive(self, lst, s):
-        """Check if a string is in a list (case insensitive)."""
-        s_lower = s.lower()
-        return any(item.lower() == s_lower for item in lst)
-
-    def _word_matches(self, rep, word, prev_word):
+    def _word_matches(self, rep, match_type, prev_word):
         """
-        Check if a word matches a replacement rule.
+        Check if a rule indexed under a word applies to it.
         Returns: (match_type, used_prev_word)
         match_type: 0 = no match, 1 = singular match, 2 = plural match
         """
@@ -147,32 +148,22 @@ class MedievalParser:
             if random.randint(1, rep["chance"]) > 1:
                 return (0, False)
 
-        # If it has prev_words, make sure the prev_word matches first
+        # If it has prev_words, make sure the prev_word matches
         if rep["prev_words"]:
-            if (not prev_word or
-                not self._contains_case_insensitive(self.word_vector, prev_word) or
-                not self._contains_case_insensitive(rep["prev_words"], prev_word)):
+            if not prev_word or prev_word.lower() not in rep["prev_set"]:
                 return (0, False)
-            used_prev_word = True
-        else:
-            used_prev_word = False
-
-        # Check match type
-        if self._contains_case_insensitive(rep["words"], word):
-            return (1, used_prev_word)  # singular match
-        elif self._contains_case_insensitive(rep["plurals"], word):
-            return (2, used_prev_word)  # plural match
-        else:
-            return (0, False)
+            return (match_type, True)
+        return (match_type, False)
 
     def _replace_word(self, word, prev_word, symbols=False, word_list_only=False):
         """
         Try to replace a word.
         Returns: (replacement_string, used_prev_word) or (None, False) if no replacement.
         """
-        # First, see if we have a replacement from the word list
-        for rep in self.word_replacements:
-            match_type, used_prev_word = self._word_matches(rep, word, prev_word)
+        # First, see if we have a replacement from the word list. Only the
+        # rules that list this word are tried, still in file order.
+        for rep, match_type in self.word_index.get(word.lower(), ()):
+            match_type, used_prev_word = self._word_matches(rep, match_type, prev_word)
             if match_type == 0:
                 continue
 
@@ -0,0 +1,191 @@
+"""Admission control for AO connections and packets.
+
+Runs in `AOProtocol` ahead of everything else, so a flood is turned away for
+the price of a dict lookup and some arithmetic:
+
+- `admit_connection` is asked in `connection_made`, before a client id is
+  allocated or the database is touched. Each peer IP has a token bucket of
+  new connections, and IPs that were kicked for flooding too often are
+  refused outright for a while.
+- `admit_packet` is asked for every framed packet before its arguments are
+  split or its handler runs. The packet's header picks a rate rule; the
+  packet needs a token from both the connection's bucket and its IPID's
+  (shared by all of that IPID's connections, allowing `ipid_scale` times the
+  rate). Dropped packets are strikes against the connection; when they
+  outrun `strikes.rate`/`strikes.burst` the client is disconnected, and
+  `kicks_to_ban` such kicks within `ban_window` seconds ban the IP for
+  `ban_seconds`.
+
+The floodguards further in (OOC/music/WTCE mutes, `packet_size`) still apply
+to whatever gets through.
+"""
+
+import time
+from collections import OrderedDict
+
+DEFAULT_PACKET_RULES = {
+    "default": {"rate": 20, "burst": 100},
+    "MS": {"rate": 5, "burst": 20},
+    "CT": {"rate": 5, "burst": 20},
+    "MC": {"rate": 3, "burst": 10},
+    "RT": {"rate": 3, "burst": 10},
+    "ZZ": {"rate": 1, "burst": 3},
+}
+
+
+class TokenBucket:
+    """`burst` tokens, refilled at `rate` per second."""
+
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = now
+
+    def take(self, now, cost=1):
+        tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if tokens < cost:
+            self.tokens = tokens
+            return False
+        self.tokens = tokens - cost
+        return True
+
+
+class _Lru(OrderedDict):
+    """An OrderedDict that forgets its least recently used keys past `limit`."""
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+
+    def touch(self, key, default):
+        value = self.get(key)
+        if value is None:
+            value = self[key] = default()
+            while len(self) > self.limit:
+                self.popitem(last=False)
+        else:
+            self.move_to_end(key)
+        return value
+
+
+class ConnectionAdmission:
+    """Per-connection state kept on the `AOProtocol`."""
+
+    __slots__ = ("buckets", "strikes", "dropped")
+
+    def __init__(self, strikes):
+        self.buckets = {}
+        self.strikes = strikes
+        self.dropped = 0
+
+
+class Admission:
+    """Token-bucket rate limits for new connections and incoming packets."""
+
+    # Verdicts of `admit_packet`
+    ACCEPT = 0
+    DROP = 1
+    KICK = 2
+
+    def __init__(self, packets=None, connections=None, ipid_scale=4, strikes=None,
+                 kicks_to_ban=3, ban_window=600, ban_seconds=600, max_tracked=4096,
+                 clock=time.monotonic):
+        self.rules = dict(DEFAULT_PACKET_RULES)
+        self.rules.update(packets or {})
+        self.connection_rule = connections or {"rate": 1, "burst": 10}
+        self.ipid_scale = ipid_scale
+        self.strike_rule = strikes or {"rate": 5, "burst": 100}
+        self.kicks_to_ban = kicks_to_ban
+        self.ban_window = ban_window
+        self.ban_seconds = ban_seconds
+        self.clock = clock
+        self._ip_connections = _Lru(max_tracked)
+        self._ipid_buckets = _Lru(max_tracked)
+        self._kicks = _Lru(max_tracked)
+        self._banned = {}
+
+    @classmethod
+    def from_config(cls, config):
+        """Build admission control from the `admission` config section, or None if disabled."""
+        cfg = config.get("admission") or {}
+        if not cfg.get("enabled", True):
+            return None
+        return cls(
+            packets=cfg.get("packets"),
+            connections=cfg.get("connections"),
+            ipid_scale=cfg.get("ipid_scale", 4),
+            strikes=cfg.get("strikes"),
+            kicks_to_ban=cfg.get("kicks_to_ban", 3),
+            ban_window=cfg.get("ban_window", 600),
+            ban_seconds=cfg.get("ban_seconds", 600),
+        )
+
+    @staticmethod
+    def _bucket(rule, now, scale=1):
+        return TokenBucket(rule["rate"] * scale, rule["burst"] * scale, now)
+
+    def banned_for(self, ip):
+        """Seconds left on `ip`'s flood ban, or 0."""
+        until = self._banned.get(ip)
+        if until is None:
+            return 0
+        left = until - self.clock()
+        if left <= 0:
+            del self._banned[ip]
+            return 0
+        return left
+
+    def admit_connection(self, ip):
+        """Whether a new connection from `ip` may proceed."""
+        if self.banned_for(ip):
+            return False
+        now = self.clock()
+        bucket = self._ip_connections.touch(ip, lambda: self._bucket(self.connection_rule, now))
+        return bucket.take(now)
+
+    def new_connection(self):
+        return ConnectionAdmission(self._bucket(self.strike_rule, self.clock()))
+
+    def admit_packet(self, state, ipid, header):
+        """
+        Charge one `header` packet to a connection and its IPID.
+        :returns: ACCEPT, DROP, or KICK once the connection has used up its strikes
+        """
+        # Keyed by rule, not by the header the client sent: every unknown
+        # header shares the one `default` bucket.
+        key = header if header in self.rules else "default"
+        rule = self.rules[key]
+        now = self.clock()
+        bucket = state.buckets.get(key)
+        if bucket is None:
+            bucket = state.buckets[key] = self._bucket(rule, now)
+        if bucket.take(now):
+            shared = self._ipid_buckets.touch(ipid, dict)
+            ipid_bucket = shared.get(key)
+            if ipid_bucket is None:
+                ipid_bucket = shared[key] = self._bucket(rule, now, self.ipid_scale)
+            if ipid_bucket.take(now):
+                return self.ACCEPT
+        state.dropped += 1
+        if state.strikes.take(now):
+            return self.DROP
+        return self.KICK
+
+    def flood_kicked(self, ip):
+        """
+        Record that `ip` was disconnected for flooding.
+        :returns: True if that earned it a temporary ban
+        """
+        now = self.clock()
+        kicks = [t for t in self._kicks.touch(ip, list) if now - t < self.ban_window]
+        kicks.append(now)
+        self._kicks[ip] = kicks
+        if len(kicks) < self.kicks_to_ban:
+            return False
+        self._kicks.pop(ip, None)
+        self._banned[ip] = now + self.ban_seconds
+        return True
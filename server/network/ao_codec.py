@@ -0,0 +1,86 @@
+"""Encoding and framing of AO2 packets.
+
+A packet is its header and arguments joined by `#`, ending with `#%`. The
+characters `#`, `%`, `$` and `&` may not appear inside an argument and are
+sent as `<num>`, `<percent>`, `<dollar>` and `<and>`. Arguments given as a
+tuple (evidence lists) have each item escaped and are joined with `&`.
+
+Most arguments are integers or text without any of those characters, so both
+directions check for the special characters first and hand those arguments
+back untouched. The rest only get a `str.replace` for each character that is
+actually there, which measures faster in CPython than a single regex or
+`str.translate` pass over the argument.
+"""
+
+
+def escape(arg):
+    """`arg` as packet text, with the reserved characters escaped."""
+    kind = type(arg)
+    if kind is int:
+        return str(arg)
+    text = arg if kind is str else str(arg)
+    if "#" in text:
+        text = text.replace("#", "<num>")
+    if "%" in text:
+        text = text.replace("%", "<percent>")
+    if "$" in text:
+        text = text.replace("$", "<dollar>")
+    if "&" in text:
+        text = text.replace("&", "<and>")
+    return text
+
+
+def unescape(text):
+    """Undo `escape`: turn `<num>`, `<percent>`, `<dollar>` and `<and>` back into characters."""
+    if "<" not in text:
+        return text
+    if "<num>" in text:
+        text = text.replace("<num>", "#")
+    if "<percent>" in text:
+        text = text.replace("<percent>", "%")
+    if "<dollar>" in text:
+        text = text.replace("<dollar>", "$")
+    if "<and>" in text:
+        text = text.replace("<and>", "&")
+    return text
+
+
+def escape_args(args):
+    """Escape every argument, keeping tuples as tuples of escaped items."""
+    return [
+        tuple([escape(item) for item in arg]) if type(arg) is tuple else escape(arg)
+        for arg in args
+    ]
+
+
+def encode_frame(header, args):
+    """The packet text for `header` and `args`, e.g. `CT#name#hi#%`."""
+    parts = [header]
+    for arg in args:
+        if type(arg) is tuple:
+            # AO2 evidence packet uses & to separate pieces of evidence
+            parts.append("&".join([escape(item) for item in arg]))
+        else:
+            parts.append(escape(arg))
+    parts.append("%")
+    return "#".join(parts)
+
+
+def build_frame(header, args):
+    """`encode_frame` as the UTF-8 bytes that go on the wire."""
+    return encode_frame(header, args).encode("utf-8")
+
+
+def split_frames(buffer):
+    """
+    Split the complete packets off the front of `buffer`.
+    :returns: (list of packet texts without the `#%` terminator, leftover partial packet)
+    """
+    *frames, rest = buffer.split("#%")
+    return frames, rest
+
+
+def parse_frame(frame):
+    """Split a packet text into its header and list of (still escaped) arguments."""
+    header, *args = frame.split("#")
+    return header, args
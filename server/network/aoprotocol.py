@@ -1,7 +1,10 @@
 from .. import commands
 from server.constants import dezalgo, censor, contains_URL, derelative
 from server.exceptions import ClientError, AreaError, ArgumentError, ServerError
-from server import database
+from server.network import ao_codec
+from server.network.admission import Admission
+from server.network.ic_message import decode_ms
+from server import database, handoff, stall_watchdog
 import time
 import arrow
 from enum import Enum
@@ -25,12 +28,16 @@ class AOProtocol(asyncio.Protocol):
         INT = (3,)
         INT_OR_STR = 3
 
-    def __init__(self, server):
+    def __init__(self, server, session=None):
         super().__init__()
         self.server = server
         self.client = None
         self.buffer = ""
         self.ping_timeout = None
+        # Per-connection rate limit state, see server/network/admission.py
+        self.admission = None
+        # Client session handed over by the previous server process, see server/handoff.py
+        self.session = session
 
     def data_received(self, data):
         """Handles any data received from the network.
@@ -47,29 +54,44 @@ class AOProtocol(asyncio.Protocol):
         if buf is None:
             buf = b""
 
+        packet_trace = getattr(self.server, "packet_trace", None)
         if not isinstance(buf, str):
             # try to decode as utf-8, ignore any erroneous characters
-            buf = self.buffer + buf.decode("utf-8", "ignore")
+            buf = buf.decode("utf-8", "ignore")
+            if packet_trace is not None:
+                packet_trace.inbound(self.client, buf)
+            buf = self.buffer + buf
+        elif packet_trace is not None:
+            packet_trace.inbound(self.client, buf)
 
         buf = buf.translate({ord(c): None for c in "\0"})
 
-        packet_size = 1024  # in bits
-        if "packet_size" in self.server.config:
-            packet_size = self.server.config["packet_size"]
-
-        if len(buf) > packet_size * 8:  # convert bits to bytes
+        if len(buf) > self.server.settings.packet_size * 8:  # convert bits to bytes
             self.client.send_ooc(
                 "Your last action was dropped because it was too big! Contact the server administrator for more information."
             )
             logger.debug("Buffer overflow from %s with %s", ipid, len(buf))
             return
         self.buffer = buf
+        admission = self.admission if not self.client.is_mod else None
         for msg in self.get_messages():
             if len(msg) < 2:
                 continue
+            if admission is not None:
+                verdict = self.server.admission.admit_packet(admission, ipid, msg.partition("#")[0])
+                if verdict == Admission.DROP:
+                    continue
+                if verdict == Admission.KICK:
+                    self.flood_kick()
+                    return
             try:
-                cmd, *args = msg.split("#")
-                self.net_cmd_dispatcher[cmd](self, args)
+                cmd, args = ao_codec.parse_frame(msg)
+                handler = self.net_cmd_dispatcher[cmd]
+                stall_watchdog.enter(handler.__name__, self.client)
+                try:
+                    handler(self, args)
+                finally:
+                    stall_watchdog.leave()
             except KeyError:
                 logger.debug(
                     "Unknown incoming message from %s: %s", ipid, msg)
@@ -85,12 +107,44 @@ class AOProtocol(asyncio.Protocol):
 
         :param transport: the transport object
         """
+        admission = getattr(self.server, "admission", None)
+        if self.session is not None:
+            # Already admitted and through the handshake in the previous process
+            if admission is not None:
+                self.admission = admission.new_connection()
+            try:
+                self.client = handoff.resume_client(self.server, self, transport, self.session)
+            except ClientError:
+                logger.exception("Could not resume a handed over client")
+                transport.close()
+                return
+            finally:
+                self.session = None
+            self.ping_timeout = asyncio.get_running_loop().call_later(
+                self.server.settings.timeout, self.client.disconnect
+            )
+            return
+        if admission is not None:
+            peer = transport.get_extra_info("peername")[0]
+            if not admission.admit_connection(peer):
+                if admission.banned_for(peer):
+                    transport.write(b"BD#Flooding\r\nUntil: a few minutes#%")
+                logger.debug("Connection from %s refused by rate limit", peer)
+                transport.close()
+                return
+            self.admission = admission.new_connection()
+
         try:
             self.client = self.server.new_client(transport)
         except ClientError:
             print(traceback.format_exc())
             transport.close()
             return
+        self.client.protocol = self
+
+        packet_trace = getattr(self.server, "packet_trace", None)
+        if packet_trace is not None:
+            packet_trace.opened(self.client, transport.get_extra_info("peername")[0])
 
         if not self.server.client_manager.new_client_preauth(self.client):
             self.client.send_command(
@@ -103,7 +157,7 @@ class AOProtocol(asyncio.Protocol):
         # Client needs to send CHECK#% within the timeout - otherwise,
         # it will be automatically dropped.
         self.ping_timeout = asyncio.get_running_loop().call_later(
-            self.server.config["timeout"], self.client.disconnect
+            self.server.settings.timeout, self.client.disconnect
         )
 
         # Disables fantacrypt for clients older than 2.9, required for AO2-Client to send HDID.
@@ -117,20 +171,40 @@ class AOProtocol(asyncio.Protocol):
         """
         if self.client is not None:
             logger.debug("%s disconnected.", self.client.ipid)
+            packet_trace = getattr(self.server, "packet_trace", None)
+            if packet_trace is not None:
+                packet_trace.closed(self.client)
             self.server.remove_client(self.client)
         if self.ping_timeout is not None:
             self.ping_timeout.cancel()
 
+    def flood_kick(self):
+        """Disconnect a client that kept sending packets over its rate limits."""
+        peer = self.client.transport.get_extra_info("peername")[0]
+        banned = self.server.admission.flood_kicked(peer)
+        database.log_misc(
+            "flood_kick", self.client,
+            data={"dropped": self.admission.dropped, "banned": banned},
+        )
+        self.client.send_command("KK", "You were disconnected for flooding the server.")
+        self.client.disconnect()
+
     def get_messages(self):
-        """Parses out full messages from the buffer.
+        """Parses out full messages from the buffer, leaving any partial one in it.
 
-        :return: yields messages
+        :return: list of messages
 
         """
-        while "#%" in self.buffer:
-            spl = self.buffer.split("#%", 1)
-            self.buffer = spl[1]
-            yield spl[0]
+        messages, self.buffer = ao_codec.split_frames(self.buffer)
+        return messages
+
+    def has_char_or_privileges(self):
+        """Whether the client picked a character, or may act without one (mods and area owners)."""
+        return (
+            (self.client.char_id is not None and self.client.char_id != -1)
+            or self.client.is_mod
+            or self.client in self.client.area.owners
+        )
 
     def validate_net_cmd(self, args, *types, needs_auth=True):
         """Makes sure the net command's arguments match expectations.
@@ -142,7 +216,7 @@ class AOProtocol(asyncio.Protocol):
         :returns: returns True if message was validated
 
         """
-        if needs_auth and (self.client.char_id is None or self.client.char_id == -1) and not self.client.is_mod and self.client not in self.client.area.owners:
+        if needs_auth and not self.has_char_or_privileges():
             return False
         if len(args) != len(types):
             return False
@@ -242,8 +316,8 @@ class AOProtocol(asyncio.Protocol):
                 self.client.has_multilayer_audio = True
 
         # Send Asset packet if asset_url is defined
-        if self.server.config["asset_url"] != "":
-            self.client.send_command("ASS", self.server.config["asset_url"])
+        if self.server.settings.asset_url != "":
+            self.client.send_command("ASS", self.server.settings.asset_url)
 
     def net_cmd_ch(self, _):
         """Reset the client drop timeout (keepalive).
@@ -253,7 +327,7 @@ class AOProtocol(asyncio.Protocol):
         self.client.send_command("CHECK")
         self.ping_timeout.cancel()
         self.ping_timeout = asyncio.get_running_loop().call_later(
-            self.server.config["timeout"], self.client.disconnect
+            self.server.settings.timeout, self.client.disconnect
         )
 
         # Update the timers thru handshake as well to make sure they're always in sync
@@ -358,353 +432,51 @@ class AOProtocol(asyncio.Protocol):
             self.client.send_ooc("You are muted by a moderator.")
             return
 
-        showname = ""
-        charid_pair = -1
-        offset_pair = 0
-        nonint_pre = 0
-        sfx_looping = "0"
-        screenshake = 0
-        frames_shake = ""
-        frames_realization = ""
-        frames_sfx = ""
-        additive = 0
-        effect = ""
-        pair_order = 0
-        third_charid = -1
-        video = ""
-        if self.validate_net_cmd(
-            args,
-            self.ArgType.STR,  # msg_type
-            self.ArgType.STR_OR_EMPTY,
-            self.ArgType.STR,  # pre, folder
-            self.ArgType.STR_OR_EMPTY,
-            self.ArgType.STR_OR_EMPTY,  # anim, text
-            self.ArgType.STR,
-            self.ArgType.STR,  # pos, sfx
-            self.ArgType.INT,
-            self.ArgType.INT,  # emote_mod, cid
-            self.ArgType.INT,
-            self.ArgType.INT_OR_STR,  # sfx_delay, button
-            self.ArgType.INT,
-            self.ArgType.INT,  # evidence, flip
-            self.ArgType.INT,
-            self.ArgType.INT,  # ding, color
-        ):
-            # Pre-2.6 validation monstrosity.
-            (
-                msg_type,
-                pre,
-                folder,
-                anim,
-                text,
-                pos,
-                sfx,
-                emote_mod,
-                cid,
-                sfx_delay,
-                button,
-                evidence,
-                flip,
-                ding,
-                color,
-            ) = args
-        elif self.validate_net_cmd(
-            args,
-            self.ArgType.STR,  # msg_type
-            self.ArgType.STR_OR_EMPTY,
-            self.ArgType.STR,  # pre, folder
-            self.ArgType.STR_OR_EMPTY,
-            self.ArgType.STR_OR_EMPTY,  # anim, text
-            self.ArgType.STR,
-            self.ArgType.STR,  # pos, sfx
-            self.ArgType.INT,
-            self.ArgType.INT,  # emote_mod, cid
-            self.ArgType.INT,
-            self.ArgType.INT_OR_STR,  # sfx_delay, button
-            self.ArgType.INT,
-            self.ArgType.INT,  # evidence, flip
-            self.ArgType.INT,
-            self.ArgType.INT,  # ding, color
-            self.ArgType.STR_OR_EMPTY,  # DRO Showname
-            self.ArgType.STR_OR_EMPTY,  # DRO Video
-            self.ArgType.INT,  # 0 or 1, DRO hide_character
-        ):
-            # DRO1.1.0 validation monstrosity.
-            (
-                msg_type, # 0
-                pre, # 1
-                folder, # 2
-                anim, # 3
-                text, # 4
-                pos, # 5
-                sfx, # 6
-                emote_mod, # 7
-                cid, # 8
-                sfx_delay, # 9
-                button, # 10
-                evidence, # 11
-                flip, # 12
-                ding, # 13
-                color, # 14
-                showname, # 15
-                video, # 16
-                blankpost, # 17
-            ) = args
-        elif self.validate_net_cmd(
-            args,
-            self.ArgType.STR,
-            self.ArgType.STR_OR_EMPTY,  # msg_type, pre
-            self.ArgType.STR,
-            self.ArgType.STR_OR_EMPTY,
-            self.ArgType.STR_OR_EMPTY,  # folder, anim, text
-            self.ArgType.STR,
-            self.ArgType.STR,
-            self.ArgType.INT,  # pos, sfx, emote_mod
-            self.ArgType.INT,
-            self.ArgType.INT,
-            self.ArgType.INT_OR_STR,  # cid, sfx_delay, button
-            self.ArgType.INT,
-            self.ArgType.INT,
-            self.ArgType.INT,  # evidence, flip, ding
-            self.ArgType.INT,
-            self.ArgType.STR_OR_EMPTY,
-            self.ArgType.INT,  # color, showname, charid_pair
-            self.ArgType.INT,
-            self.ArgType.INT,  # offset_pair, nonint_pre
-        ):
-            # 2.6 validation monstrosity.
-            (
-                msg_type,
-                pre,
-                folder,
-                anim,
-                text,
-                pos,
-                sfx,
-                emote_mod,
-                cid,
-                sfx_delay,
-                button,
-                evidence,
-                flip,
-                ding,
-                color,
-                showname,
-                charid_pair,
-                offset_pair,
-                nonint_pre,
-            ) = args
-        elif self.validate_net_cmd(
-            args,
-            self.ArgType.STR, # 0 # msg_type
-            self.ArgType.STR_OR_EMPTY, # 1  # pre
-            self.ArgType.STR, # 2 # folder
-            self.ArgType.STR_OR_EMPTY, # 3 # anim
-            self.ArgType.STR_OR_EMPTY, # 4  # text
-            self.ArgType.STR, # 5 # pos
-            self.ArgType.STR, # 6 # sfx
-            self.ArgType.INT, # 7 # emote_mod
-            self.ArgType.INT, # 8 # cid
-            self.ArgType.INT, # 9 # sfx_delay
-            self.ArgType.INT_OR_STR, # 10 # button
-            self.ArgType.INT, # 11 # evidence
-            self.ArgType.INT, # 12 # flip
-            self.ArgType.INT, # 13 # ding
-            self.ArgType.INT, # 14 # color
-            self.ArgType.STR_OR_EMPTY, # 15 # showname
-            self.ArgType.STR, # 16 # charid_pair
-            self.ArgType.STR, # 17 # offset_pair
-            self.ArgType.INT, # 18 # nonint_pre
-            self.ArgType.STR, # 19 # sfx_looping
-            self.ArgType.INT, # 20 # screenshake
-            self.ArgType.STR, # 21 # frames_shake
-            self.ArgType.STR, # 22 # frames_realization
-            self.ArgType.STR, # 23 # frames_sfx
-            self.ArgType.INT, # 24 # additive
-            self.ArgType.STR, # 25  # effect
-        ):
-            # 2.8 validation monstrosity. (rip 2.7)
-            (
-                msg_type,
-                pre,
-                folder,
-                anim,
-                text,
-                pos,
-                sfx,
-                emote_mod,
-                cid,
-                sfx_delay,
-                button,
-                evidence,
-                flip,
-                ding,
-                color,
-                showname,
-                charid_pair,
-                offset_pair,
-                nonint_pre,
-                sfx_looping,
-                screenshake,
-                frames_shake,
-                frames_realization,
-                frames_sfx,
-                additive,
-                effect,
-            ) = args
-            try:
-                pair_args = charid_pair.split("^")
-                charid_pair = int(pair_args[0])
-                if len(pair_args) > 1:
-                    pair_order = pair_args[1]
-            except ValueError:
-                self.client.send_ooc(
-                    "Something went wrong! Please report the issue to the developers.")
-                return
-        elif self.validate_net_cmd(
-            args,
-            self.ArgType.STR, # 0 # msg_type
-            self.ArgType.STR_OR_EMPTY, # 1  # pre
-            self.ArgType.STR, # 2 # folder
-            self.ArgType.STR_OR_EMPTY, # 3 # anim
-            self.ArgType.STR_OR_EMPTY, # 4  # text
-            self.ArgType.STR, # 5 # pos
-            self.ArgType.STR, # 6 # sfx
-            self.ArgType.INT, # 7 # emote_mod
-            self.ArgType.INT, # 8 # cid
-            self.ArgType.INT, # 9 # sfx_delay
-            self.ArgType.INT_OR_STR, # 10 # button
-            self.ArgType.INT, # 11 # evidence
-            self.ArgType.INT, # 12 # flip
-            self.ArgType.INT, # 13 # ding
-            self.ArgType.INT, # 14 # color
-            self.ArgType.STR_OR_EMPTY, # 15 # showname
-            self.ArgType.STR, # 16 # charid_pair
-            self.ArgType.STR, # 17 # offset_pair
-            self.ArgType.INT, # 18 # nonint_pre
-            self.ArgType.STR, # 19 # sfx_looping
-            self.ArgType.INT, # 20 # screenshake
-            self.ArgType.STR, # 21 # frames_shake
-            self.ArgType.STR, # 22 # frames_realization
-            self.ArgType.STR, # 23 # frames_sfx
-            self.ArgType.INT, # 24 # additive
-            self.ArgType.STR, # 25 # effect
-            self.ArgType.INT, # 26 # third_charid
-        ):
-            # AO Golden validation monstrosity
-            (
-                msg_type,
-                pre,
-                folder,
-                anim,
-                text,
-                pos,
-                sfx,
-                emote_mod,
-                cid,
-                sfx_delay,
-                button,
-                evidence,
-                flip,
-                ding,
-                color,
-                showname,
-                charid_pair,
-                offset_pair,
-                nonint_pre,
-                sfx_looping,
-                screenshake,
-                frames_shake,
-                frames_realization,
-                frames_sfx,
-                additive,
-                effect,
-                third_charid,
-            ) = args
-            try:
-                pair_args = charid_pair.split("^")
-                charid_pair = int(pair_args[0])
-                if len(pair_args) > 1:
-                    pair_order = pair_args[1]
-            except ValueError:
-                self.client.send_ooc(
-                    "Something went wrong! Please report the issue to the developers.")
-                return
-        elif self.validate_net_cmd(
-            args,
-            self.ArgType.STR, # 0 # msg_type
-            self.ArgType.STR_OR_EMPTY, # 1  # pre
-            self.ArgType.STR, # 2 # folder
-            self.ArgType.STR_OR_EMPTY, # 3 # anim
-            self.ArgType.STR_OR_EMPTY, # 4  # text
-            self.ArgType.STR, # 5 # pos
-            self.ArgType.STR, # 6 # sfx
-            self.ArgType.INT, # 7 # emote_mod
-            self.ArgType.INT, # 8 # cid
-            self.ArgType.INT, # 9 # sfx_delay
-            self.ArgType.INT_OR_STR, # 10 # button
-            self.ArgType.INT, # 11 # evidence
-            self.ArgType.INT, # 12 # flip
-            self.ArgType.INT, # 13 # ding
-            self.ArgType.INT, # 14 # color
-            self.ArgType.STR_OR_EMPTY, # 15 # showname
-            self.ArgType.STR, # 16 # charid_pair
-            self.ArgType.STR, # 17 # offset_pair
-            self.ArgType.INT, # 18 # nonint_pre
-            self.ArgType.STR, # 19 # sfx_looping
-            self.ArgType.INT, # 20 # screenshake
-            self.ArgType.STR, # 21 # frames_shake
-            self.ArgType.STR, # 22 # frames_realization
-            self.ArgType.STR, # 23 # frames_sfx
-            self.ArgType.INT, # 24 # additive
-            self.ArgType.STR, # 25 # effect
-            self.ArgType.INT, # 26 # third_charid
-            self.ArgType.STR_OR_EMPTY, # 27 # video
-        ):
-            # KFO Client validation monstrosity
-            (
-                msg_type,
-                pre,
-                folder,
-                anim,
-                text,
-                pos,
-                sfx,
-                emote_mod,
-                cid,
-                sfx_delay,
-                button,
-                evidence,
-                flip,
-                ding,
-                color,
-                showname,
-                charid_pair,
-                offset_pair,
-                nonint_pre,
-                sfx_looping,
-                screenshake,
-                frames_shake,
-                frames_realization,
-                frames_sfx,
-                additive,
-                effect,
-                third_charid,
-                video,
-            ) = args
+        if not self.has_char_or_privileges():
+            ic = None
+        else:
             try:
-                pair_args = charid_pair.split("^")
-                charid_pair = int(pair_args[0])
-                if len(pair_args) > 1:
-                    pair_order = pair_args[1]
+                ic = decode_ms(args)
             except ValueError:
                 self.client.send_ooc(
                     "Something went wrong! Please report the issue to the developers.")
                 return
-        else:
+        if ic is None:
             self.client.send_ooc(
                 f"Something went wrong! Please report this to the developers:\n{args}")
             return
+        (
+            msg_type,
+            pre,
+            folder,
+            anim,
+            text,
+            pos,
+            sfx,
+            emote_mod,
+            cid,
+            sfx_delay,
+            button,
+            evidence,
+            flip,
+            ding,
+            color,
+            showname,
+            charid_pair,
+            offset_pair,
+            nonint_pre,
+            sfx_looping,
+            screenshake,
+            frames_shake,
+            frames_realization,
+            frames_sfx,
+            additive,
+            effect,
+            third_charid,
+            video,
+            pair_order,
+            blankpost,
+        ) = ic
         # Targets for whispering
         whisper_clients = None
 
@@ -739,7 +511,7 @@ class AOProtocol(asyncio.Protocol):
             self.client.send_ooc(
                 "You may not iniswap while you are charcursed!")
             return
-        if (self.server.config["block_relative"]):
+        if self.server.settings.block_relative:
             pre = derelative(pre)
             anim = derelative(anim)
             folder = derelative(folder)
@@ -931,19 +703,13 @@ class AOProtocol(asyncio.Protocol):
                 emote_mod = 5
             # New clients do it in a specific objection message area.
             button = 0
-        max_char = 0
-        try:
-            max_char = int(self.server.config["max_chars_ic"])
-        except Exception:
-            max_char = 256
-
-        if len(text) > max_char:
+        if len(text) > self.server.settings.max_chars_ic:
             self.client.send_ooc("Your message is too long!")
             return
 
         # Really simple spam protection that functions on the clientside pre-2.8.5, and really should've been serverside from the start
         if (
-            self.server.config["block_repeat"]
+            self.server.settings.block_repeat
             and not self.client.is_mod
             and not (self.client in self.client.area.owners)
             and text.strip() != ""
@@ -1116,10 +882,9 @@ class AOProtocol(asyncio.Protocol):
 
         confirmed = False
         if charid_pair > -1:
-            for target in self.client.area.clients:
+            for target in self.client.area.clients_with_char(self.client.charid_pair):
                 if (
                     not confirmed
-                    and target.char_id == self.client.charid_pair
                     and (
                         target.charid_pair == self.client.char_id
                         or target.third_charid == self.client.char_id
@@ -1141,10 +906,9 @@ class AOProtocol(asyncio.Protocol):
 
         third_confirmed = False
         if third_charid > -1:
-            for target in self.client.area.clients:
+            for target in self.client.area.clients_with_char(self.client.third_charid):
                 if (
                     not third_confirmed
-                    and target.char_id == self.client.third_charid
                     and (
                         target.charid_pair == self.client.char_id
                         or target.third_charid == self.client.char_id
@@ -1164,8 +928,7 @@ class AOProtocol(asyncio.Protocol):
             third_charid = -1
 
         if self.client.area.auto_pair:
-            clients_pos = [c for c in self.client.area.clients if c.pos == self.client.pos]
-            clients_pos.sort(key=lambda x: x.id)
+            clients_pos = self.client.area.clients_at_pos(self.client.pos)
             if len(clients_pos) >= 3 and self.client.area.auto_pair_max == "triple":
                 position = clients_pos.index(self.client)
                 if len(clients_pos) >= position+2:
@@ -1373,8 +1136,7 @@ class AOProtocol(asyncio.Protocol):
             ):
                 # Discord Bridgebot
                 if (
-                    "bridgebot" in self.server.config
-                    and self.server.config["bridgebot"]["enabled"]
+                    self.server.settings.bridgebot is not None
                     and self.server.bridgebot
                     and self.client.area.area_manager.id == self.server.bridgebot.hub_id
                     and self.client.area.id == self.server.bridgebot.area_id
@@ -1586,6 +1348,19 @@ class AOProtocol(asyncio.Protocol):
         if old_showname != self.client.showname or self.client.sneaking:
             self.client.area.broadcast_player_list()
 
+    def _command_failed(self, ex):
+        if isinstance(ex, (ClientError, AreaError, ArgumentError, ServerError)):
+            self.client.send_ooc(ex)
+            return
+        self.client.send_ooc(
+            f"An internal error occurred: {ex}. Please inform the staff of the server about the issue."
+        )
+        logger.error("Exception while running a command", exc_info=ex)
+
+    def _command_finished(self, pending):
+        if not pending.cancelled() and pending.exception() is not None:
+            self._command_failed(pending.exception())
+
     def net_cmd_ct(self, args):
         """OOC Message
 
@@ -1625,7 +1400,7 @@ class AOProtocol(asyncio.Protocol):
                     "You cannot use format characters in your name!")
                 return
         if (
-            args[0].startswith(self.server.config["hostname"])
+            args[0].startswith(self.server.settings.hostname)
             or args[0].startswith("<dollar>G")
             or args[0].startswith("<dollar>M")
         ):
@@ -1689,22 +1464,16 @@ class AOProtocol(asyncio.Protocol):
             if len(spl) == 2:
                 arg = spl[1][:1024]
             try:
-                commands.call(self.client, cmd, arg)
-            except (ClientError, AreaError, ArgumentError, ServerError) as ex:
-                self.client.send_ooc(ex)
+                pending = commands.call(self.client, cmd, arg, paged=True)
             except Exception as ex:
-                self.client.send_ooc(
-                    f"An internal error occurred: {ex}. Please inform the staff of the server about the issue."
-                )
-                logger.exception("Exception while running a command")
+                self._command_failed(ex)
+                return
+            if pending is not None:
+                # A sliced command is still running; report its errors when it ends
+                pending.add_done_callback(self._command_finished)
             return
 
-        max_char = 0
-        try:
-            max_char = int(self.server.config["max_chars"])
-        except Exception:
-            max_char = 256
-        if len(args[1]) > max_char:
+        if len(args[1]) > self.server.settings.max_chars:
             self.client.send_ooc("Your message is too long!")
             return
 
@@ -1728,16 +1497,16 @@ class AOProtocol(asyncio.Protocol):
         )
         webname = f"(OOC) [{self.client.id}] {name}"
         # Discord Bridgebot
+        bridgebot = self.server.settings.bridgebot
         if (
-            "bridgebot" in self.server.config
-            and self.server.config["bridgebot"]["enabled"]
+            bridgebot is not None
+            and bridgebot.ooc_chat
             and self.client.area.area_manager.id == self.server.bridgebot.hub_id
             and self.client.area.id == self.server.bridgebot.area_id
         ):
-            if "ooc_chat" in self.server.config["bridgebot"] and self.server.config["bridgebot"]["ooc_chat"]:
-                self.server.bridgebot.queue_message(
-                    webname, args[1]
-                )
+            self.server.bridgebot.queue_message(
+                webname, args[1]
+            )
 
     def net_cmd_mc(self, args):
         """Play music.
@@ -1758,22 +1527,10 @@ class AOProtocol(asyncio.Protocol):
                 preflist = self.client.server.supported_features.copy()
                 preflist.remove("arup")
                 self.client.send_command("FL", *preflist)
-                for hub in self.client.server.hub_manager.hubs:
-                    count = 0
-                    for c in hub.clients:
-                        if not c.area.hide_clients and not c.hidden:
-                            count = count + 1
-                    hub.count = count
-                self.client.send_command(
-                    "FA",
-                    *[
-                        "🌐 Hubs 🌐\n Double-Click me to see Areas\n  _______",
-                        *[
-                            f"[{hub.id}] {hub.name} (users: {hub.count})"
-                            for hub in self.client.server.hub_manager.hubs
-                        ],
-                    ],
-                )
+                hub_manager = self.client.server.hub_manager
+                for hub in hub_manager.hubs:
+                    hub.update_count()
+                self.client.send_raw_message(hub_manager.hub_list_message())
                 return
             if args[0].split("\n")[0] == "🌐 Hubs 🌐":
                 # self.client.send_ooc('Switching to the list of Areas...')
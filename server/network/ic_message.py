@@ -0,0 +1,176 @@
+"""Table-driven decoder for the MS (IC message) packet.
+
+Every client generation sends MS with a different number of arguments, and no
+two layouts share an argument count, so the layout is picked with a single
+dict lookup instead of trying each one in turn. Each layout is compiled once
+into `(slot, kind)` pairs; decoding walks the arguments once, checking
+emptiness and converting integers as it goes, and returns an `IcMessage`
+with the fields the client did not send left at their defaults.
+"""
+
+from collections import namedtuple
+
+# Field kinds
+STR = 0  # must not be empty
+STR_OR_EMPTY = 1
+INT = 2
+
+IcMessage = namedtuple(
+    "IcMessage",
+    (
+        "msg_type",
+        "pre",
+        "folder",
+        "anim",
+        "text",
+        "pos",
+        "sfx",
+        "emote_mod",
+        "cid",
+        "sfx_delay",
+        "button",
+        "evidence",
+        "flip",
+        "ding",
+        "color",
+        "showname",
+        "charid_pair",
+        "offset_pair",
+        "nonint_pre",
+        "sfx_looping",
+        "screenshake",
+        "frames_shake",
+        "frames_realization",
+        "frames_sfx",
+        "additive",
+        "effect",
+        "third_charid",
+        "video",
+        "pair_order",
+        "blankpost",
+    ),
+    defaults=(
+        "",  # showname
+        -1,  # charid_pair
+        0,  # offset_pair
+        0,  # nonint_pre
+        "0",  # sfx_looping
+        0,  # screenshake
+        "",  # frames_shake
+        "",  # frames_realization
+        "",  # frames_sfx
+        0,  # additive
+        "",  # effect
+        -1,  # third_charid
+        "",  # video
+        0,  # pair_order
+        0,  # blankpost
+    ),
+)
+IcMessage.__doc__ = "A decoded MS packet. Fields the client's layout lacks hold their defaults."
+
+_BASE = (
+    ("msg_type", STR),
+    ("pre", STR_OR_EMPTY),
+    ("folder", STR),
+    ("anim", STR_OR_EMPTY),
+    ("text", STR_OR_EMPTY),
+    ("pos", STR),
+    ("sfx", STR),
+    ("emote_mod", INT),
+    ("cid", INT),
+    ("sfx_delay", INT),
+    ("button", STR),  # kept as a string, shouts may carry "<and>" suffixes
+    ("evidence", INT),
+    ("flip", INT),
+    ("ding", INT),
+    ("color", INT),
+)
+
+_AO28 = _BASE + (
+    ("showname", STR_OR_EMPTY),
+    ("charid_pair", STR),  # "<charid>^<pair_order>"
+    ("offset_pair", STR),
+    ("nonint_pre", INT),
+    ("sfx_looping", STR),
+    ("screenshake", INT),
+    ("frames_shake", STR),
+    ("frames_realization", STR),
+    ("frames_sfx", STR),
+    ("additive", INT),
+    ("effect", STR),
+)
+
+# Layout name, fields, and whether charid_pair carries a "^pair_order" suffix.
+LAYOUTS = (
+    ("pre-2.6", _BASE, False),
+    (
+        "DRO 1.1",
+        _BASE + (
+            ("showname", STR_OR_EMPTY),
+            ("video", STR_OR_EMPTY),
+            ("blankpost", INT),
+        ),
+        False,
+    ),
+    (
+        "2.6",
+        _BASE + (
+            ("showname", STR_OR_EMPTY),
+            ("charid_pair", INT),
+            ("offset_pair", INT),
+            ("nonint_pre", INT),
+        ),
+        False,
+    ),
+    ("2.8", _AO28, True),
+    ("AO Golden", _AO28 + (("third_charid", INT),), True),
+    ("KFO", _AO28 + (("third_charid", INT), ("video", STR_OR_EMPTY)), True),
+)
+
+
+class _Schema:
+    __slots__ = ("name", "fields", "split_pair")
+
+    def __init__(self, name, fields, split_pair):
+        self.name = name
+        self.fields = tuple((IcMessage._fields.index(field), kind) for field, kind in fields)
+        self.split_pair = split_pair
+
+
+SCHEMAS = {len(fields): _Schema(name, fields, split_pair) for name, fields, split_pair in LAYOUTS}
+_DEFAULTS = (None,) * (len(IcMessage._fields) - len(IcMessage._field_defaults)) + tuple(
+    IcMessage._field_defaults.values()
+)
+_CHARID_PAIR = IcMessage._fields.index("charid_pair")
+_PAIR_ORDER = IcMessage._fields.index("pair_order")
+
+
+def decode_ms(args):
+    """
+    Decode the arguments of an MS packet.
+    :param args: the packet's arguments, as split off the wire
+    :returns: an `IcMessage`, or None if no layout matches
+    :raises ValueError: if the layout matches but charid_pair is malformed
+
+    """
+    schema = SCHEMAS.get(len(args))
+    if schema is None:
+        return None
+    values = list(_DEFAULTS)
+    for (slot, kind), arg in zip(schema.fields, args):
+        if kind == INT:
+            try:
+                values[slot] = int(arg)
+            except ValueError:
+                return None
+        elif kind == STR and arg == "":
+            return None
+        else:
+            values[slot] = arg
+    if schema.split_pair:
+        pair_args = values[_CHARID_PAIR].split("^")
+        values[_CHARID_PAIR] = int(pair_args[0])
+        if len(pair_args) > 1:
+            values[_PAIR_ORDER] = pair_args[1]
+    return IcMessage._make(values)
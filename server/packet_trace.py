@@ -0,0 +1,217 @@
+"""Opt-in capture of raw AO traffic for offline replay.
+
+When `packet_trace.enabled` is set in config.yaml, every connection's inbound
+chunks (as handed to `AOProtocol.data_received`) and outbound frames (as
+written by `Client.send_raw_message`) are appended to a trace file. The file
+holds one JSON array per line:
+
+    {"trace": 1, "started": <unix time>, "server": <version>}   header
+    [ms, conn, "+", "<anonymized ip>"]                          connection opened
+    [ms, conn, "<", "<data>"]                                   client -> server
+    [ms, conn, ">", "<data>"]                                   server -> client
+    [ms, conn, "-", ""]                                         connection closed
+
+`ms` is milliseconds since the trace started and `conn` is a per-trace
+connection number (client ids get reused, these don't). Files rotate by size
+like the server log: `packets.trace`, `packets.trace.1`, ... with the header
+repeated at the top of each file. A server restart starts a new file, so a
+set of rotated files may span several runs; `read_trace` tells them apart by
+the header's start time.
+
+IP addresses never reach the disk: the peer address is replaced with a keyed
+hash, and any IPv4 or IPv6 address inside a payload is replaced the same
+way. The key is `anonymize_salt` if configured, otherwise
+random per trace, so tokens only line up within one capture.
+
+`scripts/replay_trace.py` plays a trace back against a fresh server.
+"""
+
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import re
+import secrets
+import time
+
+logger = logging.getLogger("packet_trace")
+
+HEADER_VERSION = 1
+OPEN = "+"
+INBOUND = "<"
+OUTBOUND = ">"
+CLOSE = "-"
+
+_IPV4 = re.compile(r"(?<![\d.])(?:\d{1,3}\.){3}\d{1,3}(?![\d.])")
+# Candidates only (runs of hex digits, colons and dots with a colon in them);
+# `_ipv6_token` keeps the ones `ipaddress` accepts.
+_IPV6 = re.compile(r"(?<![\w:.])(?=[0-9A-Fa-f.]*:)[0-9A-Fa-f:.]*[0-9A-Fa-f](?![\w:])")
+
+
+def anonymize_ip(ip, salt):
+    """Stable, non-reversible token for `ip` under `salt`."""
+    digest = hmac.new(salt, str(ip).encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"ip-{digest[:12]}"
+
+
+class PacketTrace:
+    """Size-rotated writer for per-connection packet traces."""
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, backup_count=5, salt=None, server_version=""):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.salt = salt.encode("utf-8") if isinstance(salt, str) else (salt or secrets.token_bytes(16))
+        self.server_version = server_version
+        self.started = time.time()
+        self._origin = time.monotonic()
+        self._conns = {}
+        self._next_conn = 0
+        self._ip_tokens = {}
+        self._file = None
+        self._size = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            # Never append to an earlier run's capture
+            self._shift_backups()
+        self._open()
+
+    @classmethod
+    def from_config(cls, config, server_version=""):
+        """Build a trace from the `packet_trace` config section, or None if disabled."""
+        cfg = config.get("packet_trace") or {}
+        if not cfg.get("enabled", False):
+            return None
+        return cls(
+            cfg.get("path", "logs/packets.trace"),
+            max_bytes=int(cfg.get("max_megabytes", 64) * 1024 * 1024),
+            backup_count=cfg.get("backup_count", 5),
+            salt=cfg.get("anonymize_salt"),
+            server_version=server_version,
+        )
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+        header = {"trace": HEADER_VERSION, "started": self.started, "server": self.server_version}
+        self._write_line(json.dumps(header, separators=(",", ":")))
+
+    def _shift_backups(self):
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _rotate(self):
+        self._file.close()
+        self._shift_backups()
+        self._open()
+
+    def _write_line(self, line):
+        self._file.write(line)
+        self._file.write("\n")
+        self._size += len(line) + 1
+
+    def _record(self, conn, kind, data):
+        if self._file is None:
+            return
+        ms = int((time.monotonic() - self._origin) * 1000)
+        line = json.dumps([ms, conn, kind, data], ensure_ascii=False, separators=(",", ":"))
+        if self._size + len(line) >= self.max_bytes:
+            self._rotate()
+        self._write_line(line)
+
+    def _token(self, ip):
+        token = self._ip_tokens.get(ip)
+        if token is None:
+            token = self._ip_tokens[ip] = anonymize_ip(ip, self.salt)
+        return token
+
+    def _ipv6_token(self, match):
+        try:
+            ip = ipaddress.IPv6Address(match.group(0))
+        except ValueError:
+            return match.group(0)
+        # Compressed form, the one peer addresses are reported in
+        return self._token(str(ip))
+
+    def scrub(self, data):
+        """Replace IPv4 and IPv6 addresses inside a payload with their tokens."""
+        if ":" in data:
+            # First, so IPv4-mapped addresses are replaced whole
+            data = _IPV6.sub(self._ipv6_token, data)
+        if "." in data:
+            data = _IPV4.sub(lambda m: self._token(m.group(0)), data)
+        return data
+
+    def opened(self, client, ip):
+        conn = self._conns[client] = self._next_conn
+        self._next_conn += 1
+        self._record(conn, OPEN, self._token(ip))
+
+    def inbound(self, client, data):
+        conn = self._conns.get(client)
+        if conn is not None:
+            self._record(conn, INBOUND, self.scrub(data))
+
+    def outbound(self, client, data):
+        conn = self._conns.get(client)
+        if conn is not None:
+            self._record(conn, OUTBOUND, self.scrub(data))
+
+    def closed(self, client):
+        conn = self._conns.pop(client, None)
+        if conn is not None:
+            self._record(conn, CLOSE, "")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def trace_files(path):
+    """The files of a (possibly rotated) trace, oldest first."""
+    files = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        files.append(f"{path}.{i}")
+        i += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_trace(path):
+    """
+    Yield `(seconds, conn, kind, data)` records from a trace and its rotations.
+    `seconds` is wall-clock time and `conn` is `(run start, connection number)`,
+    so records from different server runs never collide.
+    """
+    started = 0.0
+    for name in trace_files(path):
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A trace cut short by a crash can end on a partial line
+                    logger.debug("Skipping unreadable trace line in %s", name)
+                    continue
+                if isinstance(record, dict):
+                    started = record.get("started", 0.0)
+                elif isinstance(record, list) and len(record) == 4:
+                    ms, conn, kind, data = record
+                    yield started + ms / 1000, (started, conn), kind, data
@@ -0,0 +1,111 @@
+"""Paged OOC output for long listings.
+
+A listing command marked `@command(paged=True)` is a generator of OOC pages
+(see `commands.call`). Run in game, only its first page is rendered and
+sent; the generator is kept on the client as a `Pager` and `/next` renders
+the following page on demand, while `/prev` goes back to one already
+rendered. Running the same listing again within `PAGE_CACHE_SECONDS`, from
+the same area and with the same permissions, starts over from the pages
+already rendered instead of building them again.
+
+Listings mark the requester's own entry and depend on their area's links,
+so pages are cached per client rather than shared between players.
+"""
+
+import time
+
+# Long listings are split into OOC pages of about this size
+OOC_PAGE_CHARS = 4000
+# How long a client's rendered listing is reused if they run it again
+PAGE_CACHE_SECONDS = 3
+
+
+def line_pages(lines, limit=OOC_PAGE_CHARS):
+    """
+    Pack lines of text into OOC pages of at most about `limit` characters,
+    taking the lines as they come. A None line is yielded as-is, marking a
+    point where a sliced command may pause.
+    """
+    page = ""
+    for line in lines:
+        if line is None:
+            yield None
+            continue
+        if page and len(page) + len(line) >= limit:
+            yield page
+            page = ""
+        page = f"{page}\n{line}" if page else line
+    if page:
+        yield page
+
+
+def listing_key(client, name, arg):
+    """What a listing's pages depend on besides the state of the server."""
+    area = client.area
+    return (
+        name,
+        arg,
+        area.area_manager.id,
+        area.id,
+        client.is_mod,
+        client in area.area_manager.owners,
+        frozenset(a.id for a in client.owned_areas),
+    )
+
+
+class Pager:
+    """A client's position in a paged listing."""
+
+    def __init__(self, key, source, clock=time.monotonic):
+        self.key = key
+        self.source = source
+        self.pages = []
+        self.index = -1
+        self.clock = clock
+        self.created = clock()
+
+    def fresh(self, key):
+        """Whether this listing can stand in for running `key` again now."""
+        return self.key == key and self.clock() - self.created < PAGE_CACHE_SECONDS
+
+    def close(self):
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+    def _render(self, count):
+        """Render pages until there are `count` of them or the listing ends."""
+        while self.source is not None and len(self.pages) < count:
+            try:
+                page = next(self.source)
+            except StopIteration:
+                self.source = None
+                break
+            if page:
+                self.pages.append(page)
+
+    def page(self, index):
+        """
+        Page `index` (from 0) with a footer pointing to its neighbours.
+        :returns: None if the listing has no such page
+        """
+        # One page ahead, to know whether to offer /next
+        self._render(index + 2)
+        if not 0 <= index < len(self.pages):
+            return None
+        self.index = index
+        more = index + 1 < len(self.pages)
+        if index == 0 and not more:
+            return self.pages[0]
+        footer = f"📄 Page {index + 1}"
+        if more:
+            footer += " · /next for more"
+        if index > 0:
+            footer += " · /prev to go back"
+        return f"{self.pages[index]}\n{footer}"
+
+    def next(self):
+        return self.page(self.index + 1)
+
+    def prev(self):
+        return self.page(self.index - 1) if self.index > 0 else None
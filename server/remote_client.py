@@ -26,6 +26,7 @@ import time
 
 from server.client_manager import ClientManager
 from server.constants import _SYSTEM_IPID
+from server.network.ao_codec import unescape
 _system_ipid_seeded = False
 
 
@@ -90,6 +91,7 @@ class RemoteClient(ClientManager.Client):
         self.area = area
         if self not in area.clients:
             area.clients.add(self)
+            area.index_client(self)
         if self not in self.server.client_manager.clients:
             self.server.client_manager.clients.add(self)
         self._in_area = True
@@ -101,6 +103,7 @@ class RemoteClient(ClientManager.Client):
         area = self.area
         if self in area.clients:
             area.clients.discard(self)
+        area.unindex_client(self)
         if self in self.server.client_manager.clients:
             self.server.client_manager.clients.discard(self)
         self._in_area = False
@@ -125,7 +128,7 @@ class RemoteClient(ClientManager.Client):
     def send_command(self, command, *args):
         """Intercept CT/MS packets and notify listeners."""
         if command == "CT" and len(args) >= 2:
-            name = str(args[0]).replace("<dollar>", "$")
+            name = unescape(str(args[0]))
             msg = str(args[1]) if len(args) > 1 else ""
             entry = {
                 "type": "ooc",
@@ -199,16 +202,45 @@ class RemoteClient(ClientManager.Client):
         """
         Execute a command via commands.call() and capture the output.
         Returns the list of OOC messages that would have been sent.
+
+        Sliced (generator) commands are run to completion before returning,
+        so timers and demos see every command finish in order. So are async
+        commands when no event loop is running; on the loop they can't finish
+        before this returns, so they are refused -- use `execute_async`.
         """
         self.output.clear()
         self.raw_packets.clear()
         from server import commands
         try:
-            commands.call(self, cmd, arg)
+            pending = commands.call(self, cmd, arg, sliced=False)
+            if pending is not None:
+                # Only an async command is still pending here; it hasn't
+                # started yet, so cancelling it means it never runs.
+                pending.cancel()
+                raise RuntimeError(f"/{cmd} is asynchronous, run it with execute_async")
         except Exception as e:
-            self.send_ooc(f"[ERROR] {type(e).__name__}: {e}")
+            self._record_error_message(e)
         return self.output
 
+    async def execute_async(self, cmd, arg=""):
+        """
+        Like `execute`, but lets sliced commands yield the event loop between
+        chunks and waits for them to finish.
+        """
+        self.output.clear()
+        self.raw_packets.clear()
+        from server import commands
+        try:
+            pending = commands.call(self, cmd, arg)
+            if pending is not None:
+                await pending
+        except Exception as e:
+            self._record_error_message(e)
+        return self.output
+
+    def _record_error_message(self, e):
+        self.send_ooc(f"[ERROR] {type(e).__name__}: {e}")
+
 
 class _RemoteTransport:
     """Minimal transport stub that silently discards data."""
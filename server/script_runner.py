@@ -35,7 +35,8 @@ import logging
 import random
 import re
 
-from server import commands
+from server import commands, stall_watchdog
+from server.network.ao_codec import unescape
 from server.scripting import (
     _LIVE_PATH,
     _QUOTED,
@@ -44,6 +45,7 @@ from server.scripting import (
     live_sources,
     resolve_value,
     ScriptingError,
+    snapshot_scope,
     substitute_placeholders,
 )
 
@@ -95,7 +97,7 @@ def parse_demo_description(desc):
     to the end of a command or instruction line and is dropped; packet text
     is content and is never touched.
     """
-    desc = desc.replace("<num>", "#").replace("<and>", "&").replace("<percent>", "%").replace("<dollar>", "$")
+    desc = unescape(desc)
     instructions = []
     for line in _iter_lines(desc):
         stripped = line.strip().rstrip("#").strip()
@@ -395,54 +397,64 @@ class ScriptRunner:
             self.area.broadcast_ooc(f"[Demo] [ERROR] Max steps exceeded ({self.max_steps}); " "stopping playback.")
             self.finish()
             return
-        instruction = self.instructions[self.index]
-        self.index += 1
-        kind = instruction[0]
-        if kind == "wait":
-            logger.info("Demo wait %s in area %s", instruction[1], self.area.id)
-            self._schedule_next(instruction[1])
-            return
-        if kind == "packet":
-            logger.info("Demo packet %s in area %s", instruction[1], self.area.id)
-            self.send_packet(instruction[1], instruction[2])
-        elif kind == "label":
-            # No-op: labels exist only as goto targets.
-            pass
-        elif kind == "goto":
-            # Like the old `call`: remember where we jumped from so `return`
-            # can come back to it.
-            self.stack.append(self.index)
-            self._jump(instruction[1])
-        elif kind == "return":
-            if self.stack:
-                self.index = self.stack.pop()
-            else:
-                # Nothing to return to -- the script is simply done.
-                self.finish()
-                return
-        elif kind == "if":
-            self._eval_if(instruction)
-        elif kind == "set":
-            self._eval_set(instruction, sources=False)
-        elif kind == "get":
-            self._eval_set(instruction, sources=True)
-        elif kind == "concat":
-            self._eval_concat(instruction)
-        elif kind == "rand":
-            self._eval_rand(instruction)
-        elif kind == "save":
-            self._eval_save(instruction)
-        elif kind == "command":
-            # If a chained /demo took over the queue, don't schedule another
-            # step on top of the new script. If playback was stopped by an
-            # error, don't keep stepping either.
-            if self.run_command(instruction[1], instruction[2]):
+        stall_watchdog.enter("demo step", self.executor)
+        try:
+            self._step()
+        finally:
+            stall_watchdog.leave()
+
+    def _step(self):
+        # Area state only changes between steps, so live client lists can be
+        # reused by every operand/placeholder in this one.
+        with snapshot_scope():
+            instruction = self.instructions[self.index]
+            self.index += 1
+            kind = instruction[0]
+            if kind == "wait":
+                logger.info("Demo wait %s in area %s", instruction[1], self.area.id)
+                self._schedule_next(instruction[1])
                 return
+            if kind == "packet":
+                logger.info("Demo packet %s in area %s", instruction[1], self.area.id)
+                self.send_packet(instruction[1], instruction[2])
+            elif kind == "label":
+                # No-op: labels exist only as goto targets.
+                pass
+            elif kind == "goto":
+                # Like the old `call`: remember where we jumped from so `return`
+                # can come back to it.
+                self.stack.append(self.index)
+                self._jump(instruction[1])
+            elif kind == "return":
+                if self.stack:
+                    self.index = self.stack.pop()
+                else:
+                    # Nothing to return to -- the script is simply done.
+                    self.finish()
+                    return
+            elif kind == "if":
+                self._eval_if(instruction)
+            elif kind == "set":
+                self._eval_set(instruction, sources=False)
+            elif kind == "get":
+                self._eval_set(instruction, sources=True)
+            elif kind == "concat":
+                self._eval_concat(instruction)
+            elif kind == "rand":
+                self._eval_rand(instruction)
+            elif kind == "save":
+                self._eval_save(instruction)
+            elif kind == "command":
+                # If a chained /demo took over the queue, don't schedule another
+                # step on top of the new script. If playback was stopped by an
+                # error, don't keep stepping either.
+                if self.run_command(instruction[1], instruction[2]):
+                    return
+                if not self.running:
+                    return
             if not self.running:
                 return
-        if not self.running:
-            return
-        self._schedule_next(0)
+            self._schedule_next(0)
 
     def _jump(self, label):
         """Set the instruction index to a label; errors stop playback."""
@@ -568,7 +580,6 @@ class ScriptRunner:
             self.finish()
             return
         hub.set_character_data(char, key, value)
-        hub.save_character_data()
 
     def send_packet(self, header, args):
         """Broadcast an AO packet, honouring the executor's broadcast list."""
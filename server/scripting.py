@@ -22,7 +22,12 @@ registry, and every field is read through an explicit whitelist -- never raw
 `/getarea` order, evidence and links in their own order).
 """
 
+import ast
+import functools
+import math
+import operator
 import re
+from contextlib import contextmanager
 
 from server.constants import _SYSTEM_IPID
 from server.exceptions import ArgumentError
@@ -63,6 +68,94 @@ class DivisionByZeroError(ScriptingError):
     """Raised when an expression divides by zero (so callers can retry)."""
 
 
+# Operators a compiled expression may use, matching what `eval` would do with
+# the whitelisted characters.
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+}
+_UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+class _NotCompilable(Exception):
+    """An expression (or its current operands) needs the substitution path."""
+
+
+def _compile_node(node):
+    """Turn a whitelisted expression AST node into a closure over a name->value dict."""
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = node.value
+        if abs(round(value)) > MAX_TERM:
+            raise _NotCompilable
+        return lambda values: value
+    if isinstance(node, ast.Name):
+        name = node.id
+        return lambda values: values[name]
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        op = _UNARY_OPS[type(node.op)]
+        operand = _compile_node(node.operand)
+        return lambda values: op(operand(values))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        op = _BINARY_OPS[type(node.op)]
+        left = _compile_node(node.left)
+        right = _compile_node(node.right)
+        return lambda values: op(left(values), right(values))
+    raise _NotCompilable
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_expression(expr):
+    """
+    Parse a (stripped) expression once into `(names, closure)`, or None if it
+    has to go through the substitution path.
+
+    Only expressions whose meaning can't change under identifier substitution
+    compile: every identifier stands alone (not glued to a number like `2x` or
+    `1e5`), everything else is whitelisted, and no literal term is past
+    MAX_TERM. Anything else, including every kind of invalid expression, is
+    left to the substitution path so its error messages stay the same.
+    """
+    names = []
+    rest = []
+    last = 0
+    for match in _IDENTIFIER.finditer(expr):
+        if match.start() > 0 and expr[match.start() - 1] in "0123456789.":
+            return None
+        rest.append(expr[last:match.start()])
+        last = match.end()
+        if match.group(0) not in names:
+            names.append(match.group(0))
+    rest.append(expr[last:])
+    if any(ch not in ALLOWED_CHARS for ch in "".join(rest)):
+        return None
+    try:
+        closure = _compile_node(ast.parse(expr, mode="eval").body)
+    except (SyntaxError, _NotCompilable):
+        return None
+    return tuple(names), closure
+
+
+def _numeric_operand(value):
+    """Return `value` if substituting it as text would read back as the same
+    in-range number, else raise `_NotCompilable`."""
+    if type(value) is int:
+        if abs(value) > MAX_TERM:
+            raise _NotCompilable
+        return value
+    if type(value) is float:
+        # `str()` of huge/tiny floats uses an exponent, which isn't whitelisted.
+        if not math.isfinite(value) or abs(round(value)) > MAX_TERM or "e" in repr(value):
+            raise _NotCompilable
+        return value
+    raise _NotCompilable
+
+
 def evaluate_expression(expr, variables=None, sources=None):
     """
     Evaluate an arithmetic expression with variable substitution.
@@ -70,6 +163,10 @@ def evaluate_expression(expr, variables=None, sources=None):
     `variables` and `sources` are dicts of name -> number. Identifiers in the
     expression are replaced with their values; any identifier that isn't
     present raises a `ScriptingError`. Returns a number (int or float).
+
+    Expressions are compiled once and cached by their text; operands that
+    wouldn't substitute cleanly (strings, out-of-range numbers) fall back to
+    textual substitution so results and errors match it exactly.
     """
     if variables is None:
         variables = {}
@@ -81,6 +178,31 @@ def evaluate_expression(expr, variables=None, sources=None):
     if "**" in expr:
         raise ScriptingError("Exponentiation is not allowed in expressions.")
 
+    compiled = _compile_expression(expr)
+    if compiled is not None:
+        names, closure = compiled
+        try:
+            values = {}
+            for name in names:
+                if name in variables:
+                    values[name] = _numeric_operand(variables[name])
+                elif name in sources:
+                    values[name] = _numeric_operand(sources[name])
+                else:
+                    raise _NotCompilable
+        except _NotCompilable:
+            pass
+        else:
+            try:
+                return closure(values)
+            except ZeroDivisionError:
+                raise DivisionByZeroError("Expression divides by zero.")
+    return _substitute_and_evaluate(expr, variables, sources)
+
+
+def _substitute_and_evaluate(expr, variables, sources):
+    """Evaluate `expr` by substituting identifiers as text and running `eval`."""
+
     def _substitute(match):
         name = match.group(0)
         if name in variables:
@@ -414,10 +536,35 @@ def _join_order_key(area, client):
     return 0
 
 
+# Client snapshots cached for the duration of a `snapshot_scope`, by area.
+_snapshots = None
+
+
+@contextmanager
+def snapshot_scope():
+    """
+    Reuse `client[i]` snapshots while nothing can change the area, e.g. for
+    one script step. Nested scopes share the outermost cache.
+    """
+    global _snapshots
+    outer = _snapshots
+    if outer is None:
+        _snapshots = {}
+    try:
+        yield
+    finally:
+        _snapshots = outer
+
+
 def _client_snapshot(area):
     """Deterministic /getarea-ordered list of visible clients."""
+    if _snapshots is not None and area in _snapshots:
+        return _snapshots[area]
     clients = _visible_clients(area)
-    return sorted(sorted(clients, key=lambda c: c.showname), key=lambda c: _join_order_key(area, c))
+    clients = sorted(sorted(clients, key=lambda c: c.showname), key=lambda c: _join_order_key(area, c))
+    if _snapshots is not None:
+        _snapshots[area] = clients
+    return clients
 
 
 def _client_item(area, index):
@@ -0,0 +1,179 @@
+"""Typed snapshot of the options the server reads on hot paths.
+
+`TsuServer3.load_config` builds a `Settings` from config/config.yaml once, with
+defaults filled in and every value converted and checked, and `/refresh`
+builds a new one and swaps it in whole. A config that fails validation raises
+`ServerError` at load time, and a failed `/refresh` leaves the running
+settings alone.
+
+Code that runs per packet reads `server.settings` attributes. Everything else
+can keep reading the raw `server.config` dict; `resolve_config` checks the
+options it reads there and writes them back converted and with their
+defaults, so the dict holds the same values `Settings` does.
+"""
+
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from server.exceptions import ServerError
+
+
+@dataclass(frozen=True, slots=True)
+class Floodguard:
+    times_per_interval: int
+    interval_length: float
+    mute_length: float
+
+
+@dataclass(frozen=True, slots=True)
+class BridgebotSettings:
+    hub_id: int
+    area_id: int
+    ooc_chat: bool
+    ooc_system: bool
+
+
+@dataclass(frozen=True, slots=True)
+class DoormanSettings:
+    hub_id: int
+    area_id: int
+    delay: int
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    hostname: str
+    timeout: float
+    asset_url: str
+    packet_size: int
+    max_chars: int
+    max_chars_ic: int
+    block_repeat: bool
+    block_relative: bool
+    music_allow_url: bool
+    music_change_floodguard: Floodguard
+    wtce_floodguard: Floodguard
+    ooc_floodguard: Floodguard
+    # None unless the feature is enabled
+    bridgebot: Optional[BridgebotSettings]
+    doorman_webhook: Optional[DoormanSettings]
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Validate a loaded config dict.
+        :raises ServerError: naming the first option that is missing or has the wrong type
+        """
+        return cls(
+            hostname=_text(config, "hostname", required=True),
+            timeout=_number(config, "timeout", float, required=True),
+            asset_url=_text(config, "asset_url", ""),
+            packet_size=_number(config, "packet_size", int, 1024),
+            max_chars=_number(config, "max_chars", int, 256),
+            max_chars_ic=_number(config, "max_chars_ic", int, 256),
+            block_repeat=_flag(config, "block_repeat", True),
+            block_relative=_flag(config, "block_relative", False),
+            music_allow_url=_flag(config, "music_allow_url", True),
+            music_change_floodguard=_floodguard(config, "music_change_floodguard"),
+            wtce_floodguard=_floodguard(config, "wtce_floodguard"),
+            ooc_floodguard=_floodguard(config, "ooc_floodguard"),
+            bridgebot=_bridgebot(config),
+            doorman_webhook=_doorman(config),
+        )
+
+
+def resolve_config(config):
+    """
+    Check the options code reads from the raw config dict, and write them
+    back converted and with their defaults filled in.
+    :raises ServerError: naming the first option that is missing or has the wrong type
+    """
+    config["motd"] = _text(config, "motd", required=True)
+    config["playerlimit"] = _number(config, "playerlimit", int, required=True)
+    config["global_chat"] = _flag(config, "global_chat", True)
+    config["multiclient_limit"] = _number(config, "multiclient_limit", int, 16)
+    config["spam_delay_limit"] = _number(config, "spam_delay_limit", int, 4096)
+    config["demo_rate_limit_ms"] = _number(config, "demo_rate_limit_ms", int, 0)
+    config["demo_max_steps"] = _number(config, "demo_max_steps", int, 1000000)
+    for key in ("music_change_floodguard", "wtce_floodguard", "ooc_floodguard"):
+        config[key] = asdict(_floodguard(config, key))
+
+
+def _missing(key):
+    return ServerError(f"config.yaml: '{key}' is required.")
+
+
+def _text(section, key, default=None, required=False, prefix=""):
+    value = section.get(key)
+    if value is None:
+        if required:
+            raise _missing(prefix + key)
+        return default
+    if isinstance(value, (dict, list)):
+        raise ServerError(f"config.yaml: '{prefix}{key}' must be text.")
+    return str(value)
+
+
+def _number(section, key, kind, default=None, required=False, prefix=""):
+    value = section.get(key)
+    if value is None:
+        if required:
+            raise _missing(prefix + key)
+        return default
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ServerError(f"config.yaml: '{prefix}{key}' must be a number, not {value!r}.")
+
+
+def _flag(section, key, default, prefix=""):
+    value = section.get(key)
+    if value is None:
+        return default
+    if not isinstance(value, bool):
+        raise ServerError(f"config.yaml: '{prefix}{key}' must be true or false, not {value!r}.")
+    return value
+
+
+def _section(config, key):
+    section = config.get(key)
+    if section is None:
+        return None
+    if not isinstance(section, dict):
+        raise ServerError(f"config.yaml: '{key}' must be a section of options.")
+    return section
+
+
+def _floodguard(config, key):
+    section = _section(config, key) or {}
+    prefix = f"{key}."
+    return Floodguard(
+        times_per_interval=_number(section, "times_per_interval", int, 1, prefix=prefix),
+        interval_length=_number(section, "interval_length", float, 0, prefix=prefix),
+        mute_length=_number(section, "mute_length", float, 0, prefix=prefix),
+    )
+
+
+def _bridgebot(config):
+    section = _section(config, "bridgebot")
+    if section is None or not _flag(section, "enabled", False, prefix="bridgebot."):
+        return None
+    return BridgebotSettings(
+        hub_id=_number(section, "hub_id", int, required=True, prefix="bridgebot."),
+        area_id=_number(section, "area_id", int, required=True, prefix="bridgebot."),
+        ooc_chat=_flag(section, "ooc_chat", False, prefix="bridgebot."),
+        ooc_system=_flag(section, "ooc_system", False, prefix="bridgebot."),
+    )
+
+
+def _doorman(config):
+    section = _section(config, "doorman_webhook")
+    if section is None or not _flag(section, "enabled", False, prefix="doorman_webhook."):
+        return None
+    return DoormanSettings(
+        hub_id=_number(section, "hub_id", int, required=True, prefix="doorman_webhook."),
+        area_id=_number(section, "area_id", int, required=True, prefix="doorman_webhook."),
+        delay=_number(section, "delay", int, 60, prefix="doorman_webhook."),
+    )
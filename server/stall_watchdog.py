@@ -0,0 +1,147 @@
+"""Event-loop stall watchdog.
+
+The loop bumps a heartbeat every `heartbeat_ms`; a watchdog thread checks it
+and, when the loop has gone `threshold_ms` without a beat, snapshots the loop
+thread's stack together with the current operation markers. Once the loop
+runs again the stall is logged with `database.log_misc("loop_stall", ...)`,
+which also pushes it to the admin live log stream. A warning is written to
+the server log straight from the watchdog thread as well, so a loop that never
+recovers still leaves a trace.
+
+Operation markers are how a stall gets attributed to a packet, command, timer
+or demo: the code that dispatches them wraps the call in `enter()`/`leave()`,
+which push and pop a `(label, client)` pair on a plain list. That costs an
+append and a pop; the labels are only formatted when a stall is reported.
+"""
+
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from server import database
+
+logger = logging.getLogger("watchdog")
+
+# Operation markers, outermost first: (label, client or None)
+_ops = []
+
+
+def enter(label, client=None):
+    """Mark the start of an operation on the loop thread. Pair with `leave`."""
+    _ops.append((label, client))
+
+
+def leave():
+    """Mark the end of the innermost operation."""
+    if _ops:
+        _ops.pop()
+
+
+def current_ops():
+    return list(_ops)
+
+
+def describe_op(label, client):
+    if client is None:
+        return label
+    try:
+        area = client.area
+        return f"{label} [{client.id}] {client.name} in area {area.id} '{area.name}'"
+    except AttributeError:
+        return label
+
+
+class StallWatchdog:
+    """Watches the event loop's heartbeat from a separate thread."""
+
+    def __init__(self, threshold_ms=1000, heartbeat_ms=100, stack_limit=40):
+        self.threshold = threshold_ms / 1000
+        self.heartbeat = heartbeat_ms / 1000
+        self.stack_limit = stack_limit
+        self.stalls = 0
+        self._loop = None
+        self._loop_thread = None
+        self._handle = None
+        self._last_beat = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a watchdog from the `stall_watchdog` config section, or None if disabled."""
+        cfg = config.get("stall_watchdog") or {}
+        if not cfg.get("enabled", True):
+            return None
+        return cls(
+            threshold_ms=cfg.get("threshold_ms", 1000),
+            heartbeat_ms=cfg.get("heartbeat_ms", 100),
+        )
+
+    def start(self, loop):
+        """Start watching `loop`. Call from the loop's thread."""
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._beat()
+        self._thread = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _beat(self):
+        self._last_beat = time.monotonic()
+        self._handle = self._loop.call_later(self.heartbeat, self._beat)
+
+    def _snapshot(self):
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return []
+        summary = traceback.extract_stack(frame)[-self.stack_limit:]
+        return [f"{entry.filename}:{entry.lineno} in {entry.name}" for entry in summary]
+
+    def _watch(self):
+        stall = None
+        while not self._stop.wait(self.heartbeat / 2):
+            beat = self._last_beat
+            if stall is None:
+                if time.monotonic() - beat > self.threshold + self.heartbeat:
+                    ops = current_ops()
+                    stall = {"beat": beat, "ops": ops, "stack": self._snapshot()}
+                    logger.warning(
+                        "Event loop stalled for over %dms in %s",
+                        self.threshold * 1000,
+                        " > ".join(describe_op(*op) for op in ops) or "no marked operation",
+                    )
+            elif beat != stall["beat"]:
+                stall["ms"] = round((beat - stall["beat"] - self.heartbeat) * 1000)
+                try:
+                    self._loop.call_soon_threadsafe(self._report, stall)
+                except RuntimeError:
+                    # The loop closed under us
+                    return
+                stall = None
+
+    def _report(self, stall):
+        """Log a finished stall. Runs on the loop thread."""
+        self.stalls += 1
+        ops = stall["ops"]
+        client = next((c for _, c in reversed(ops) if c is not None), None)
+        data = {
+            "ms": stall["ms"],
+            "ops": [describe_op(*op) for op in ops],
+            "stack": stall["stack"],
+        }
+        logger.warning("Event loop stalled for %dms in %s", stall["ms"], " > ".join(data["ops"]) or "no marked operation")
+        try:
+            database.log_misc("loop_stall", client=client, data=data)
+        except Exception:
+            logger.exception("Could not record loop stall")
@@ -0,0 +1,240 @@
+"""In-memory index of the `storage/` tree.
+
+Commands and GM panel endpoints ask "does this file exist", "what yaml files
+are in here" and "how many files are in here" about the storage directories
+(hubs, musiclists, charlists, evidence, battlesystem, character_data). With
+thousands of saved files, an `os.listdir` per question makes those commands
+visibly slow, so `StorageIndex` scans each directory once and answers from
+memory until the directory changes.
+
+Change detection uses inotify where the platform has it: every indexed
+directory gets a watch, and pending events are drained (non-blocking) before
+each query, so a directory is only rescanned after something in it was added,
+removed or renamed. Elsewhere the index falls back to polling: each query
+stats the directory and rescans when its mtime moved. A scan taken in the same
+mtime tick as a write cannot be trusted, so such entries are rescanned once
+more on the next query.
+
+Use the module's shared index rather than building your own: after
+`from server import storage_index`, `storage_index.has_file(...)` and the other
+`StorageIndex` methods go to one instance, created (and its inotify handle
+opened) on first use.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+import time
+
+logger = logging.getLogger("storage_index")
+
+_storage_index_singleton = None
+
+
+def __getattr__(name):
+    global _storage_index_singleton
+    if _storage_index_singleton is None:
+        _storage_index_singleton = StorageIndex()
+    return getattr(_storage_index_singleton, name)
+
+# Directory mtimes this close to the scan time may still change within the
+# same filesystem timestamp tick, so the listing is not trusted past one query.
+_RACY_WINDOW_NS = 2_000_000_000
+
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_IN_ATTRIB = 0x004
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_WATCH_MASK = (
+    _IN_ATTRIB | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+    | _IN_DELETE_SELF | _IN_MOVE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Minimal non-blocking inotify handle (Linux only, via libc)."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        return wd
+
+    def read_events(self):
+        """Yield `(wd, mask)` for every queued event without blocking."""
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return
+            except OSError as ex:
+                if ex.errno == errno.EINTR:
+                    continue
+                raise
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size + length
+                yield wd, mask
+
+
+class _Dir:
+    __slots__ = ("files", "dirs", "mtime_ns", "racy", "stale", "wd")
+
+    def __init__(self, files, dirs, mtime_ns, racy, wd):
+        self.files = files
+        self.dirs = dirs
+        self.mtime_ns = mtime_ns
+        self.racy = racy
+        self.stale = False
+        self.wd = wd
+
+
+class StorageIndex:
+    """Cached directory listings for the storage tree, kept fresh by inotify or mtime."""
+
+    def __init__(self, use_inotify=True):
+        self._dirs = {}
+        self._watches = {}
+        self._inotify = None
+        if use_inotify:
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError) as ex:
+                logger.debug("inotify unavailable, polling mtimes instead: %s", ex)
+
+    @property
+    def uses_inotify(self):
+        return self._inotify is not None
+
+    def _drain(self):
+        if self._inotify is None:
+            return
+        for wd, mask in self._inotify.read_events():
+            if mask & _IN_Q_OVERFLOW:
+                for entry in self._dirs.values():
+                    entry.stale = True
+                continue
+            path = self._watches.get(wd)
+            entry = self._dirs.get(path) if path is not None else None
+            if entry is not None:
+                entry.stale = True
+            if mask & _IN_IGNORED:
+                self._watches.pop(wd, None)
+                if entry is not None:
+                    entry.wd = None
+
+    def _scan(self, path, old):
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            files, dirs = set(), set()
+            with os.scandir(path) as it:
+                for e in it:
+                    if e.is_dir():
+                        # Like `os.walk(followlinks=False)`: symlinked directories
+                        # are neither files nor descended into.
+                        if not e.is_symlink():
+                            dirs.add(e.name)
+                    else:
+                        files.add(e.name)
+        except OSError:
+            # Missing, not a directory or unreadable: skipped, like `os.walk` does
+            return None
+        wd = old.wd if old is not None else None
+        if self._inotify is not None and wd is None:
+            try:
+                wd = self._inotify.add_watch(path)
+                self._watches[wd] = path
+            except OSError as ex:
+                logger.debug("Could not watch %s: %s", path, ex)
+        racy = time.time_ns() - mtime_ns < _RACY_WINDOW_NS
+        return _Dir(frozenset(files), frozenset(dirs), mtime_ns, racy, wd)
+
+    def _entry(self, path):
+        path = os.path.normpath(path)
+        self._drain()
+        entry = self._dirs.get(path)
+        if entry is not None and not entry.stale:
+            if entry.wd is not None and not entry.racy:
+                return entry
+            # Polling (or a racy scan): trust the listing while the mtime holds.
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime_ns = None
+            if mtime_ns == entry.mtime_ns and not entry.racy:
+                return entry
+        entry = self._scan(path, entry)
+        if entry is None:
+            self._dirs.pop(path, None)
+            return None
+        self._dirs[path] = entry
+        return entry
+
+    def invalidate(self, path=None):
+        """Force a rescan of `path` (or of everything) on its next query."""
+        if path is None:
+            for entry in self._dirs.values():
+                entry.stale = True
+            return
+        entry = self._dirs.get(os.path.normpath(path))
+        if entry is not None:
+            entry.stale = True
+
+    def files(self, path):
+        """Names of the non-directory entries in `path` (empty if it doesn't exist)."""
+        entry = self._entry(path)
+        return entry.files if entry is not None else frozenset()
+
+    def subdirs(self, path):
+        """Names of the (non-symlinked) subdirectories of `path`."""
+        entry = self._entry(path)
+        return entry.dirs if entry is not None else frozenset()
+
+    def has_file(self, path, name):
+        return name in self.files(path)
+
+    def count_files(self, path):
+        return len(self.files(path))
+
+    def yaml_names(self, path):
+        """Sorted `*.yaml` file names in `path`, without the extension."""
+        return sorted(f[:-5] for f in self.files(path) if f.lower().endswith(".yaml"))
+
+    def walk_yaml(self, base, max_depth, skip=()):
+        """
+        `*.yaml` files under `base` as sorted "/"-separated relative paths
+        without the extension, descending at most `max_depth` levels and
+        never into a directory named in `skip`.
+        """
+        results = []
+        pending = [(os.path.normpath(base), [], 0)]
+        while pending:
+            path, parts, depth = pending.pop()
+            for f in self.files(path):
+                if f.lower().endswith(".yaml"):
+                    results.append("/".join(parts + [f[:-5]]))
+            if depth >= max_depth:
+                continue
+            for d in self.subdirs(path):
+                if d not in skip:
+                    pending.append((os.path.join(path, d), parts + [d], depth + 1))
+        return sorted(results)
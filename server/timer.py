@@ -11,6 +11,10 @@ import asyncio
 import datetime
 import logging
 
+import arrow
+
+from server import stall_watchdog
+
 logger = logging.getLogger("timer")
 
 
@@ -40,6 +44,39 @@ class Timer:
         """User-facing timer ID string ('0' for the hub timer, else 1-20)."""
         return "0" if self.hub is not None else str(self.id + 1)
 
+    def snapshot(self):
+        """The timer's state as plain data, see `server.handoff`."""
+        if self.started:
+            seconds = (self.target - arrow.get()).total_seconds()
+        elif self.static is not None:
+            seconds = self.static.total_seconds()
+        else:
+            seconds = None
+        return {
+            "set": self.set,
+            "started": self.started,
+            "seconds": seconds,
+            "commands": list(self.commands),
+            "format": self.format,
+            "interval": self.interval,
+        }
+
+    def restore(self, state):
+        """Pick up from a `snapshot`, rearming the expiry if the timer was running."""
+        self.set = state["set"]
+        self.commands = list(state["commands"])
+        self.format = state["format"]
+        self.interval = state["interval"]
+        self.started = False
+        self.target = None
+        self.static = None
+        if state["seconds"] is not None:
+            self.static = datetime.timedelta(seconds=max(state["seconds"], 0))
+            if state["started"]:
+                self.started = True
+                self.target = arrow.get().shift(seconds=self.static.total_seconds())
+                start_schedule(self)
+
     def timer_expired(self):
         if self.schedule:
             self.schedule.cancel()
@@ -59,6 +96,13 @@ class Timer:
         if self.area is None:
             return
         executor = self.area.get_script_client()
+        stall_watchdog.enter(f"timer {self.label} commands", executor)
+        try:
+            self._run_commands(executor)
+        finally:
+            stall_watchdog.leave()
+
+    def _run_commands(self, executor):
         # We clear out the commands as we call them in order one by one
         while len(self.commands) > 0:
             # Take the first command in the list and run it
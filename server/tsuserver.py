@@ -1,3 +1,4 @@
+import os
 import sys
 import logging
 import asyncio
@@ -12,21 +13,26 @@ import yaml
 from aiohttp import web
 
 import server.logger
-from server import database
+from server import database, handoff
 from server.hub_manager import HubManager
 from server.client_manager import ClientManager
 from server.playerstateobserver import PlayerStateObserver
-from server.emotes import Emotes
+from server.emotes import Emotes, compile_iniswaps
 from server.discordbot import Bridgebot
 from server.exceptions import ClientError, ServerError
+from server.network.admission import Admission
 from server.network.aoprotocol import AOProtocol
 from server.network.aoprotocol_ws import new_websocket_client
 from server.network.masterserverclient import MasterServerClient
 from server.network.webhooks import Webhooks
 from server.web_view.admin_panel import create_admin_app
 from server.web_view.gm_panel import GMPanelApp
-from server.constants import remove_URL, dezalgo
+from server.constants import remove_URL, dezalgo, derelative
 from server.medieval_parser import MedievalParser
+from server.ip_ranges import AsnLookup, IpRangeBans
+from server.packet_trace import PacketTrace
+from server.settings import Settings, resolve_config
+from server.stall_watchdog import StallWatchdog
 
 
 logger = logging.getLogger("main")
@@ -42,10 +48,19 @@ class TsuServer3:
         self.minor_version = 0
 
         self.config = None
+        self.ao_server = None
+        # Connection to the process a restart handoff went to, see server/handoff.py
+        self.handoff_conn = None
+        # Validated snapshot of the hot-path options, see server/settings.py
+        self.settings = None
         self.censors = None
         self.allowed_iniswaps = []
+        # char -> chars it may iniswap to, compiled from allowed_iniswaps
+        self.iniswap_map = {}
         self.char_list = None
         self.char_emotes = None
+        # (own char, shown char, preanim, anim) -> blocked, see emote_blocked
+        self.emote_verdicts = {}
         self.music_list = []
         self.music_whitelist = []
         self.backgrounds = None
@@ -56,9 +71,10 @@ class TsuServer3:
         self.emotions_extensions = [".png", ".webp"]
         self.background_extensions = [".png", ".gif", ".webp", ".apng"]
         self.zalgo_tolerance = None
-        self.ipRange_bans = []
+        self.ipRange_bans = IpRangeBans()
         self.geoIpReader = None
         self.useGeoIp = False
+        self.asn_lookup = None
         self.need_webhook = False
         self.supported_features = [
             "yellowtext",
@@ -85,6 +101,10 @@ class TsuServer3:
         self.command_aliases = {}
         self.gm_panel_bridge = None
         self.gm_panel_app_obj = None
+        # Opt-in raw traffic capture, see server/packet_trace.py
+        self.packet_trace = None
+        self.stall_watchdog = None
+        self.admission = None
 
         try:
             self.geoIpReader = geoip2.database.Reader(
@@ -106,7 +126,12 @@ class TsuServer3:
             self.load_backgrounds()
             self.load_server_links()
             self.load_ipranges()
+            self.admission = Admission.from_config(self.config)
+            if self.useGeoIp:
+                self.asn_lookup = AsnLookup(
+                    self.geoIpReader, self.config.get("geoip_cache_size", 4096))
             self.hub_manager = HubManager(self)
+            self.hub_manager.restore_character_data()
         except yaml.YAMLError:
             print("There was a syntax error parsing a configuration file:")
             traceback.print_exc()
@@ -116,6 +141,9 @@ class TsuServer3:
             print("There was an error opening or writing to a file:")
             traceback.print_exc()
             sys.exit(1)
+        except ServerError as e:
+            print(f"There was a configuration error: {e}")
+            sys.exit(1)
         except Exception:
             print("There was a configuration error:")
             traceback.print_exc()
@@ -143,22 +171,37 @@ class TsuServer3:
         if self.config["local"]:
             bound_ip = "127.0.0.1"
 
-        ao_server_crt = loop.create_server(
-            lambda: AOProtocol(self), bound_ip, self.config["port"]
-        )
-        ao_server = loop.run_until_complete(ao_server_crt)
-
-        if self.config["use_websockets"]:
-            ao_server_ws = websockets.serve(
-                new_websocket_client(
-                    self), bound_ip, self.config["websocket_port"]
+        self.admin_runner = None
+        self.gm_runner = None
+        handoff_path = os.environ.pop(handoff.HANDOFF_ENV, None)
+        if handoff_path is not None:
+            receiver = handoff.Receiver(handoff_path)
+            self.ao_server, clients = loop.run_until_complete(
+                handoff.take_over(self, receiver)
             )
-            asyncio.ensure_future(ao_server_ws)
+            logger.info("Took over %d clients", len(clients))
+            # The old process still holds the other ports until it exits
+            asyncio.ensure_future(
+                self.serve_other_ports(bound_ip, after=receiver.wait_for_exit())
+            )
+        else:
+            ao_server_crt = loop.create_server(
+                lambda: AOProtocol(self), bound_ip, self.config["port"]
+            )
+            self.ao_server = loop.run_until_complete(ao_server_crt)
+            loop.run_until_complete(self.serve_other_ports(bound_ip))
 
         if self.config["use_masterserver"]:
             self.ms_client = MasterServerClient(self)
             asyncio.ensure_future(self.ms_client.connect(), loop=loop)
 
+        try:
+            self.packet_trace = PacketTrace.from_config(self.config, self.version)
+        except OSError as e:
+            logger.error("Failed to start packet trace: %s", e)
+        if self.packet_trace is not None:
+            logger.info("Capturing packet trace to %s", self.packet_trace.path)
+
         if self.config["zalgo_tolerance"]:
             self.zalgo_tolerance = self.config["zalgo_tolerance"]
 
@@ -181,8 +224,56 @@ class TsuServer3:
         if "need_webhook" in self.config and self.config["need_webhook"]["enabled"]:
             self.need_webhook = True
 
+        asyncio.ensure_future(self.schedule_unbans())
+        asyncio.ensure_future(self.schedule_wal_checkpoint())
+
+        self.stall_watchdog = StallWatchdog.from_config(self.config)
+        if self.stall_watchdog is not None:
+            self.stall_watchdog.start(loop)
+
+        database.log_misc("start")
+        print("Server started and is listening on port {}".format(
+            self.config["port"]))
+
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            print("KEYBOARD INTERRUPT")
+            loop.stop()
+
+        if self.stall_watchdog is not None:
+            self.stall_watchdog.stop()
+        database.log_misc("stop")
+        database.flush()
+
+        self.ao_server.close()
+        loop.run_until_complete(self.ao_server.wait_closed())
+
+        if self.admin_runner:
+            loop.run_until_complete(self.admin_runner.cleanup())
+        if self.gm_runner:
+            loop.run_until_complete(self.gm_runner.cleanup())
+        if self.packet_trace is not None:
+            self.packet_trace.close()
+
+        loop.close()
+
+    async def serve_other_ports(self, bound_ip, after=None):
+        """
+        Start the websocket server and the admin and GM panels.
+        :param after: awaited first, for the ports to be free
+        """
+        if after is not None:
+            await after
+
+        if self.config["use_websockets"]:
+            ao_server_ws = websockets.serve(
+                new_websocket_client(
+                    self), bound_ip, self.config["websocket_port"]
+            )
+            asyncio.ensure_future(ao_server_ws)
+
         # Start admin panel web server if configured
-        self.admin_runner = None
         admin_cfg = self.config.get("admin_panel", {})
         if admin_cfg.get("enabled", False):
             try:
@@ -190,16 +281,15 @@ class TsuServer3:
                 admin_port = admin_cfg.get("port", 27017)
                 admin_host = admin_cfg.get("host", "0.0.0.0")
                 self.admin_runner = web.AppRunner(admin_app)
-                loop.run_until_complete(self.admin_runner.setup())
+                await self.admin_runner.setup()
                 site = web.TCPSite(self.admin_runner, admin_host, admin_port, ssl_context=admin_ssl)
-                loop.run_until_complete(site.start())
+                await site.start()
                 proto = "HTTPS" if admin_ssl else "HTTP"
                 logger.info("Admin panel listening on %s://%s:%s", proto, admin_host, admin_port)
             except Exception as e:
                 logger.error("Failed to start admin panel: %s", e)
 
         # Start GM panel web server if configured
-        self.gm_runner = None
         gm_cfg = self.config.get("gm_panel", {})
         if gm_cfg.get("enabled", False):
             try:
@@ -209,39 +299,14 @@ class TsuServer3:
                 gm_port = gm_cfg.get("port", 27018)
                 gm_host = gm_cfg.get("host", "0.0.0.0")
                 self.gm_runner = web.AppRunner(gm_app)
-                loop.run_until_complete(self.gm_runner.setup())
+                await self.gm_runner.setup()
                 site = web.TCPSite(self.gm_runner, gm_host, gm_port, ssl_context=gm_ssl)
-                loop.run_until_complete(site.start())
+                await site.start()
                 proto = "HTTPS" if gm_ssl else "HTTP"
                 logger.info("GM panel listening on %s://%s:%s", proto, gm_host, gm_port)
             except Exception as e:
                 logger.error("Failed to start GM panel: %s", e)
 
-        asyncio.ensure_future(self.schedule_unbans())
-        asyncio.ensure_future(self.schedule_wal_checkpoint())
-
-        database.log_misc("start")
-        print("Server started and is listening on port {}".format(
-            self.config["port"]))
-
-        try:
-            loop.run_forever()
-        except KeyboardInterrupt:
-            print("KEYBOARD INTERRUPT")
-            loop.stop()
-
-        database.log_misc("stop")
-
-        ao_server.close()
-        loop.run_until_complete(ao_server.wait_closed())
-
-        if self.admin_runner:
-            loop.run_until_complete(self.admin_runner.cleanup())
-        if self.gm_runner:
-            loop.run_until_complete(self.gm_runner.cleanup())
-
-        loop.close()
-
     async def schedule_unbans(self):
         while True:
             database.schedule_unbans()
@@ -270,33 +335,42 @@ class TsuServer3:
         """
         peername = transport.get_extra_info("peername")[0]
 
-        if self.useGeoIp:
-            try:
-                geoIpResponse = self.geoIpReader.asn(peername)
-                asn = str(geoIpResponse.autonomous_system_number)
-            except geoip2.errors.AddressNotFoundError:
-                asn = "Loopback"
-                pass
-        else:
-            asn = "Loopback"
-
-        for line, rangeBan in enumerate(self.ipRange_bans):
-            if rangeBan != "" and ((peername.startswith(rangeBan) and (rangeBan.endswith('.') or rangeBan.endswith(':'))) or asn == rangeBan):
-                msg = "BD#"
-                msg += "Abuse\r\n"
-                msg += f"ID: {line}\r\n"
-                msg += "Until: N/A"
-                msg += "#%"
-
-                transport.write(msg.encode("utf-8"))
-                raise ClientError
+        line = self.ipRange_bans.match_address(peername)
+        asn_pending = None
+        if line is None and self.ipRange_bans.asns and self.asn_lookup is not None:
+            asn, known = self.asn_lookup.cached(peername)
+            if known:
+                line = self.ipRange_bans.match_asn(asn)
+            else:
+                asn_pending = self.asn_lookup.lookup(peername)
+        if line is not None:
+            transport.write(f"BD#{self.range_ban_message(line)}#%".encode("utf-8"))
+            raise ClientError
 
         c = self.client_manager.new_client(transport)
         c.server = self
         c.area = self.hub_manager.default_hub().default_area()
         c.area.new_client(c)
+        if asn_pending is not None:
+            # The ASN arrives well before the client can get through the handshake
+            asn_pending.add_done_callback(lambda fut: self.check_asn_ban(c, fut))
         return c
 
+    @staticmethod
+    def range_ban_message(line):
+        return f"Abuse\r\nID: {line}\r\nUntil: N/A"
+
+    def check_asn_ban(self, client, lookup):
+        """Kick `client` if the ASN lookup started in `new_client` hit a range ban."""
+        if lookup.cancelled() or lookup.exception() is not None:
+            return
+        if client not in self.client_manager.clients:
+            return
+        line = self.ipRange_bans.match_asn(lookup.result())
+        if line is not None:
+            client.send_command("BD", self.range_ban_message(line))
+            client.disconnect()
+
     def remove_client(self, client):
         """
         Remove a disconnected client.
@@ -331,57 +405,42 @@ class TsuServer3:
         """Load the main server configuration from a YAML file."""
         try:
             with open("config/config.yaml", "r", encoding="utf-8") as cfg:
-                self.config = yaml.safe_load(cfg)
-                self.config["motd"] = self.config["motd"].replace("\\n", " \n")
+                config = yaml.safe_load(cfg)
         except OSError:
             print("error: config/config.yaml wasn't found.")
             print("You are either running from the wrong directory, or")
             print("you forgot to rename config_sample (read the instructions).")
             sys.exit(1)
+        self.config, self.settings = self.parse_config(config)
 
-        if "music_change_floodguard" not in self.config:
-            self.config["music_change_floodguard"] = {
-                "times_per_interval": 1,
-                "interval_length": 0,
-                "mute_length": 0,
-            }
-        if "wtce_floodguard" not in self.config:
-            self.config["wtce_floodguard"] = {
-                "times_per_interval": 1,
-                "interval_length": 0,
-                "mute_length": 0,
-            }
-        if "ooc_floodguard" not in self.config:
-            self.config["ooc_floodguard"] = {
-                "times_per_interval": 1,
-                "interval_length": 0,
-                "mute_length": 0,
-            }
-
-        if "demo_rate_limit_ms" not in self.config:
-            self.config["demo_rate_limit_ms"] = 0
-
-        if "demo_max_steps" not in self.config:
-            self.config["demo_max_steps"] = 1000000
-
-        if "zalgo_tolerance" not in self.config:
-            self.config["zalgo_tolerance"] = 3
-
-        if isinstance(self.config["modpass"], str):
-            self.config["modpass"] = {"default": {
-                "password": self.config["modpass"]}}
-        if "multiclient_limit" not in self.config:
-            self.config["multiclient_limit"] = 16
-        if "asset_url" not in self.config:
-            self.config["asset_url"] = ""
-        if "block_repeat" not in self.config:
-            self.config["block_repeat"] = True
-        if "block_relative" not in self.config:
-            self.config["block_relative"] = False
-        if "global_chat" not in self.config:
-            self.config["global_chat"] = True
-        if "music_allow_url" not in self.config:
-            self.config["music_allow_url"] = True
+    @staticmethod
+    def parse_config(config):
+        """
+        Fill in defaults for a freshly loaded config and validate it.
+        :returns: (config dict, `Settings` snapshot)
+        :raises ServerError: if the config is invalid
+        """
+        if not isinstance(config, dict):
+            raise ServerError("config.yaml: expected a section of options.")
+        if "motd" in config:
+            config["motd"] = str(config["motd"]).replace("\\n", " \n")
+
+        if "zalgo_tolerance" not in config:
+            config["zalgo_tolerance"] = 3
+
+        if "modpass" not in config:
+            raise ServerError("config.yaml: 'modpass' is required.")
+        if isinstance(config["modpass"], str):
+            config["modpass"] = {"default": {
+                "password": config["modpass"]}}
+        if "asset_url" not in config:
+            config["asset_url"] = ""
+        if "block_repeat" not in config:
+            config["block_repeat"] = True
+        if "block_relative" not in config:
+            config["block_relative"] = False
+        resolve_config(config)
+        return config, Settings.from_config(config)
 
     async def load_extensions(self):
         """
@@ -433,6 +492,7 @@ class TsuServer3:
         with open("config/characters.yaml", "r", encoding="utf-8") as chars:
             self.char_list = yaml.safe_load(chars)
         self.char_emotes = {char: Emotes(char) for char in self.char_list}
+        self.emote_verdicts.clear()
 
     def load_music(self):
         self.load_music_list()
@@ -465,12 +525,35 @@ class TsuServer3:
                 self.allowed_iniswaps = yaml.safe_load(iniswaps)
         except Exception:
             logger.debug("Cannot find iniswaps.yaml")
+        self.iniswap_map = compile_iniswaps(self.allowed_iniswaps)
+        self.emote_verdicts.clear()
+
+    def emote_blocked(self, own_char, char, preanim, anim):
+        """
+        Whether a player on `own_char` may not send `preanim`/`anim` as
+        `char`: either an iniswap not allowed by iniswaps.yaml, or an emote
+        missing from the character's char.ini. Memoized until iniswaps or
+        characters are reloaded, since the MS path asks on every message.
+        """
+        key = (own_char, char, preanim, anim)
+        blocked = self.emote_verdicts.get(key)
+        if blocked is None:
+            if len(self.emote_verdicts) >= 8192:
+                self.emote_verdicts.clear()
+            if derelative(anim) == "misc/blank":
+                blocked = False
+            elif char.lower() != own_char.lower():
+                blocked = char not in self.iniswap_map.get(own_char, ())
+            else:
+                emotes = self.char_emotes.get(char) if self.char_emotes else None
+                blocked = emotes is not None and not emotes.validate(preanim, anim)
+            self.emote_verdicts[key] = blocked
+        return blocked
 
     def load_ipranges(self):
-        """Load a list of banned IP ranges."""
+        """Load and compile the list of banned IP ranges and ASNs."""
         try:
-            with open("config/iprange_ban.txt", "r", encoding="utf-8") as ipranges:
-                self.ipRange_bans = ipranges.read().splitlines()
+            self.ipRange_bans = IpRangeBans.load("config/iprange_ban.txt")
         except Exception:
             logger.debug("Cannot find iprange_ban.txt")
 
@@ -669,35 +752,27 @@ class TsuServer3:
         """
         with open("config/config.yaml", "r", encoding="utf-8") as cfg:
             cfg_yaml = yaml.safe_load(cfg)
-            self.config["motd"] = cfg_yaml["motd"].replace("\\n", " \n")
-
-            # Reload moderator passwords list and unmod any moderator affected by
-            # credential changes or removals
-            if isinstance(self.config["modpass"], str):
-                self.config["modpass"] = {
-                    "default": {"password": self.config["modpass"]}
-                }
-            if isinstance(cfg_yaml["modpass"], str):
-                cfg_yaml["modpass"] = {"default": {
-                    "password": cfg_yaml["modpass"]}}
-
-            for profile in self.config["modpass"]:
-                if (
-                    profile not in cfg_yaml["modpass"]
-                    or self.config["modpass"][profile] != cfg_yaml["modpass"][profile]
+        # Validate before touching anything, so a broken file keeps the running config
+        config, settings = self.parse_config(cfg_yaml)
+
+        # Reload moderator passwords list and unmod any moderator affected by
+        # credential changes or removals
+        for profile in self.config["modpass"]:
+            if (
+                profile not in config["modpass"]
+                or self.config["modpass"][profile] != config["modpass"][profile]
+            ):
+                for client in filter(
+                    lambda c: c.mod_profile_name == profile,
+                    self.client_manager.clients,
                 ):
-                    for client in filter(
-                        lambda c: c.mod_profile_name == profile,
-                        self.client_manager.clients,
-                    ):
-                        client.is_mod = False
-                        client.mod_profile_name = None
-                        database.log_misc("unmod.modpass", client)
-                        client.send_ooc(
-                            "Your moderator credentials have been revoked.")
-            self.config["modpass"] = cfg_yaml["modpass"]
-
-        self.load_config()
+                    client.is_mod = False
+                    client.mod_profile_name = None
+                    database.log_misc("unmod.modpass", client)
+                    client.send_ooc(
+                        "Your moderator credentials have been revoked.")
+
+        self.config, self.settings = config, settings
         self.load_command_aliases()
         self.load_censors()
         self.load_iniswaps()
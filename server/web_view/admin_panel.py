@@ -10,7 +10,7 @@ import time
 import aiohttp
 from aiohttp import web
 
-from server import database
+from server import database, loop_profiler
 
 logger = logging.getLogger("admin_panel")
 
@@ -461,7 +461,7 @@ async def handle_api_command(request):
             "arg": arg,
         })
 
-    output = remote.execute(cmd, arg)
+    output = await remote.execute_async(cmd, arg)
     return web.json_response({
         "output": output,
         "cmd": cmd,
@@ -469,6 +469,23 @@ async def handle_api_command(request):
     })
 
 
+async def _run_loop_tool(request, tool):
+    logger.info("Admin %s started %s", request["admin_user"], tool.__name__)
+    return await loop_profiler.respond(request, tool)
+
+
+@_require_auth
+async def handle_api_profile(request):
+    """Sample the event loop's stack for a while (see server/loop_profiler.py)."""
+    return await _run_loop_tool(request, loop_profiler.run_profile)
+
+
+@_require_auth
+async def handle_api_slow_callbacks(request):
+    """Record event loop callbacks slower than a threshold for a while."""
+    return await _run_loop_tool(request, loop_profiler.run_slow_callback_trace)
+
+
 @_require_auth
 async def handle_ws_live(request):
     """WebSocket endpoint for live log streaming."""
@@ -561,6 +578,8 @@ def create_admin_app(config, server=None):
     app.router.add_post("/api/admin/command", handle_api_command)
     app.router.add_post("/api/admin/ooc_monitor", handle_api_ooc_monitor)
     app.router.add_post("/api/admin/ic_monitor", handle_api_ic_monitor)
+    app.router.add_post("/api/admin/profile", handle_api_profile)
+    app.router.add_post("/api/admin/slow_callbacks", handle_api_slow_callbacks)
 
     # WebSocket route
     app.router.add_get("/ws/live", handle_ws_live)
@@ -121,6 +121,10 @@ class GMPanelApp:
         app.router.add_get("/api/gm/logs/connect_events", require(moderator_routes.handle_api_connect_events))
         app.router.add_get("/api/gm/logs/misc_events", require(moderator_routes.handle_api_misc_events))
         app.router.add_post("/api/gm/logs/live", require(moderator_routes.handle_api_log_live))
+        app.router.add_post("/api/gm/admin/profile", require(moderator_routes.handle_api_profile))
+        app.router.add_post(
+            "/api/gm/admin/slow_callbacks", require(moderator_routes.handle_api_slow_callbacks)
+        )
 
         # Areas tab -- literal/collection routes ("hub/areas/...") registered
         # separately from the per-area "{area_id}/..." routes.
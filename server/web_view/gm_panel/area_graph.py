@@ -0,0 +1,107 @@
+"""Versioned, cached area-graph snapshots for the Areas tab.
+
+`AreaGraph` keeps one hub's serialized graph nodes (`AreaSerializer.graph_dict`)
+between mutations. `GMPanelBridge` marks a graph dirty whenever something may
+have edited the hub (a command ran in it, its areas were created, removed,
+swapped or reloaded, a client joined or left, a roster or background
+changed); the next read rebuilds it once, diffs it against the
+previous nodes, and bumps the version only if something actually changed.
+Occupancy (`AreaSerializer.presence_dict`) is never cached -- it is cheap and
+changes on every move, so it is filled in live on each read.
+
+Changes are id-keyed, matching `Area.id` (the area's index in its hub):
+
+* ``{"op": "add", "area": {...}}`` -- a new area at the end of the list.
+* ``{"op": "remove", "id": n}`` -- drop the last area; emitted highest id first.
+* ``{"op": "update", "id": n, "fields": {...}}`` -- only the fields that
+  changed, including ``links`` when any link changed.
+"""
+
+import collections
+import itertools
+
+from server.web_view.gm_panel.serializers import AreaSerializer
+
+# Graph ids tell apart two graphs that happen to share a hub id and version,
+# e.g. after hubs were reordered or a hub was removed and re-added.
+_graph_ids = itertools.count(1)
+
+
+def diff_nodes(old, new):
+    """The id-keyed change list turning node list `old` into `new`."""
+    changes = []
+    for i, node in enumerate(new):
+        if i >= len(old):
+            changes.append({"op": "add", "area": node})
+        elif node != old[i]:
+            before = old[i]
+            fields = {k: v for k, v in node.items() if before.get(k) != v}
+            changes.append({"op": "update", "id": i, "fields": fields})
+    for i in range(len(old) - 1, len(new) - 1, -1):
+        changes.append({"op": "remove", "id": i})
+    return changes
+
+
+class AreaGraph:
+    """The cached graph nodes, version and recent change log of one hub."""
+
+    def __init__(self, hub, log_limit=64):
+        self.hub = hub
+        self.graph_id = next(_graph_ids)
+        self.version = 0
+        self.dirty = True
+        self._nodes = []
+        self._log = collections.deque(maxlen=log_limit)
+
+    def refresh(self):
+        """
+        Rebuild the nodes if they are dirty. Returns the changes since the
+        previous version, or an empty list when nothing changed.
+        """
+        if not self.dirty:
+            return []
+        self.dirty = False
+        nodes = [AreaSerializer.graph_dict(area) for area in self.hub.areas]
+        if self.version == 0:
+            self._nodes = nodes
+            self.version = 1
+            return []
+        changes = diff_nodes(self._nodes, nodes)
+        self._nodes = nodes
+        if changes:
+            self.version += 1
+            self._log.append((self.version, changes))
+        return changes
+
+    def changes_since(self, version):
+        """
+        Every change after `version`, in order, or None when the log no longer
+        reaches that far back (the caller should send a full snapshot).
+        """
+        if version == self.version:
+            return []
+        if version > self.version or not self._log or self._log[0][0] > version + 1:
+            return None
+        changes = []
+        for logged, entry in self._log:
+            if logged > version:
+                changes.extend(entry)
+        return changes
+
+    def presence(self):
+        """Live occupancy for every area, in id order."""
+        return [AreaSerializer.presence_dict(area) for area in self.hub.areas]
+
+    def etag(self, presence):
+        """A validator covering both the graph version and who is where."""
+        key = tuple(
+            (tuple(p["client_ids"]), tuple(p["gm_client_ids"]), tuple(p["cm_client_ids"]))
+            for p in presence
+        )
+        return f'"{self.graph_id}.{self.version}.{hash(key) & 0xffffffff:x}"'
+
+    def snapshot(self, presence=None):
+        """Full node list: cached graph fields merged with live occupancy."""
+        if presence is None:
+            presence = self.presence()
+        return [dict(node, **occupancy) for node, occupancy in zip(self._nodes, presence)]
@@ -6,8 +6,12 @@ It translates those raw hook calls into structured event dicts and fans them out
 to every in-scope `GMSession`.
 """
 
+import weakref
+
 from server.remote_client import RemoteClient
 
+from server.web_view.gm_panel.area_graph import AreaGraph
+from server.web_view.gm_panel.fanout import Frame
 from server.web_view.gm_panel.serializers import ClientSerializer
 
 
@@ -22,6 +26,7 @@ class GMPanelBridge:
         self._server = server
         self.session_manager = session_manager
         self._config = config
+        self._area_graphs = weakref.WeakKeyDictionary()
 
     @property
     def login_token_ttl(self):
@@ -38,23 +43,65 @@ class GMPanelBridge:
         display_host = host if host not in ("0.0.0.0", "::") else "127.0.0.1"
         return f"{scheme}://{display_host}:{port}/?token={token}"
 
-    def _broadcast_to_hub(self, hub_ids, type_, data):
-        for session in self.session_manager.all_sessions():
-            if not session.is_valid():
-                continue
-            try:
-                hub_id = session.current_hub().id
-            except Exception:
-                continue
-            if hub_id in hub_ids:
-                session.push_event(type_, data)
+    def _broadcast_to_hub(self, hubs, type_, data):
+        """Encode one event once and queue it on every session in `hubs`."""
+        sessions = self.session_manager.sessions_in_hubs(hubs)
+        if not sessions:
+            return
+        frame = Frame(type_, data)
+        for session in sessions:
+            if session.is_valid():
+                session.push(frame)
+
+    def area_graph(self, hub):
+        """
+        The up-to-date `AreaGraph` for `hub`. Rebuilding a dirty graph that
+        turns out to have changed pushes the delta to every panel on the hub.
+        """
+        graph = self._area_graphs.get(hub)
+        if graph is None:
+            graph = self._area_graphs[hub] = AreaGraph(hub)
+        base_version = graph.version
+        changes = graph.refresh()
+        if changes:
+            self._broadcast_to_hub({hub}, "areas_changed", {
+                "hub_id": hub.id,
+                "graph_id": graph.graph_id,
+                "base_version": base_version,
+                "version": graph.version,
+                "changes": changes,
+            })
+        return graph
+
+    def _mark_dirty(self, hub):
+        graph = self._area_graphs.get(hub)
+        if graph is not None:
+            graph.dirty = True
+
+    def on_command_run(self, client):
+        """
+        Hook: `commands.call` ran a command that may have edited its caller's
+        hub. Commands reach other hubs' areas only through `AreaManager`,
+        which reports those changes itself (`on_hub_areas_changed`).
+        """
+        self._mark_dirty(client.area.area_manager)
+
+    def on_hub_areas_changed(self, hub):
+        """Hook: `AreaManager.create_area`/`remove_area`/`swap_area`/`load_areas`."""
+        self._mark_dirty(hub)
 
     def on_client_moved(self, client, old_area, new_area):
         """Hook: `Client.set_area` completed. The animation trigger."""
+        from_hub = old_area.area_manager
+        to_hub = new_area.area_manager
+        self._mark_dirty(from_hub)
+        self._mark_dirty(to_hub)
+        if from_hub is not to_hub:
+            self.session_manager.reindex_client(client)
         if isinstance(client, RemoteClient):
             return
-        from_hub_id = old_area.area_manager.id
-        to_hub_id = new_area.area_manager.id
+        from_hub_id = from_hub.id
+        to_hub_id = to_hub.id
         data = {
             "client_id": client.id,
             "from_area_id": old_area.id,
@@ -69,27 +116,30 @@ class GMPanelBridge:
             "char_name": client.char_name,
             "iniswap": client.iniswap,
         }
-        self._broadcast_to_hub({from_hub_id, to_hub_id}, "client_moved", data)
-        if from_hub_id != to_hub_id:
+        self._broadcast_to_hub({from_hub, to_hub}, "client_moved", data)
+        if from_hub is not to_hub:
             for session in self.session_manager.find_sessions_for_client(client):
                 session.push_event("hub_switched", {
                     "new_hub_id": to_hub_id,
-                    "new_hub_name": new_area.area_manager.name,
+                    "new_hub_name": to_hub.name,
                 })
 
     def on_client_present(self, client, area):
         """Hook: `Area.new_client` -- a client fully joined this area."""
+        self._mark_dirty(area.area_manager)
         if isinstance(client, RemoteClient):
             return
         data = ClientSerializer.to_dict(client)
-        self._broadcast_to_hub({area.area_manager.id}, "client_present", data)
+        self._broadcast_to_hub({area.area_manager}, "client_present", data)
 
     def on_client_absent(self, client, area):
         """Hook: `Area.remove_client` -- a client left this area."""
+        # Leaving can unlock the area or reset its status.
+        self._mark_dirty(area.area_manager)
         if isinstance(client, RemoteClient):
             return
         data = {"client_id": client.id, "area_id": area.id}
-        self._broadcast_to_hub({area.area_manager.id}, "client_absent", data)
+        self._broadcast_to_hub({area.area_manager}, "client_absent", data)
 
     def on_client_disconnected(self, client):
         """Hook: `Server.remove_client`, before the client's id is recycled."""
@@ -98,29 +148,34 @@ class GMPanelBridge:
         area = getattr(client, "area", None)
         if area is not None:
             data = {"client_id": client.id, "last_area_id": area.id}
-            self._broadcast_to_hub({area.area_manager.id}, "client_disconnected", data)
+            self._broadcast_to_hub({area.area_manager}, "client_disconnected", data)
         self.session_manager.invalidate_for_client(client)
 
     def on_hub_gm_roster_changed(self, area_manager):
         """Hook: `AreaManager.add_owner`/`remove_owner`."""
+        self._mark_dirty(area_manager)
         gm_ids = [c.id for c in area_manager.real_owners()]
         data = {"hub_id": area_manager.id, "gm_client_ids": gm_ids}
-        self._broadcast_to_hub({area_manager.id}, "hub_gm_roster_changed", data)
+        self._broadcast_to_hub({area_manager}, "hub_gm_roster_changed", data)
 
     def on_area_cm_roster_changed(self, area):
         """Hook: `Area.add_owner`/`remove_owner`."""
+        self._mark_dirty(area.area_manager)
         cm_ids = [c.id for c in area.real_cms()]
         data = {"area_id": area.id, "cm_client_ids": cm_ids}
-        self._broadcast_to_hub({area.area_manager.id}, "area_cm_roster_changed", data)
+        self._broadcast_to_hub({area.area_manager}, "area_cm_roster_changed", data)
 
     def on_area_background_changed(self, area):
         """Hook: `Area.change_background`/`change_background_suffix`."""
+        self._mark_dirty(area.area_manager)
         data = {"area_id": area.id, "background": area.background, "overlay": area.overlay}
-        self._broadcast_to_hub({area.area_manager.id}, "background_changed", data)
+        self._broadcast_to_hub({area.area_manager}, "background_changed", data)
 
-    def push_areas_changed(self, hub_id):
+    def push_areas_changed(self, hub):
         """
         Called directly by `AreaRoutes` after every successful area/pref/link
-        mutation, so every open panel on this hub refetches its areas snapshot.
+        mutation. Rebuilds the hub's graph once and pushes only what changed
+        (`areas_changed` with a change list) to every open panel on the hub.
         """
-        self._broadcast_to_hub({hub_id}, "areas_changed", {"hub_id": hub_id})
+        self._mark_dirty(hub)
+        self.area_graph(hub)
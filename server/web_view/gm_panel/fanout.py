@@ -0,0 +1,135 @@
+"""Outbound WebSocket queues for the GM panel's ``/ws/gm/live`` stream.
+
+Every event is JSON-encoded exactly once into a `Frame`, and that one string is
+handed to each in-scope socket's `SocketSender`. A sender owns a bounded queue
+and a single drain task, so a slow browser never leaves a pile of pending
+``send`` tasks behind it:
+
+* ``client_moved`` frames still waiting in a socket's queue are coalesced per
+  client -- the socket gets one move from the first pending origin to the
+  latest destination instead of every hop.
+* Monitor frames (``monitor_ooc``/``monitor_ic``) sit in their own short queue
+  that drops the oldest frame when full; they are a live tail, not a log.
+* Everything else drops the oldest pending event once the queue is full.
+"""
+
+import asyncio
+import collections
+import json
+import logging
+
+logger = logging.getLogger("gm_panel")
+
+MONITOR_TYPES = frozenset(("monitor_ooc", "monitor_ic"))
+
+# type -> (key field, fields kept from the oldest pending frame when merging)
+COALESCED_TYPES = {
+    "client_moved": ("client_id", ("from_area_id", "from_hub_id")),
+}
+
+
+class Frame:
+    """One server->client event, encoded once and shared by every socket."""
+
+    __slots__ = ("type", "data", "text", "key")
+
+    def __init__(self, type_, data):
+        self.type = type_
+        self.data = data
+        self.text = json.dumps({"type": type_, "data": data})
+        rule = COALESCED_TYPES.get(type_)
+        self.key = (type_, data.get(rule[0])) if rule is not None else None
+
+    def merged_after(self, older):
+        """This frame, keeping the fields `older` still owes the socket."""
+        kept = COALESCED_TYPES[self.type][1]
+        if all(older.data.get(f) == self.data.get(f) for f in kept):
+            return self
+        data = dict(self.data)
+        for field in kept:
+            data[field] = older.data.get(field)
+        return Frame(self.type, data)
+
+
+class SocketSender:
+    """The bounded send queue and drain task for a single WebSocket."""
+
+    def __init__(self, ws, limit=256, monitor_limit=64):
+        self.ws = ws
+        self._limit = max(1, int(limit))
+        self._events = collections.OrderedDict()
+        self._monitor = collections.deque(maxlen=max(1, int(monitor_limit)))
+        self._seq = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+        self.dropped = 0
+
+    @property
+    def pending(self):
+        return len(self._events) + len(self._monitor)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self._drain())
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def close(self):
+        """Close the socket once everything already queued has been sent."""
+        self._closing = True
+        self._wakeup.set()
+
+    def send(self, type_, data):
+        """Queue a frame meant for this socket alone (hello, pong)."""
+        self.enqueue(Frame(type_, data))
+
+    def enqueue(self, frame):
+        if self._closing:
+            return
+        if frame.type in MONITOR_TYPES:
+            if len(self._monitor) == self._monitor.maxlen:
+                self.dropped += 1
+            self._monitor.append(frame.text)
+        else:
+            key = frame.key
+            if key is None:
+                self._seq += 1
+                key = self._seq
+            else:
+                older = self._events.pop(key, None)
+                if older is not None:
+                    frame = frame.merged_after(older)
+            self._events[key] = frame
+            if len(self._events) > self._limit:
+                self._events.popitem(last=False)
+                self.dropped += 1
+        self._wakeup.set()
+
+    def _next_text(self):
+        if self._events:
+            return self._events.popitem(last=False)[1].text
+        if self._monitor:
+            return self._monitor.popleft()
+        return None
+
+    async def _drain(self):
+        ws = self.ws
+        try:
+            while not ws.closed:
+                text = self._next_text()
+                if text is None:
+                    if self._closing:
+                        await ws.close()
+                        return
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                await ws.send_str(text)
+        except asyncio.CancelledError:
+            pass
+        except Exception as ex:
+            logger.debug("GM panel socket send failed: %s", ex)
@@ -35,7 +35,9 @@ class AreaRoutes:
     # -- shared helpers -----------------------------------------------
 
     def _areas_snapshot(self, hub):
-        return [AreaSerializer.to_dict(area) for area in hub.areas]
+        if self._bridge is None:
+            return [AreaSerializer.to_dict(area) for area in hub.areas]
+        return self._bridge.area_graph(hub).snapshot()
 
     def _area_from_request(self, session, request, key="area_id"):
         """Resolve `{area_id}` from the URL against the session's current hub."""
@@ -52,10 +54,10 @@ class AreaRoutes:
         if self._bridge is None:
             return
         try:
-            hub_id = session.current_hub().id
+            hub = session.current_hub()
         except Exception:
             return
-        self._bridge.push_areas_changed(hub_id)
+        self._bridge.push_areas_changed(hub)
 
     # -- graph snapshot / background (existing) ------------------------
 
@@ -64,8 +66,38 @@ class AreaRoutes:
         if not session.is_valid():
             return web.json_response({"error": "session_invalid"}, status=401)
         hub = session.current_hub()
-        areas = self._areas_snapshot(hub)
-        return web.json_response({"hub_id": hub.id, "hub_name": hub.name, "areas": areas})
+        if self._bridge is None:
+            areas = self._areas_snapshot(hub)
+            return web.json_response({"hub_id": hub.id, "hub_name": hub.name, "areas": areas})
+
+        # Conditional requests: `If-None-Match` against the graph version plus
+        # occupancy, or `?graph_id=&since=` for just the changes after a
+        # version the panel already holds.
+        graph = self._bridge.area_graph(hub)
+        presence = graph.presence()
+        etag = graph.etag(presence)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers=headers)
+        payload = {
+            "hub_id": hub.id,
+            "hub_name": hub.name,
+            "graph_id": graph.graph_id,
+            "version": graph.version,
+        }
+        try:
+            since = int(request.query["since"])
+            same_graph = int(request.query.get("graph_id", -1)) == graph.graph_id
+        except (KeyError, ValueError):
+            since, same_graph = None, False
+        changes = graph.changes_since(since) if same_graph else None
+        if changes is not None:
+            payload["since"] = since
+            payload["changes"] = changes
+            payload["presence"] = presence
+        else:
+            payload["areas"] = graph.snapshot(presence)
+        return web.json_response(payload, headers=headers)
 
     async def handle_set_background(self, request):
         session = request["gm_session"]
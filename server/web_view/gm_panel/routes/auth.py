@@ -147,19 +147,16 @@ class AuthRoutes:
         session = request["gm_session"]
         ws = web.WebSocketResponse()
         await ws.prepare(request)
-        session.add_ws(ws)
+        sender = session.add_ws(ws)
 
         client = session.bound_client
         try:
             hub = client.area.area_manager
-            await ws.send_json({
-                "type": "hello",
-                "data": {
-                    "gm_client_id": client.id,
-                    "hub_id": hub.id,
-                    "hub_name": hub.name,
-                    "area_id": client.area.id,
-                },
+            sender.send("hello", {
+                "gm_client_id": client.id,
+                "hub_id": hub.id,
+                "hub_name": hub.name,
+                "area_id": client.area.id,
             })
             async for msg in ws:
                 if msg.type == aiohttp.WSMsgType.TEXT:
@@ -168,7 +165,7 @@ class AuthRoutes:
                     except Exception:
                         continue
                     if payload.get("type") == "ping":
-                        await ws.send_json({"type": "pong", "data": {}})
+                        sender.send("pong", {})
                 elif msg.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSE):
                     break
         finally:
@@ -58,7 +58,7 @@ class CommandRoutes:
             )
 
         try:
-            output = session.execute_command(cmd, arg)
+            output = await session.execute_command_async(cmd, arg)
         except SessionInvalid:
             return web.json_response({"error": "session_invalid"}, status=401)
         return _command_response(output)
@@ -12,15 +12,23 @@ the monitor toggles are de-gated there so GMs and admins both get them. The
 "Go Live" log stream is the one moderator-specific live feature: ``handle_api_log_live``
 turns on a per-session subscription to ``database.subscribe()`` whose frames are
 fanned out over the shared ``/ws/gm/live`` WebSocket.
+
+The profiler routes run ``server/loop_profiler.py``'s time-bounded event-loop
+sampler and slow-callback trace, so a stalling server can be diagnosed from
+the Admin tab without a shell.
 """
 
+import logging
+
 from aiohttp import web
 
-from server import database
+from server import database, loop_profiler
+
+logger = logging.getLogger("gm_panel")
 
 
 class ModeratorRoutes:
-    """Admin-only routes: log viewer + its live stream."""
+    """Admin-only routes: log viewer + its live stream, and the loop profiler."""
 
     def __init__(self, session_manager, server):
         self._session_manager = session_manager
@@ -147,4 +155,21 @@ class ModeratorRoutes:
             return web.json_response({"ok": False, "error": "invalid_request"}, status=400)
         enabled = bool(data.get("enabled", False))
         session.set_log_live(enabled)
-        return web.json_response({"ok": True, "live": enabled})
\ No newline at end of file
+        return web.json_response({"ok": True, "live": enabled})
+
+    # -- profiler -----------------------------------------------------
+
+    async def _run_loop_tool(self, request, tool):
+        session, err = self._require_admin(request)
+        if err is not None:
+            return err
+        logger.info("GM panel admin %s started %s", session.user, tool.__name__)
+        return await loop_profiler.respond(request, tool)
+
+    async def handle_api_profile(self, request):
+        """Sample the event loop's stack; speedscope JSON or collapsed stacks."""
+        return await self._run_loop_tool(request, loop_profiler.run_profile)
+
+    async def handle_api_slow_callbacks(self, request):
+        """Record event loop callbacks slower than ``threshold_ms``."""
+        return await self._run_loop_tool(request, loop_profiler.run_slow_callback_trace)
@@ -18,6 +18,7 @@ from server.schema.area_fields import (
     AREA_SCALAR_FIELDS,
 )
 from server.schema.link_props import LINK_PROPERTY_SCHEMA
+from server import storage_index
 
 from server.web_view.gm_panel.storage import DATA_KIND_DIRS
 
@@ -97,7 +98,24 @@ class AreaSerializer:
         return links
 
     @staticmethod
-    def to_dict(area):
+    def incoming_links_to_list(area):
+        """
+        Build the JSON list of links pointing at `area` from other areas,
+        read off the hub's reverse link index. Items mirror `links_to_list`
+        with `source_id` in place of `target_id`.
+        """
+        links = []
+        for source, link in area.area_manager.incoming_links(area):
+            item = {"source_id": source.id}
+            for prop in LINK_PROPERTY_SCHEMA:
+                item[prop.export] = prop.to_json(link.get(prop.name, prop.default))
+            links.append(item)
+        links.sort(key=lambda item: item["source_id"])
+        return links
+
+    @staticmethod
+    def presence_dict(area):
+        """The live occupancy fields of a graph node (who is in `area`)."""
         real_clients = AreaSerializer._real_clients(area)
         client_ids = [c.id for c in real_clients]
         gm_ids = [c.id for c in real_clients if c in area.area_manager.owners]
@@ -107,7 +125,18 @@ class AreaSerializer:
         # `is_area_cm` (which correctly uses `area._owners`) so the roster
         # doesn't stamp a CM badge on a hub GM who was never made CM here.
         cm_ids = [c.id for c in real_clients if c in area._owners]
+        return {
+            "client_ids": client_ids,
+            "gm_client_ids": gm_ids,
+            "cm_client_ids": cm_ids,
+        }
 
+    @staticmethod
+    def graph_dict(area):
+        """
+        The area's own fields and links, without occupancy. Only changes when
+        the area is edited, which is what lets `AreaGraph` cache it.
+        """
         return {
             "id": area.id,
             "name": area.name,
@@ -118,13 +147,16 @@ class AreaSerializer:
             "locked": area.locked,
             "status": area.status,
             "pos_lock": [str(p) for p in area.pos_lock],
-            "client_ids": client_ids,
-            "gm_client_ids": gm_ids,
-            "cm_client_ids": cm_ids,
             "links": AreaSerializer.links_to_list(area),
             "fully_connected": len(area.links) == 0,
         }
 
+    @staticmethod
+    def to_dict(area):
+        data = AreaSerializer.graph_dict(area)
+        data.update(AreaSerializer.presence_dict(area))
+        return data
+
 
 class AreaDetailSerializer:
     """
@@ -184,7 +216,7 @@ class AreaDetailSerializer:
             fields[name] = value
 
         # `field_meta` drives the inspector's per-field control type. `music_ref`
-        # options are live -- re-scan `storage/musiclists` on every detail load.
+        # options are live -- read from the storage index on every detail load.
         field_meta = {
             name: dict(meta)
             for name, meta in AreaDetailSerializer.FIELD_META.items()
@@ -196,12 +228,7 @@ class AreaDetailSerializer:
                 DATA_KIND_DIRS["musiclists"],
                 os.path.join(DATA_KIND_DIRS["musiclists"], "read_only"),
             ):
-                try:
-                    for f in os.listdir(root):
-                        if f.lower().endswith(".yaml"):
-                            music_refs.add(f[:-5])
-                except OSError:
-                    continue
+                music_refs.update(storage_index.yaml_names(root))
             field_meta["music_ref"]["options"] = sorted(music_refs)
 
         return {
@@ -211,6 +238,7 @@ class AreaDetailSerializer:
             "field_meta": field_meta,
             "prefs": AreaDetailSerializer._prefs(area),
             "links": AreaSerializer.links_to_list(area),
+            "incoming_links": AreaSerializer.incoming_links_to_list(area),
         }
 
 
@@ -19,6 +19,7 @@ from server import commands
 from server.exceptions import ClientError, ArgumentError, AreaError, ServerError
 
 from server.web_view.gm_panel.commands_meta import CommandOutputScrubber
+from server.web_view.gm_panel.fanout import Frame, SocketSender
 from server.remote_client import RemoteClient
 
 logger = logging.getLogger("gm_panel")
@@ -69,13 +70,17 @@ class GMSession:
     through its public methods.
     """
 
+    # Per-socket queue bounds; `GMSessionManager` overrides these from config.
+    ws_queue_limit = 256
+    ws_monitor_queue_limit = 64
+
     def __init__(self, server, client, bind_key, ttl):
         self._server = server
         self._client = client
         self._bind_key = bind_key
         self._ttl = ttl
         self._created_at = time.time()
-        self._ws_connections = set()
+        self._ws_connections = {}
         self._ooc_listener = None
         self._ic_listener = None
         self._log_live_task = None
@@ -178,15 +183,25 @@ class GMSession:
             raise SessionInvalid()
         return CommandOutputScrubber.scrub(self._run_command(cmd, arg))
 
-    def _run_command(self, cmd, arg):
-        """Execute `cmd` through the bound client and return the raw output lines.
+    async def execute_command_async(self, cmd, arg):
+        """
+        `execute_command` for the free-form console: sliced commands
+        (`/getareas`, mass `/area_kick`, ...) give the event loop back between
+        chunks while the request waits for them to finish.
+        """
+        if not self.is_valid():
+            raise SessionInvalid()
+        return CommandOutputScrubber.scrub(await self._run_command_async(cmd, arg))
 
-        Shared by `execute_command` (which scrubs) and `AdminSession` (which does
-        not). Kept as a single code path so command dispatch, output capture, and
-        the `send_ooc` shadowing are never duplicated.
+    def _start_command(self, cmd, arg, buffer, sliced):
+        """Dispatch `cmd` with the bound client's output captured into `buffer`.
+
+        Shared by `_run_command` and `_run_command_async`, so command dispatch
+        and the `send_ooc` shadowing are never duplicated. The shadow only
+        covers the synchronous part of the call; pages a sliced command yields
+        later reach `buffer` directly through `commands.call`'s `send`.
         """
         client = self._client
-        buffer = []
         original_send_ooc = client.send_ooc
 
         def capture(msg, *a, **kw):
@@ -194,11 +209,32 @@ class GMSession:
 
         client.send_ooc = capture
         try:
-            commands.call(client, cmd, arg)
+            return commands.call(client, cmd, arg, send=capture, sliced=sliced)
         except (ClientError, ArgumentError, AreaError, ServerError) as ex:
             buffer.append(f"[ERROR] {type(ex).__name__}: {ex}")
         finally:
             client.send_ooc = original_send_ooc
+        return None
+
+    def _run_command(self, cmd, arg):
+        """Execute `cmd` through the bound client and return the raw output lines.
+
+        Shared by `execute_command` (which scrubs) and `AdminSession` (which does
+        not). Sliced commands are run to completion before this returns.
+        """
+        buffer = []
+        self._start_command(cmd, arg, buffer, sliced=False)
+        return buffer
+
+    async def _run_command_async(self, cmd, arg):
+        """`_run_command`, awaiting sliced commands instead of running them inline."""
+        buffer = []
+        pending = self._start_command(cmd, arg, buffer, sliced=True)
+        if pending is not None:
+            try:
+                await pending
+            except (ClientError, ArgumentError, AreaError, ServerError) as ex:
+                buffer.append(f"[ERROR] {type(ex).__name__}: {ex}")
         return buffer
 
     def _area_in_scope(self, area):
@@ -367,29 +403,29 @@ class GMSession:
         return bool(ok)
 
     def add_ws(self, ws):
-        self._ws_connections.add(ws)
+        """Start a `SocketSender` for `ws`; all writes to it go through that."""
+        sender = SocketSender(ws, self.ws_queue_limit, self.ws_monitor_queue_limit)
+        self._ws_connections[ws] = sender
+        sender.start()
+        return sender
 
     def remove_ws(self, ws):
-        self._ws_connections.discard(ws)
+        sender = self._ws_connections.pop(ws, None)
+        if sender is not None:
+            sender.cancel()
 
     def push(self, frame):
-        """Fan out an already-shaped frame (a dict) to every socket this session owns."""
-        loop = asyncio.get_event_loop()
-        for ws in list(self._ws_connections):
+        """Queue an already-encoded `Frame` on every socket this session owns."""
+        for ws, sender in list(self._ws_connections.items()):
             if ws.closed:
-                self._ws_connections.discard(ws)
+                self.remove_ws(ws)
                 continue
-            loop.call_soon(asyncio.ensure_future, ws.send_json(frame))
+            sender.enqueue(frame)
 
     def push_event(self, type_, data):
         """Fan out a server->client event to every WebSocket this session owns."""
-        payload = {"type": type_, "data": data}
-        loop = asyncio.get_event_loop()
-        for ws in list(self._ws_connections):
-            if ws.closed:
-                self._ws_connections.discard(ws)
-                continue
-            loop.call_soon(asyncio.ensure_future, ws.send_json(payload))
+        if self._ws_connections:
+            self.push(Frame(type_, data))
 
     def set_monitor(self, kind, enabled):
         """Enable/disable forwarding of OOC or IC frames to this session's sockets.
@@ -467,9 +503,8 @@ class GMSession:
         """Notify and close every WebSocket this session owns, then go dark."""
         self.push_event("session_ended", {"reason": reason})
         self._clear_listeners()
-        loop = asyncio.get_event_loop()
-        for ws in list(self._ws_connections):
-            loop.call_soon(asyncio.ensure_future, ws.close())
+        for sender in self._ws_connections.values():
+            sender.close()
         self._ws_connections.clear()
 
     def _clear_listeners(self):
@@ -634,6 +669,13 @@ class AdminSession(RemoteSession):
             return []
         return self._run_command(cmd, arg)
 
+    async def execute_command_async(self, cmd, arg):
+        if not self.is_valid():
+            raise SessionInvalid()
+        if cmd == "ooc":
+            return self.execute_command(cmd, arg)
+        return await self._run_command_async(cmd, arg)
+
 
 class GMSessionManager:
     """
@@ -654,6 +696,12 @@ class GMSessionManager:
         self._hub_auth_ttl = int(config.get("login_hub_ttl_seconds", 300))
         self._sweep_handle = None
         self._remote_sessions = {}
+        # Sessions filed by the hub (`AreaManager`) their client is in, so
+        # hub-scoped events only visit that hub's sessions.
+        self._hub_sessions = {}
+        self._session_hubs = {}
+        self._ws_queue_limit = int(config.get("ws_queue_limit", 256))
+        self._ws_monitor_queue_limit = int(config.get("ws_monitor_queue_limit", 64))
 
         rl = config.get("rate_limit", {}) or {}
         self._rate_limit = {
@@ -672,6 +720,58 @@ class GMSessionManager:
     def login_token_ttl(self):
         return self._login_token_ttl
 
+    def _register(self, token, session, remote=False):
+        """Store a new session under `token` and file it under its hub."""
+        session.ws_queue_limit = self._ws_queue_limit
+        session.ws_monitor_queue_limit = self._ws_monitor_queue_limit
+        if remote:
+            self._remote_sessions[token] = session
+        else:
+            self._sessions[token] = session
+        self.reindex(session)
+
+    def _unindex(self, session):
+        hub = self._session_hubs.pop(session, None)
+        if hub is None:
+            return
+        bucket = self._hub_sessions.get(hub)
+        if bucket is not None:
+            bucket.discard(session)
+            if not bucket:
+                del self._hub_sessions[hub]
+
+    def reindex(self, session):
+        """Re-file `session` under the hub its client is in right now."""
+        try:
+            hub = session.current_hub()
+        except Exception:
+            hub = None
+        if self._session_hubs.get(session) is hub:
+            return
+        self._unindex(session)
+        if hub is not None:
+            self._session_hubs[session] = hub
+            self._hub_sessions.setdefault(hub, set()).add(session)
+
+    def reindex_client(self, client):
+        """Re-file every session bound to `client` after it changed hubs."""
+        for session in [s for s in self._session_hubs if s.bound_client is client]:
+            self.reindex(session)
+
+    def sessions_in_hubs(self, hubs):
+        """Live sessions whose client is currently in one of `hubs`.
+
+        Entries whose client has since left the hub without going through
+        `Client.set_area` are re-filed on the way.
+        """
+        found = []
+        for hub in hubs:
+            for session in list(self._hub_sessions.get(hub, ())):
+                self.reindex(session)
+                if self._session_hubs.get(session) is hub:
+                    found.append(session)
+        return found
+
     @staticmethod
     def _parse_users(raw_users):
         """Normalize ``gm_panel.users`` into ``{username: {password, role, hubs}}``.
@@ -874,7 +974,7 @@ class GMSessionManager:
             session = AdminSession(self._server, remote, username, self._session_ttl)
             remote.join_area()
             token = secrets.token_urlsafe(32)
-            self._remote_sessions[token] = session
+            self._register(token, session, remote=True)
             return {"token": token, "session": session}, None
 
         # gm role: two-phase login -- return the allowed hubs for the picker.
@@ -925,7 +1025,7 @@ class GMSessionManager:
         remote.join_area(hub.default_area())
         session = RemoteSession(self._server, remote, username, self._session_ttl)
         token = secrets.token_urlsafe(32)
-        self._remote_sessions[token] = session
+        self._register(token, session, remote=True)
         return {"token": token, "session": session}, None
 
     def start_sweep(self):
@@ -946,6 +1046,7 @@ class GMSessionManager:
         for t in expired_tokens:
             session = self._sessions.pop(t, None)
             if session is not None:
+                self._unindex(session)
                 session.expire("expired")
 
         remote_expired = [
@@ -955,6 +1056,7 @@ class GMSessionManager:
         for t in remote_expired:
             session = self._remote_sessions.pop(t, None)
             if session is not None:
+                self._unindex(session)
                 session.expire("expired")
                 session.teardown()
 
@@ -998,7 +1100,7 @@ class GMSessionManager:
 
         session = GMSession(self._server, client, pending.bind_key, self._session_ttl)
         session_token = secrets.token_urlsafe(32)
-        self._sessions[session_token] = session
+        self._register(session_token, session)
         return session_token, session, None
 
     def get_session(self, token):
@@ -1011,6 +1113,7 @@ class GMSessionManager:
         if not session.is_valid() or (time.time() - session.created_at > self._session_ttl):
             self._sessions.pop(token, None)
             self._remote_sessions.pop(token, None)
+            self._unindex(session)
             session.expire("expired")
             return None
         return session
@@ -1023,10 +1126,12 @@ class GMSessionManager:
         for token, s in list(self._sessions.items()):
             if s is session:
                 del self._sessions[token]
+                self._unindex(session)
                 return
         for token, s in list(self._remote_sessions.items()):
             if s is session:
                 del self._remote_sessions[token]
+                self._unindex(session)
                 session.teardown()
                 return
 
@@ -1039,6 +1144,7 @@ class GMSessionManager:
         for t in tokens:
             session = self._sessions.pop(t, None)
             if session is not None:
+                self._unindex(session)
                 session.expire("disconnected")
 
     def all_sessions(self):
@@ -11,6 +11,8 @@ import re
 
 from aiohttp import web
 
+from server import storage_index
+
 
 # =============================================================================
 # Command output classification
@@ -81,11 +83,7 @@ _MAX_DATA_FILE_BYTES = 256 * 1024
 
 def _list_yaml_names(path):
     """List `*.yaml` filenames (minus extension) under `path`, sorted."""
-    try:
-        names = [f[:-5] for f in os.listdir(path) if f.lower().endswith(".yaml")]
-        return sorted(names)
-    except FileNotFoundError:
-        return []
+    return storage_index.yaml_names(path)
 
 
 # A "subpath" data name may descend at most this many directory levels below a
@@ -99,29 +97,10 @@ def _walk_data_files(base):
     Recursively list `*.yaml` files under `base`, as relative paths WITHOUT the
     `.yaml` extension using "/" separators, sorted. Any directory literally
     named `read_only` is skipped entirely; recursion never follows symlinks and
-    stops at `_MAX_DATA_SUBDIR_DEPTH` levels below `base`.
+    stops at `_MAX_DATA_SUBDIR_DEPTH` levels below `base`. Answered from the
+    shared `storage_index`.
     """
-    base = os.path.normpath(base)
-    try:
-        base_depth = base.count(os.sep)
-    except Exception:
-        return []
-    results = []
-    for root, dirs, files in os.walk(base, followlinks=False):
-        dirs[:] = [d for d in dirs if d != "read_only"]
-        depth = root.count(os.sep) - base_depth
-        if depth >= _MAX_DATA_SUBDIR_DEPTH:
-            dirs[:] = []
-        rel_dir = os.path.relpath(root, base)
-        for f in files:
-            if not f.lower().endswith(".yaml"):
-                continue
-            stem = f[:-5]
-            if rel_dir == ".":
-                results.append(stem)
-            else:
-                results.append("/".join(rel_dir.split(os.sep) + [stem]))
-    return sorted(results)
+    return storage_index.walk_yaml(base, _MAX_DATA_SUBDIR_DEPTH, skip=("read_only",))
 
 
 def _path_inside(root_realpath, candidate_path):
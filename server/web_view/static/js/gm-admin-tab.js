@@ -4,11 +4,14 @@
  * (admin.js). The admin console is the shared Commands tab console, and the
  * former players list + OOC/IC monitors now live in the Clients tab (admin
  * quick actions) and the Commands tab (monitor toggles). This tab is the
- * log viewer only -- the global Area/Connect/Misc event log with filters,
- * PAGE_SIZE=100 pagination and a "Go Live" stream.
+ * log viewer -- the global Area/Connect/Misc event log with filters,
+ * PAGE_SIZE=100 pagination and a "Go Live" stream -- plus a Profiler sub-tab
+ * that runs the server's time-bounded event-loop sampler or slow-callback
+ * trace and offers the result as a download (speedscope JSON or collapsed
+ * stacks).
  *
  * It talks only to the admin-gated moderator endpoints (`/api/gm/logs/*`,
- * `/api/gm/logs/live`). Live rows stream over the shared `/ws/gm/live`
+ * `/api/gm/logs/live`, `/api/gm/admin/*`). Live rows stream over the shared `/ws/gm/live`
  * WebSocket: enabling "Go Live" calls `/api/gm/logs/live`, which subscribes
  * this session to `database.subscribe()` server-side and fans the rows out
  * here as `{"type": "area"|"connect"|"misc", "data": {...}}` frames.
@@ -40,6 +43,31 @@ class AdminTab extends TabBase {
                     <button class="gm-admin-subtab active" data-tab="area">Area Events</button>
                     <button class="gm-admin-subtab" data-tab="connect">Connections</button>
                     <button class="gm-admin-subtab" data-tab="misc">System/Misc</button>
+                    <button class="gm-admin-subtab" data-tab="profiler">Profiler</button>
+                </div>
+
+                <div class="gm-admin-profiler" id="admProfiler" style="display:none">
+                    <div class="gm-admin-toolbar">
+                        <label>Seconds</label>
+                        <input type="number" id="admProfDuration" value="10" min="1" max="60">
+                        <label>Interval (ms)</label>
+                        <input type="number" id="admProfInterval" value="5" min="1" max="1000">
+                        <label>Format</label>
+                        <select id="admProfFormat">
+                            <option value="speedscope">speedscope JSON</option>
+                            <option value="collapsed">collapsed stacks</option>
+                        </select>
+                        <button class="btn-sm" id="admProfBtn">Sample loop</button>
+                        <label>Slower than (ms)</label>
+                        <input type="number" id="admProfThreshold" value="100" min="0">
+                        <button class="btn-sm" id="admSlowBtn">Trace slow callbacks</button>
+                        <button class="btn-sm" id="admProfDownload" disabled>Download</button>
+                    </div>
+                    <div class="gm-admin-prof-status" id="admProfStatus">
+                        Samples the event loop on a live server. Open downloaded
+                        speedscope files at https://www.speedscope.app.
+                    </div>
+                    <div class="gm-admin-content gm-scroll-area" id="admProfOutput"></div>
                 </div>
 
                 <div class="gm-admin-toolbar" id="admLogTool">
@@ -89,6 +117,9 @@ class AdminTab extends TabBase {
         this.root.querySelector('#admLiveBtn').addEventListener('click', () => this._toggleLive());
         this.root.querySelector('#admPrevBtn').addEventListener('click', () => this._prevPage());
         this.root.querySelector('#admNextBtn').addEventListener('click', () => this._nextPage());
+        this.root.querySelector('#admProfBtn').addEventListener('click', () => this._runProfile());
+        this.root.querySelector('#admSlowBtn').addEventListener('click', () => this._runSlowTrace());
+        this.root.querySelector('#admProfDownload').addEventListener('click', () => this._downloadProfile());
     }
 
     // --- lifecycle ------------------------------------------------------
@@ -114,10 +145,18 @@ class AdminTab extends TabBase {
     // --- sub-tabs -------------------------------------------------------
 
     _switchTab(tab) {
-        this.currentTab = tab;
-        this.currentPage = 0;
         this.root.querySelectorAll('.gm-admin-subtab').forEach((el) =>
             el.classList.toggle('active', el.dataset.tab === tab));
+        const profiler = tab === 'profiler';
+        this.root.querySelector('#admProfiler').style.display = profiler ? '' : 'none';
+        this.root.querySelector('#admLogTool').style.display = profiler ? 'none' : '';
+        this._contentEl.style.display = profiler ? 'none' : '';
+        if (profiler) {
+            this._pagination.style.display = 'none';
+            return;
+        }
+        this.currentTab = tab;
+        this.currentPage = 0;
 
         const isArea = tab === 'area';
         this._filterHub.style.display = isArea ? '' : 'none';
@@ -384,6 +423,81 @@ class AdminTab extends TabBase {
         this._updatePagination();
     }
 
+    // --- profiler ---------------------------------------------------------
+
+    _profilerBusy(busy, message) {
+        this.root.querySelector('#admProfBtn').disabled = busy;
+        this.root.querySelector('#admSlowBtn').disabled = busy;
+        this.root.querySelector('#admProfStatus').textContent = message;
+    }
+
+    _profileSeconds() {
+        return Number(this.root.querySelector('#admProfDuration').value) || 10;
+    }
+
+    async _runProfile() {
+        const seconds = this._profileSeconds();
+        const interval = Number(this.root.querySelector('#admProfInterval').value) || 5;
+        const format = this.root.querySelector('#admProfFormat').value;
+        this._profilerBusy(true, `Sampling the event loop for ${seconds}s...`);
+        try {
+            const result = await this.api.profileLoop(seconds, interval, format);
+            this._profileResult = result;
+            this.root.querySelector('#admProfDownload').disabled = false;
+            const out = this.root.querySelector('#admProfOutput');
+            if (result.format === 'collapsed') {
+                out.innerHTML = `<pre>${esc(result.profile)}</pre>`;
+            } else {
+                out.innerHTML = '<div class="gm-empty">speedscope profile ready -- use Download.</div>';
+            }
+            this._profilerBusy(false,
+                `${result.samples} samples over ${result.duration}s every ${result.interval_ms}ms.`);
+        } catch (e) {
+            this._profilerBusy(false, 'Profile failed: ' + e.message);
+        }
+    }
+
+    async _runSlowTrace() {
+        const seconds = this._profileSeconds();
+        const threshold = Number(this.root.querySelector('#admProfThreshold').value) || 0;
+        this._profilerBusy(true, `Tracing callbacks slower than ${threshold}ms for ${seconds}s...`);
+        try {
+            const result = await this.api.traceSlowCallbacks(seconds, threshold);
+            this._profileResult = result;
+            this.root.querySelector('#admProfDownload').disabled = false;
+            const rows = (result.callbacks || []).map((cb) =>
+                `<tr><td>${new Date(cb.at * 1000).toLocaleTimeString()}</td><td>${cb.ms}</td>` +
+                `<td>${esc(cb.callback)}</td><td>${esc(cb.source)}</td></tr>`).join('');
+            this.root.querySelector('#admProfOutput').innerHTML = rows
+                ? `<table class="gm-table"><thead><tr><th>Time</th><th>ms</th><th>Callback</th><th>Source</th></tr></thead><tbody>${rows}</tbody></table>`
+                : '<div class="gm-empty">No slow callbacks</div>';
+            this._profilerBusy(false, `${(result.callbacks || []).length} callbacks over ${result.threshold_ms}ms.`);
+        } catch (e) {
+            this._profilerBusy(false, 'Trace failed: ' + e.message);
+        }
+    }
+
+    _downloadProfile() {
+        const result = this._profileResult;
+        if (!result) return;
+        let body = JSON.stringify(result.callbacks || result.profile);
+        let name = 'slow-callbacks.json';
+        let type = 'application/json';
+        if (result.format === 'collapsed') {
+            body = result.profile;
+            name = 'loop-profile.txt';
+            type = 'text/plain';
+        } else if (result.format === 'speedscope') {
+            name = 'loop-profile.speedscope.json';
+        }
+        const url = URL.createObjectURL(new Blob([body], { type }));
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = name;
+        a.click();
+        setTimeout(() => URL.revokeObjectURL(url), 1000);
+    }
+
     // --- scoped styles ----------------------------------------------------
 
     _injectStyles() {
@@ -421,6 +535,9 @@ class AdminTab extends TabBase {
             .tag-misc { background: #4a4a4a; color: #e4e4e4; }
             .gm-admin-pagination { display: flex; align-items: center; gap: 0.6rem; }
             .gm-admin-pagination span { color: var(--gm-text-dim); font-size: 0.8rem; }
+            .gm-admin-profiler { display: flex; flex-direction: column; gap: 0.5rem; flex: 1 1 auto; min-height: 0; }
+            .gm-admin-prof-status { color: var(--gm-text-dim); font-size: 0.8rem; }
+            .gm-admin-profiler pre { font-size: 0.75rem; white-space: pre; margin: 0; }
         `;
         document.head.appendChild(style);
     }
@@ -102,6 +102,13 @@ class ApiClient {
     getConnectEvents(params) { return this.get('/api/gm/logs/connect_events?' + this._qs(params)); }
     getMiscEvents(params) { return this.get('/api/gm/logs/misc_events?' + this._qs(params)); }
     setLogLive(enabled) { return this.post('/api/gm/logs/live', { enabled }); }
+    // Event-loop profiler: both block for `duration` seconds server-side.
+    profileLoop(duration, intervalMs, format) {
+        return this.post('/api/gm/admin/profile', { duration, interval_ms: intervalMs, format });
+    }
+    traceSlowCallbacks(duration, thresholdMs) {
+        return this.post('/api/gm/admin/slow_callbacks', { duration, threshold_ms: thresholdMs });
+    }
 
     _qs(params) {
         const q = [];
@@ -290,14 +290,46 @@ class AreasGraphTab extends TabBase {
             case 'client_disconnected':
             case 'hub_gm_roster_changed':
             case 'area_cm_roster_changed':
-            case 'areas_changed':
                 this.reload();
                 break;
+            case 'areas_changed':
+                if (!this._applyAreasChanges(msg.data)) this.reload();
+                break;
             default:
                 break;
         }
     }
 
+    /** Apply a pushed `areas_changed` delta (see gm_panel/area_graph.py) to
+     * the held snapshot instead of refetching every area. Returns false when
+     * the delta doesn't start from the graph/version we hold, in which case
+     * the caller falls back to a full reload(). */
+    _applyAreasChanges(data) {
+        const hub = this._hubData;
+        if (!hub || !data || !Array.isArray(data.changes)) return false;
+        if (hub.graph_id !== data.graph_id || hub.version !== data.base_version) return false;
+        const areas = hub.areas;
+        for (const change of data.changes) {
+            if (change.op === 'add') {
+                areas.push(Object.assign(
+                    { client_ids: [], gm_client_ids: [], cm_client_ids: [] }, change.area,
+                ));
+            } else if (change.op === 'remove') {
+                areas.splice(change.id, 1);
+            } else if (change.op === 'update' && areas[change.id]) {
+                Object.assign(areas[change.id], change.fields);
+            }
+        }
+        hub.version = data.version;
+        this._renderer.setData(hub);
+        this._populateCreatePositionSelect();
+        if (this._selectedAreaId !== null) {
+            if (!areas.some((a) => a.id === this._selectedAreaId)) this._closeInspector();
+            else this._refreshInspector();
+        }
+        return true;
+    }
+
     _onClientMoved(data) {
         if (!this._hubData) { this.reload(); return; }
         const inScopeFrom = data.from_hub_id === this._hubData.hub_id &&
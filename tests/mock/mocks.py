@@ -1,4 +1,5 @@
 import asyncio
+from types import SimpleNamespace
 from typing import Callable, Optional
 
 
@@ -53,12 +54,14 @@ class MockServer:
     """Tiny server façade exposing only what AOProtocol touches in tests.
 
     Attributes
-    - config: dict with at least `timeout` key
+    - config: dict of raw options
+    - settings: stands in for `server.settings`, with at least `timeout`
     - client_manager: object exposing `new_client_preauth`
     """
 
     def __init__(self, timeout: float = 1.0, client_factory: Optional[Callable] = None):
         self.config = {"timeout": timeout}
+        self.settings = SimpleNamespace(timeout=timeout)
         self.client_manager = MockClientManager()
         self._client_factory = client_factory or (lambda transport: MockClient(transport))
 
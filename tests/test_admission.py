@@ -0,0 +1,84 @@
+from server.network.admission import Admission, TokenBucket
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_at_rate_up_to_burst():
+    bucket = TokenBucket(rate=2, burst=3, now=0.0)
+    assert [bucket.take(0.0) for _ in range(4)] == [True, True, True, False]
+    assert bucket.take(0.5)
+    assert not bucket.take(0.5)
+    # A long pause never banks more than the burst
+    assert [bucket.take(100.0) for _ in range(4)] == [True, True, True, False]
+
+
+def test_packets_are_limited_per_header_and_shared_per_ipid():
+    clock = _Clock()
+    admission = Admission(
+        packets={"default": {"rate": 1, "burst": 2}, "MS": {"rate": 1, "burst": 1}},
+        ipid_scale=1, strikes={"rate": 1, "burst": 10}, clock=clock,
+    )
+    first, second = admission.new_connection(), admission.new_connection()
+    assert admission.admit_packet(first, 1, "MS") == Admission.ACCEPT
+    assert admission.admit_packet(first, 1, "MS") == Admission.DROP
+    # Other packet types have their own buckets
+    assert admission.admit_packet(first, 1, "CH") == Admission.ACCEPT
+    # A second connection of the same IPID shares the IPID bucket
+    assert admission.admit_packet(second, 1, "MS") == Admission.DROP
+    assert admission.admit_packet(admission.new_connection(), 2, "MS") == Admission.ACCEPT
+    clock.now = 1.0
+    assert admission.admit_packet(first, 1, "MS") == Admission.ACCEPT
+    assert first.dropped == 1
+
+
+def test_unknown_headers_share_the_default_bucket():
+    admission = Admission(
+        packets={"default": {"rate": 1, "burst": 2}},
+        ipid_scale=1, strikes={"rate": 0.1, "burst": 2}, clock=_Clock(),
+    )
+    state = admission.new_connection()
+    verdicts = [admission.admit_packet(state, 1, f"X{i}") for i in range(6)]
+    assert verdicts == [Admission.ACCEPT] * 2 + [Admission.DROP] * 2 + [Admission.KICK] * 2
+    assert list(state.buckets) == ["default"]
+    assert list(admission._ipid_buckets[1]) == ["default"]
+
+
+def test_strikes_escalate_to_kick_and_kicks_to_ban():
+    clock = _Clock()
+    admission = Admission(
+        packets={"default": {"rate": 1, "burst": 1}},
+        strikes={"rate": 0.1, "burst": 2}, kicks_to_ban=2, ban_seconds=60, clock=clock,
+    )
+    state = admission.new_connection()
+    verdicts = [admission.admit_packet(state, 1, "HP") for _ in range(4)]
+    assert verdicts == [Admission.ACCEPT, Admission.DROP, Admission.DROP, Admission.KICK]
+
+    assert not admission.flood_kicked("192.0.2.1")
+    assert admission.admit_connection("192.0.2.1")
+    assert admission.flood_kicked("192.0.2.1")
+    assert not admission.admit_connection("192.0.2.1")
+    assert admission.banned_for("192.0.2.1") == 60
+    clock.now = 61.0
+    assert admission.admit_connection("192.0.2.1")
+
+
+def test_connection_rate_is_per_ip():
+    clock = _Clock()
+    admission = Admission(connections={"rate": 1, "burst": 2}, clock=clock)
+    assert [admission.admit_connection("192.0.2.1") for _ in range(3)] == [True, True, False]
+    assert admission.admit_connection("192.0.2.2")
+    clock.now = 1.0
+    assert admission.admit_connection("192.0.2.1")
+
+
+def test_disabled_in_config():
+    assert Admission.from_config({"admission": {"enabled": False}}) is None
+    admission = Admission.from_config({"admission": {"packets": {"MS": {"rate": 9, "burst": 9}}}})
+    assert admission.rules["MS"] == {"rate": 9, "burst": 9}
+    assert admission.rules["CT"] == {"rate": 5, "burst": 20}
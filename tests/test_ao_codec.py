@@ -0,0 +1,87 @@
+from itertools import product
+
+from server.network import ao_codec
+
+PIECES = ["#", "%", "$", "&", "<", ">", "a", "<num>", "<percent>", "<dollar>", "<and>", "num"]
+
+
+def legacy_escape(arg):
+    return (
+        str(arg)
+        .replace("#", "<num>")
+        .replace("%", "<percent>")
+        .replace("$", "<dollar>")
+        .replace("&", "<and>")
+    )
+
+
+def legacy_unescape(text):
+    return text.replace("<num>", "#").replace("<percent>", "%").replace("<dollar>", "$").replace("<and>", "&")
+
+
+def legacy_frame(command, args):
+    message = f"{legacy_escape(command)}#"
+    for arg in args:
+        if type(arg) is tuple:
+            arg = "&".join(legacy_escape(item) for item in arg)
+        else:
+            arg = legacy_escape(arg)
+        message += f"{arg}#"
+    return message + "%"
+
+
+def legacy_messages(buffer):
+    messages = []
+    while "#%" in buffer:
+        spl = buffer.split("#%", 1)
+        buffer = spl[1]
+        messages.append(spl[0])
+    return messages, buffer
+
+
+def _texts(length):
+    for n in range(length + 1):
+        for parts in product(PIECES, repeat=n):
+            yield "".join(parts)
+
+
+def test_escape_and_unescape_match_the_chained_replaces():
+    for text in _texts(3):
+        assert ao_codec.escape(text) == legacy_escape(text), text
+        assert ao_codec.unescape(text) == legacy_unescape(text), text
+
+
+def test_unescape_reverses_escape():
+    for parts in product("#%$&<>a", repeat=4):
+        text = "".join(parts)
+        assert ao_codec.unescape(ao_codec.escape(text)) == text
+
+
+def test_non_string_arguments():
+    for arg in (0, -1, 12345, True, 1.5, None):
+        assert ao_codec.escape(arg) == legacy_escape(arg)
+
+
+def test_frames_match_the_old_send_command_text():
+    cases = [
+        ("CHECK", ()),
+        ("CT", ("$Host", "50% off & #1", "1")),
+        ("MC", ("~stop.mp3", -1, "", 1, 0, 0)),
+        ("LE", (("Knife #1", "50% & sharp", "knife.png"), ("Map", "", ""))),
+        ("FA", ("🌐 Hubs 🌐\n", "[0] Main (users: 3)")),
+    ]
+    for command, args in cases:
+        assert ao_codec.encode_frame(command, args) == legacy_frame(command, args)
+        assert ao_codec.build_frame(command, args) == legacy_frame(command, args).encode("utf-8")
+
+
+def test_split_frames_keeps_the_partial_packet():
+    stream = "HI#abc#%ID#1#AO2#%#%CH#1#%MS#chat#-#Pho"
+    for cut in range(len(stream) + 1):
+        buffer = stream[:cut]
+        assert ao_codec.split_frames(buffer) == legacy_messages(buffer)
+    frames, rest = ao_codec.split_frames(stream)
+    assert [ao_codec.parse_frame(frame) for frame in frames] == [
+        ("HI", ["abc"]), ("ID", ["1", "AO2"]), ("", []), ("CH", ["1"]),
+    ]
+    assert rest == "MS#chat#-#Pho"
@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+
+from server.area_manager import AreaManager
+from server.web_view.gm_panel.area_graph import AreaGraph
+
+
+def _hub(area_count):
+    hub_manager = SimpleNamespace(
+        server=SimpleNamespace(char_list=[], config={}), hubs=[]
+    )
+    hub = AreaManager(hub_manager, "Hub")
+    hub_manager.hubs.append(hub)
+    for _ in range(area_count):
+        hub.create_area()
+    return hub
+
+
+def _apply(nodes, changes):
+    nodes = [dict(node) for node in nodes]
+    for change in changes:
+        if change["op"] == "add":
+            empty = {"client_ids": [], "gm_client_ids": [], "cm_client_ids": []}
+            nodes.append(dict(change["area"], **empty))
+        elif change["op"] == "remove":
+            del nodes[change["id"]]
+        else:
+            nodes[change["id"]].update(change["fields"])
+    return nodes
+
+
+def test_graph_is_cached_until_marked_dirty():
+    hub = _hub(3)
+    graph = AreaGraph(hub)
+    assert graph.refresh() == []
+    assert graph.version == 1
+    hub.areas[0].name = "Renamed"
+    # Not marked dirty: the cached snapshot is served as-is
+    assert graph.refresh() == []
+    assert graph.snapshot()[0]["name"] == "Area 0"
+    graph.dirty = True
+    assert graph.refresh() == [{"op": "update", "id": 0, "fields": {"name": "Renamed"}}]
+    assert graph.version == 2
+    # Rebuilding without a real change keeps the version
+    graph.dirty = True
+    assert graph.refresh() == []
+    assert graph.version == 2
+
+
+def test_changes_since_replays_to_current_snapshot():
+    hub = _hub(3)
+    graph = AreaGraph(hub, log_limit=2)
+    graph.refresh()
+    old = graph.snapshot()
+    hub.areas[1].link(2, seethrough=True)
+    graph.dirty = True
+    graph.refresh()
+    hub.remove_area(hub.areas[2])
+    hub.create_area()
+    hub.create_area()
+    graph.dirty = True
+    graph.refresh()
+    assert graph.version == 3
+    changes = graph.changes_since(1)
+    assert [c["op"] for c in changes].count("add") == 1
+    assert _apply(old, changes) == graph.snapshot()
+    assert graph.changes_since(3) == []
+
+    hub.remove_area(hub.areas[3])
+    graph.dirty = True
+    assert graph.refresh() == [{"op": "remove", "id": 3}]
+    # The log only holds the last two versions now
+    assert graph.changes_since(1) is None
+    assert graph.changes_since(2) is not None
+
+
+def test_etag_tracks_presence():
+    hub = _hub(2)
+    graph = AreaGraph(hub)
+    graph.refresh()
+    presence = graph.presence()
+    before = graph.etag(presence)
+    assert graph.etag(graph.presence()) == before
+    presence[0] = dict(presence[0], client_ids=[5])
+    assert graph.etag(presence) != before
+
+
+def test_bridge_marks_only_the_hub_that_changed():
+    from server.web_view.gm_panel.bridge import GMPanelBridge
+
+    sessions = SimpleNamespace(sessions_in_hubs=lambda hubs: [])
+    bridge = GMPanelBridge(None, sessions, {})
+    first, second = _hub(2), _hub(2)
+    graphs = [bridge.area_graph(first), bridge.area_graph(second)]
+
+    bridge.on_command_run(SimpleNamespace(area=first.areas[0]))
+    assert [g.dirty for g in graphs] == [True, False]
+    bridge.area_graph(first)
+
+    # Area list changes report themselves, wherever they come from
+    second.hub_manager.server.gm_panel_bridge = bridge
+    second.create_area()
+    assert [g.dirty for g in graphs] == [False, True]
+    assert bridge.area_graph(second).snapshot()[-1]["name"] == "Area 2"
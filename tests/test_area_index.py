@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+from server.area_manager import AreaManager
+
+
+class _Client:
+    def __init__(self, cid, char_id=None, pos=""):
+        self.id = cid
+        self.char_id = char_id
+        self.pos = pos
+
+
+def _area():
+    hub_manager = SimpleNamespace(
+        server=SimpleNamespace(char_list=[], config={}), hubs=[]
+    )
+    hub = AreaManager(hub_manager, "Hub")
+    hub_manager.hubs.append(hub)
+    return hub.create_area()
+
+
+def _join(area, client):
+    area.clients.add(client)
+    area.index_client(client)
+
+
+def test_clients_are_indexed_by_char_and_sorted_by_id_per_pos():
+    area = _area()
+    clients = [_Client(5, 1, "def"), _Client(2, 1, "def"), _Client(9, 3, "pro")]
+    for c in clients:
+        _join(area, c)
+    assert area.clients_with_char(1) == [clients[0], clients[1]]
+    assert area.clients_at_pos("def") == [clients[1], clients[0]]
+    assert area.clients_with_char(4) == ()
+    assert set(area.taken_char_ids) == {1, 3}
+
+
+def test_reindexing_follows_char_and_pos_changes():
+    area = _area()
+    a, b = _Client(1, 1, "def"), _Client(2, 2, "def")
+    _join(area, a)
+    _join(area, b)
+    b.char_id, b.pos = 1, "wit"
+    area.index_client(b)
+    assert area.clients_with_char(2) == ()
+    assert area.clients_with_char(1) == [a, b]
+    assert area.clients_at_pos("def") == [a]
+    assert area.clients_at_pos("wit") == [b]
+    # Unindexing uses the keys the client was filed under, not its current ones
+    a.char_id, a.pos = 7, "jud"
+    area.unindex_client(a)
+    assert area.clients_with_char(1) == [b]
+    assert area.clients_at_pos("def") == ()
+    assert set(area.taken_char_ids) == {1}
+
+
+def test_char_availability_ignores_owners():
+    area = _area()
+    a = _Client(1, 4, "def")
+    _join(area, a)
+    assert area.is_char_available(5)
+    assert not area.is_char_available(4)
+    area._owners.add(a)
+    assert area.is_char_available(4)
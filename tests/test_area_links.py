@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+from server.area_manager import AreaManager
+
+
+def _hub(area_count):
+    hub_manager = SimpleNamespace(
+        server=SimpleNamespace(char_list=[], config={}), hubs=[]
+    )
+    hub = AreaManager(hub_manager, "Hub")
+    hub_manager.hubs.append(hub)
+    for _ in range(area_count):
+        hub.create_area()
+    return hub
+
+
+def _sources(hub, area_id, prop=None):
+    return sorted(source.name for source, _ in hub.incoming_links(area_id, prop))
+
+
+def test_incoming_links_follow_link_and_unlink():
+    hub = _hub(3)
+    a0, a1, a2 = hub.areas
+    a0.link(2, seethrough=True)
+    a1.link(2)
+    assert _sources(hub, a2) == ["Area 0", "Area 1"]
+    assert _sources(hub, 2, "seethrough") == ["Area 0"]
+    # Flags edited in place on the link dict are picked up too
+    a1.links["2"]["locked"] = True
+    assert _sources(hub, 2, "locked") == ["Area 1"]
+    a0.unlink(2)
+    assert _sources(hub, 2) == ["Area 1"]
+    a1.clear_links()
+    assert hub.incoming_links(a2) == []
+
+
+def test_incoming_links_survive_swap_and_remove():
+    hub = _hub(4)
+    a0, a1, a2, a3 = hub.areas
+    a0.link(1)
+    a3.link(2, seethrough=True)
+    hub.swap_area(a1, a2)
+    assert _sources(hub, a1) == ["Area 0"]
+    assert _sources(hub, a2, "seethrough") == ["Area 3"]
+    hub.remove_area(a0)
+    assert hub.incoming_links(a1) == []
+    assert _sources(hub, a2, "seethrough") == ["Area 3"]
+    assert hub.incoming == {str(a2.id): {a3: a3.links[str(a2.id)]}}
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+from server.area_manager import AreaManager
+
+
+class _Client:
+    def __init__(self, cid, showname, remote_listen=2):
+        self.id = cid
+        self.showname = showname
+        self.remote_listen = remote_listen
+        self.sent = []
+
+    def send_command(self, cmd, *args):
+        self.sent.append(cmd)
+
+
+def _area():
+    hub_manager = SimpleNamespace(
+        server=SimpleNamespace(char_list=[], config={}), hubs=[]
+    )
+    hub = AreaManager(hub_manager, "Hub")
+    hub_manager.hubs.append(hub)
+    return hub.create_area()
+
+
+def test_owners_view_is_cached_until_either_set_changes():
+    area = _area()
+    cm, gm = _Client(3, "Maya"), _Client(1, "Phoenix")
+    area._owners.add(cm)
+    owners = area.owners
+    assert owners == {cm}
+    assert area.owners is owners
+
+    area.area_manager.owners.add(gm)
+    assert area.owners == {cm, gm}
+    area._owners.discard(cm)
+    assert area.owners == {gm}
+    assert area.real_cms() == set()
+
+
+def test_cm_label_is_sorted_and_follows_shownames():
+    area = _area()
+    a, b = _Client(4, "Maya"), _Client(2, "Phoenix")
+    area._owners.update([a, b])
+    assert area.get_owners() == "[2] Phoenix, [4] Maya"
+    b.showname = "Nick"
+    assert area.get_owners() == "[2] Nick, [4] Maya"
+    area._owners.clear()
+    assert area.get_owners() == ""
+
+
+def test_remote_listeners_by_mode():
+    area = _area()
+    ic, ooc, both, none = (_Client(i, f"c{i}", mode) for i, mode in enumerate((1, 2, 3, 0)))
+    area._owners.update([ic, ooc, both, none])
+    inside = _Client(9, "inside", 3)
+    area._owners.add(inside)
+    area.clients.add(inside)
+
+    area.send_owner_command("MS")
+    area.send_owner_command("CT")
+    area.send_owner_command("BN")
+    assert ic.sent == ["MS"]
+    assert ooc.sent == ["CT"]
+    assert both.sent == ["MS", "CT", "BN"]
+    assert none.sent == [] and inside.sent == []
+
+    # A changed listen mode is picked up once the owner set is touched
+    none.remote_listen = 3
+    area._owners.touch()
+    area.send_owner_command("CT")
+    assert none.sent == ["CT"]
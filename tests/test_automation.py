@@ -16,6 +16,7 @@ from server.area import Area
 from server.evidence import EvidenceList
 from server.exceptions import ServerError
 from server.script_runner import ScriptRunner, parse_demo_description
+from server.settings import Settings
 from server.timer import Timer
 
 
@@ -100,6 +101,9 @@ class FakeAreaManager:
             char = self.char_list[char]
         self.character_data.setdefault(char, {})[key] = value
 
+    def remove_character_data(self, char, key):
+        return self.character_data.get(char, {}).pop(key, None) is not None
+
     def save_character_data(self, path=None):
         self.saved_paths.append(path)
 
@@ -791,6 +795,9 @@ class FakeHubManager:
     def default_hub(self):
         return FakeHub()
 
+    def broadcast_hub_list(self, hubs=None):
+        pass
+
 
 def _make_server():
     return SimpleNamespace(
@@ -811,6 +818,33 @@ def _make_remote_client(monkeypatch):
     return RemoteClient(_make_server(), is_mod=True)
 
 
+def test_remote_client_execute_refuses_async_commands_on_the_loop(monkeypatch):
+    """On the loop an async command can't finish inside `execute`; it never starts."""
+    ran = []
+
+    async def ooc_cmd_slow(client, arg):
+        ran.append(arg)
+        client.send_ooc("done")
+
+    monkeypatch.setattr(commands, "ooc_cmd_slow", ooc_cmd_slow, raising=False)
+    remote = _make_remote_client(monkeypatch)
+    remote.server.command_aliases = {}
+
+    async def run():
+        out = list(remote.execute("slow", "a"))
+        await asyncio.sleep(0)
+        return out, list(await remote.execute_async("slow", "b"))
+
+    refused, awaited = asyncio.run(run())
+    assert refused == ["[ERROR] RuntimeError: /slow is asynchronous, run it with execute_async"]
+    assert awaited == ["done"]
+    assert ran == ["b"]
+
+    # Off the loop there is nothing else to wait for, so it runs to completion.
+    assert remote.execute("slow", "c") == ["done"]
+    assert ran == ["b", "c"]
+
+
 def test_remote_client_excluded_from_player_list(make_area, monkeypatch):
     """System executor must not appear in player-list broadcasts (/gm crash)."""
     import json as json_module
@@ -988,6 +1022,8 @@ def _server_with_client_manager():
         config={
             "playerlimit": 64,
             "hostname": "test",
+            "motd": "",
+            "timeout": 250,
             "music_change_floodguard": {"interval_length": 1, "times_per_interval": 1},
             "ooc_floodguard": {"interval_length": 1, "times_per_interval": 1},
             "wtce_floodguard": {"interval_length": 1, "times_per_interval": 1},
@@ -998,6 +1034,7 @@ def _server_with_client_manager():
             notify_area_id_changed=lambda *a, **k: None,
         ),
     )
+    server.settings = Settings.from_config(server.config)
     server.client_manager = ClientManager(server)
     return server
 
@@ -1894,6 +1931,44 @@ def test_evaluate_expression_arithmetic():
         evaluate_expression("2 + __import__('os')", {})
 
 
+def test_compiled_expressions_match_substitution():
+    """The compiled fast path must give the same results and errors as
+    substituting the operands as text."""
+    from server.scripting import _substitute_and_evaluate, evaluate_expression, ScriptingError
+
+    cases = [
+        ("7/2", {}),
+        ("7//2", {}),
+        ("-x*2", {"x": -3}),
+        ("2--x", {"x": -5}),
+        ("x/y", {"x": 1, "y": 3}),
+        ("x+0.5", {"x": 0.25}),
+        ("2x", {"x": 3}),
+        ("x+1", {"x": "3+4"}),
+        ("x+1", {"x": "abc"}),
+        ("x+1", {"x": 10**7}),
+        ("x+1", {"x": 1e-7}),
+        ("x+1", {"x": True}),
+        ("1e5", {}),
+        ("1000001+1", {}),
+        ("x/0", {"x": 2}),
+        ("x%2", {"x": 2}),
+    ]
+    for expr, variables in cases:
+        try:
+            expected = ("ok", _substitute_and_evaluate(expr, variables, {}))
+        except ScriptingError as ex:
+            expected = (type(ex), str(ex))
+        for _ in range(2):  # second run hits the compiled cache
+            try:
+                got = ("ok", evaluate_expression(expr, variables))
+            except ScriptingError as ex:
+                got = (type(ex), str(ex))
+            assert got == expected, expr
+            if got[0] == "ok":
+                assert type(got[1]) is type(expected[1]), expr
+
+
 def test_resolve_value():
     from server.scripting import resolve_value, ScriptingError
 
@@ -2497,7 +2572,8 @@ def test_script_runner_save_char_data(fake_loop):
 
     assert area.area_manager.character_data["Phoenix"]["title"] == "Attorney"
     assert area.area_manager.character_data["Phoenix"]["points"] == 5
-    assert area.area_manager.saved_paths == [None, None]
+    # Saved keys are journaled one at a time, not by dumping the whole file
+    assert area.area_manager.saved_paths == []
     assert area.sent[-1] == ("CT", "narrator", "Attorney")
 
     fake_loop.pop_next()  # queue exhausted
@@ -2526,7 +2602,7 @@ def test_ooc_get_set_char_data():
 
     ooc_cmd_set_char_data(client, "0 title Attorney")
     assert area.area_manager.character_data["Phoenix"]["title"] == "Attorney"
-    assert area.area_manager.saved_paths == [None]
+    assert area.area_manager.saved_paths == []
 
     ooc_cmd_get_char_data(client, "phoenix title")
     assert any("title = Attorney" in m for m in out)
@@ -2537,7 +2613,7 @@ def test_ooc_get_set_char_data():
 
     ooc_cmd_set_char_data(client, "phoenix title")
     assert "title" not in area.area_manager.character_data["Phoenix"]
-    assert len(area.area_manager.saved_paths) == 2
+    assert area.area_manager.saved_paths == []
 
 
 def test_ooc_set_char_data_unknown_char():
@@ -2644,7 +2720,7 @@ def test_gm_allowed_in_normal_unoccupied_hub(monkeypatch):
 
     added = []
     monkeypatch.setattr(manager, "add_owner", lambda c: added.append(c))
-    monkeypatch.setattr(database, "log_area", lambda *a, **k: None)
+    monkeypatch.setattr(database.Database, "log_area", lambda *a, **k: None)
 
     area = _gm_claim_hub(manager)
     client = _gm_claim_client(area)
@@ -2666,7 +2742,7 @@ def test_gm_mod_still_allowed_in_remote_gm_only_hub(monkeypatch):
 
     added = []
     monkeypatch.setattr(manager, "add_owner", lambda c: added.append(c))
-    monkeypatch.setattr(database, "log_area", lambda *a, **k: None)
+    monkeypatch.setattr(database.Database, "log_area", lambda *a, **k: None)
 
     area = _gm_claim_hub(manager)
     client = _gm_claim_client(area, is_mod=True)
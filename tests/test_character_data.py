@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+import oyaml as yaml
+import pytest
+
+from server import database
+from server.area_manager import AreaManager
+from server.database import Database
+from server.hub_manager import HubManager
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "db.sqlite3"))
+    db = Database()
+    monkeypatch.setattr(database, "_database_singleton", db)
+    return db
+
+
+def _hub():
+    hub_manager = SimpleNamespace(server=SimpleNamespace(char_list=["Phoenix", "Maya"]), hubs=[])
+    hub = AreaManager(hub_manager, "Hub 0")
+    hub_manager.hubs.append(hub)
+    return hub
+
+
+def test_values_round_trip_per_key(db):
+    db.set_character_value(0, "Phoenix", "keys", [1, 2])
+    db.set_character_value(0, "Phoenix", "desc", "A lawyer")
+    db.set_character_value(0, "Phoenix", "keys", [3])
+    db.set_character_value(1, "Maya", "latest_area", 4)
+    db.delete_character_value(0, "Phoenix", "desc")
+    assert db.character_data(0) == {"Phoenix": {"keys": [3]}}
+    assert db.character_data(1) == {"Maya": {"latest_area": 4}}
+
+    db.replace_character_data(0, {"Maya": {"inventory": ["badge"]}})
+    db.flush()
+    assert Database().character_data(0) == {"Maya": {"inventory": ["badge"]}}
+
+
+def test_hub_journals_changes_once_restored(db):
+    hub = _hub()
+    hub.set_character_data(0, "keys", [1])
+    # Not journaled until the server switches it on
+    assert db.character_data(0) == {}
+
+    hub.restore_character_data()
+    assert db.character_data(0) == {"Phoenix": {"keys": [1]}}
+    hub.set_character_data(1, "desc", "Spirit medium")
+    assert hub.remove_character_data("Phoenix", "keys")
+    assert not hub.remove_character_data("Phoenix", "keys")
+
+    restarted = _hub()
+    restarted.restore_character_data()
+    assert restarted.character_data == {"Maya": {"desc": "Spirit medium"}}
+
+
+def test_yaml_import_replaces_and_export_matches(db, tmp_path):
+    hub = _hub()
+    hub.restore_character_data()
+    hub.set_character_data("Phoenix", "keys", [1])
+    path = tmp_path / "chars.yaml"
+    path.write_text(yaml.dump({1: {"keys": [2, 3]}}))
+
+    hub.load_character_data(str(path))
+    # The old numeric IDs are converted to folder names
+    assert hub.character_data == {"Maya": {"keys": [2, 3]}}
+    assert db.character_data(0) == {"Maya": {"keys": [2, 3]}}
+
+    out = tmp_path / "out.yaml"
+    assert hub.export_character_data(str(out)) is None
+    assert yaml.safe_load(out.read_text()) == {"Maya": {"keys": [2, 3]}}
+
+
+def test_removed_hubs_leave_no_data_for_their_successors(db, monkeypatch):
+    monkeypatch.setattr(HubManager, "load", lambda self: None)
+    manager = HubManager(SimpleNamespace(char_list=["Phoenix", "Maya"]))
+    manager.load_hubs([{"hub": "Main"}, {"hub": "Side"}])
+    db.set_character_value(5, "Maya", "keys", [9])
+    manager.restore_character_data()
+    # Rows of hubs areas.yaml no longer has are dropped on startup
+    assert db.character_data(5) == {}
+
+    manager.hubs[1].set_character_data("Phoenix", "keys", [1])
+    manager.load_hubs([{"hub": "Main"}])
+    manager.load_hubs([{"hub": "Main"}, {"hub": "New"}])
+    assert manager.hubs[1].character_data == {}
+    assert db.character_data(1) == {}
@@ -0,0 +1,75 @@
+import time
+from types import SimpleNamespace
+
+from server.client_manager import ClientManager
+
+
+def _manager(limit=4096):
+    server = SimpleNamespace(config={"playerlimit": 4, "spam_delay_limit": limit})
+    return ClientManager(server)
+
+
+def _now_ms():
+    return round(time.time() * 1000.0)
+
+
+def test_spam_delay_roundtrip_and_missing_is_zero():
+    manager = _manager()
+    expiry = _now_ms() + 30000
+    manager.set_spam_delay(1, "mod_call", expiry)
+    assert manager.get_spam_delay(1, "mod_call") == expiry
+    assert manager.get_spam_delay(1, "sfx") == 0
+    assert manager.get_spam_delay(2, "mod_call") == 0
+
+
+def test_expired_spam_delays_are_pruned():
+    manager = _manager()
+    manager.set_spam_delay(1, "mod_call", _now_ms() - 1000)
+    manager.set_spam_delay(2, "mod_call", _now_ms() + 30000)
+    assert "1" not in manager.delays
+    assert manager.get_spam_delay(1, "mod_call") == 0
+    assert "2" in manager.delays
+
+
+def test_spam_delay_store_is_capped_lru():
+    manager = _manager(limit=2)
+    expiry = _now_ms() + 30000
+    manager.set_spam_delay(1, "mod_call", expiry)
+    manager.set_spam_delay(2, "mod_call", expiry)
+    # Touching 1 again makes 2 the least recently set entry.
+    manager.set_spam_delay(1, "sfx", expiry)
+    manager.set_spam_delay(3, "mod_call", expiry)
+    assert list(manager.delays) == ["1", "3"]
+
+
+def test_multiclient_limit_uses_connection_counter():
+    manager = _manager()
+    manager.server.config["multiclient_limit"] = 2
+    client = SimpleNamespace(ipid=7)
+    manager.connections[7] = 2
+    assert manager.new_client_preauth(client) is True
+    manager.connections[7] = 3
+    assert manager.new_client_preauth(client) is False
+
+
+def test_following_keeps_followers_in_sync():
+    server = SimpleNamespace(
+        config={
+            "music_change_floodguard": {"interval_length": 1, "times_per_interval": 1},
+            "ooc_floodguard": {"interval_length": 1, "times_per_interval": 1},
+            "wtce_floodguard": {"interval_length": 1, "times_per_interval": 1},
+        },
+        hub_manager=SimpleNamespace(
+            default_hub=lambda: SimpleNamespace(default_area=lambda: None)
+        ),
+    )
+    leader = ClientManager.Client(server, None, 0, 1)
+    other = ClientManager.Client(server, None, 1, 1)
+    follower = ClientManager.Client(server, None, 2, 2)
+    follower.following = leader
+    assert leader.followers == {follower}
+    follower.following = other
+    assert leader.followers == set()
+    assert other.followers == {follower}
+    follower.following = None
+    assert other.followers == set()
@@ -0,0 +1,107 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from server import commands
+from server.commands import command
+from server.exceptions import ArgumentError
+
+
+class _Bridge:
+    def __init__(self):
+        self.runs = 0
+
+    def on_command_run(self, client):
+        self.runs += 1
+
+
+def _client():
+    out = []
+    server = SimpleNamespace(command_aliases={}, gm_panel_bridge=_Bridge())
+    return SimpleNamespace(server=server, send_ooc=out.append, output=out)
+
+
+def _spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+@command(budget_ms=5)
+def ooc_cmd_slow_listing(client):
+    """
+    Usage: /slow_listing
+    """
+    for i in range(5):
+        _spin(0.004)
+        yield f"page {i}"
+
+
+@command()
+def ooc_cmd_broken_listing(client):
+    """
+    Usage: /broken_listing
+    """
+    yield "first"
+    _spin(0.01)
+    yield
+    raise ArgumentError("gave up")
+
+
+@pytest.fixture(autouse=True)
+def _register(monkeypatch):
+    monkeypatch.setattr(commands, "ooc_cmd_slow_listing", ooc_cmd_slow_listing, raising=False)
+    monkeypatch.setattr(commands, "ooc_cmd_broken_listing", ooc_cmd_broken_listing, raising=False)
+
+
+def test_generator_command_runs_inline_without_a_loop():
+    client = _client()
+    assert commands.call(client, "slow_listing", "") is None
+    assert client.output == [f"page {i}" for i in range(5)]
+    assert client.server.gm_panel_bridge.runs == 1
+
+
+def test_generator_command_yields_the_loop_between_slices():
+    client = _client()
+    ticks = []
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        pending = commands.call(client, "slow_listing", "")
+        # The first slice ran inline and stopped once its budget was spent
+        assert 0 < len(client.output) < 5
+        loop.call_soon(ticks.append, len(client.output))
+        await pending
+
+    asyncio.run(run())
+    assert client.output == [f"page {i}" for i in range(5)]
+    # Other callbacks got to run before the command was done
+    assert ticks and ticks[0] < 5
+    assert client.server.gm_panel_bridge.runs == 1
+
+
+def test_unsliced_call_finishes_before_returning():
+    client = _client()
+
+    async def run():
+        return commands.call(client, "slow_listing", "", sliced=False)
+
+    assert asyncio.run(run()) is None
+    assert len(client.output) == 5
+
+
+def test_late_errors_surface_on_the_awaitable_and_pages_go_to_send():
+    client = _client()
+    pages = []
+
+    async def run():
+        pending = commands.call(client, "broken_listing", "", send=pages.append)
+        with pytest.raises(ArgumentError, match="gave up"):
+            await pending
+
+    asyncio.run(run())
+    assert pages == ["first"]
+    assert client.output == []
+    assert client.server.gm_panel_bridge.runs == 1
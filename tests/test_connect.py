@@ -1,6 +1,6 @@
 import asyncio
 
-from tests.mock.mocks import MockServer, make_protocol_factory
+from tests.mock.mocks import MockClient, MockServer, make_protocol_factory
 
 
 def test_client_can_connect_and_receive_handshake():
@@ -32,3 +32,36 @@ def test_client_can_connect_and_receive_handshake():
             await srv.wait_closed()
 
     asyncio.run(_run())
+
+
+def test_connection_rate_limit_refuses_before_creating_a_client():
+    from server.network.admission import Admission
+
+    async def _run():
+        mock_server = MockServer(timeout=1)
+        mock_server.admission = Admission(connections={"rate": 0.001, "burst": 1})
+        created = []
+        mock_server.new_client = lambda transport: created.append(transport) or MockClient(transport)
+
+        loop = asyncio.get_running_loop()
+        srv = await loop.create_server(make_protocol_factory(mock_server), "127.0.0.1", 0)
+
+        try:
+            host, port = srv.sockets[0].getsockname()[:2]
+            reader, writer = await asyncio.open_connection(host, port)
+            data = await asyncio.wait_for(reader.readuntil(b"#%"), timeout=1.0)
+            assert data.startswith(b"decryptor#NOENCRYPT")
+
+            # The second connection from this IP is over the limit and is just closed
+            reader2, writer2 = await asyncio.open_connection(host, port)
+            assert await asyncio.wait_for(reader2.read(), timeout=1.0) == b""
+            assert len(created) == 1
+
+            for w in (writer, writer2):
+                w.close()
+                await w.wait_closed()
+        finally:
+            srv.close()
+            await srv.wait_closed()
+
+    asyncio.run(_run())
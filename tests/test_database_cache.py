@@ -0,0 +1,101 @@
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from server import database
+from server.database import Database
+from server.exceptions import ServerError
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "db.sqlite3"))
+    return Database()
+
+
+def _rows(db, query, *params):
+    return [tuple(row) for row in db.db.execute(query, params).fetchall()]
+
+
+def test_ipids_are_assigned_in_memory_and_written_behind(db):
+    first = db.ipid("10.0.0.1")
+    assert db.ipid("10.0.0.1") == first
+    second = db.ipid("10.0.0.2")
+    assert second == first + 1
+    db.add_hdid(first, "hdid-a")
+    db.log_connect(SimpleNamespace(ipid=first, hdid="hdid-a"))
+    db.flush()
+    assert _rows(db, "SELECT ipid, ip_address FROM ipids ORDER BY ipid") == [
+        (first, "10.0.0.1"), (second, "10.0.0.2"),
+    ]
+    assert _rows(db, "SELECT hdid, ipid FROM hdids") == [("hdid-a", first)]
+    assert _rows(db, "SELECT ipid, hdid FROM connect_events") == [(first, "hdid-a")]
+    # A reopened database picks up where this one left off
+    assert Database().ipid("10.0.0.3") == second + 1
+
+
+def test_bans_are_cached_and_kept_current(db):
+    mod = SimpleNamespace(name="Mod", ipid=db.ipid("10.0.0.9"))
+    target = db.ipid("10.0.0.1")
+    # The target's IPID row may still be queued; banning must not trip the foreign key
+    ban_id = db.ban(target, "spam", banned_by=mod)
+    db.ban("hdid-x", "spam", ban_type="hdid", ban_id=ban_id)
+
+    ban = db.find_ban(target, "other")
+    assert ban.ban_id == ban_id and ban.reason == "spam"
+    assert db.find_ban(None, "hdid-x").ban_id == ban_id
+    assert db.find_ban(ban_id=ban_id).ban_id == ban_id
+    assert db.find_ban(db.ipid("10.0.0.2"), "hdid-y") is None
+    # What a fresh start would load matches
+    db.flush()
+    assert Database().find_ban(target).reason == "spam"
+
+    assert db.unban(ban_id)
+    assert db.find_ban(target, "hdid-x") is None
+    db.flush()
+    assert Database().find_ban(target, "hdid-x") is None
+
+
+def test_writes_from_the_loop_never_wait_for_the_write_lock(db):
+    mod = SimpleNamespace(name="Mod", ipid=db.ipid("10.0.0.9"))
+    target = db.ipid("10.0.0.1")
+    db.flush()
+    # Another writer holds the lock for longer than the busy timeout
+    blocker = sqlite3.connect(database.DB_FILE)
+    blocker.execute("BEGIN IMMEDIATE")
+    started = time.perf_counter()
+    ban_id = db.ban(target, "spam", banned_by=mod)
+    db.log_misc("ban", mod, data={"reason": "spam"})
+    kept = db.ban(db.ipid("10.0.0.2"), "flood", banned_by=mod)
+    assert db.unban(ban_id)
+    assert not db.unban(ban_id)
+    assert time.perf_counter() - started < 1
+    assert [ban.ban_id for ban in db.recent_bans()] == [ban_id + 1] == [kept]
+    blocker.rollback()
+    blocker.close()
+
+    db.flush()
+    assert _rows(db, "SELECT ban_id, reason FROM bans") == [(kept, "flood")]
+    assert _rows(db, """
+        SELECT ipid, type_name, event_data FROM misc_events
+        JOIN misc_event_types ON type_id = event_subtype
+    """) == [(mod.ipid, "ban", '{"reason": "spam"}')]
+    assert [ban.ban_id for ban in Database().recent_bans()] == [kept]
+
+
+def test_bans_are_checked_against_the_cache(db, monkeypatch):
+    monkeypatch.setattr(database, "_database_singleton", db)
+    mod = SimpleNamespace(name="Mod", ipid=db.ipid("10.0.0.9"))
+    target = db.ipid("10.0.0.1")
+    with pytest.raises(ServerError):
+        db.ban(target + 100, "spam", banned_by=mod)
+    with pytest.raises(ServerError):
+        db.ban(target, "spam", ban_id=42)
+    ban_id = db.ban(target, "spam", banned_by=mod)
+    with pytest.raises(ServerError):
+        db.ban(target, "again", banned_by=mod)
+    db.ban("hdid-x", "spam", ban_type="hdid", ban_id=ban_id)
+    ban = db.find_ban(ban_id=ban_id)
+    assert (ban.ipids, ban.hdids) == ([target], ["hdid-x"])
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+from server import emotes
+from server.emotes import Emotes, compile_iniswaps
+from server.tsuserver import TsuServer3
+
+CHAR_INI = """[Options]
+name = Phoenix
+
+[Emotions]
+number = 2
+1 = Normal#-#Normal#0
+2 = Point#PointPre#Point#1
+"""
+
+
+def _emotes(tmp_path, monkeypatch):
+    folder = tmp_path / "Phoenix"
+    folder.mkdir()
+    (folder / "char.ini").write_text(CHAR_INI, encoding="utf-8")
+    monkeypatch.setattr(emotes, "char_dir", str(tmp_path))
+    return Emotes("Phoenix")
+
+
+def test_validate_uses_normalized_keys(tmp_path, monkeypatch):
+    phoenix = _emotes(tmp_path, monkeypatch)
+    assert phoenix.validate("pointpre", "point", "")
+    assert phoenix.validate("PointPre", "../Point", "")
+    assert phoenix.validate("-", "Normal")
+    assert phoenix.validate("", "point")
+    assert phoenix.validate("pointpre", "")
+    assert not phoenix.validate("pointpre", "normal")
+    assert not phoenix.validate("", "sweat")
+    assert Emotes("Missing").validate("anything", "goes")
+
+
+def test_compile_iniswaps_links_every_member():
+    allowed = compile_iniswaps([["Phoenix", "Phoenix_HD"], ["Edgeworth", "Edgeworth_HD", "Miles"]])
+    assert allowed["Miles"] == frozenset({"Edgeworth", "Edgeworth_HD", "Miles"})
+    assert "Phoenix_HD" in allowed["Phoenix"]
+    assert "Miles" not in allowed["Phoenix"]
+    assert compile_iniswaps(None) == {}
+
+
+def test_emote_blocked_is_memoized(tmp_path, monkeypatch):
+    server = SimpleNamespace(
+        iniswap_map=compile_iniswaps([["Phoenix", "Phoenix_HD"]]),
+        char_emotes={"Phoenix": _emotes(tmp_path, monkeypatch)},
+        emote_verdicts={},
+    )
+
+    def blocked(*args):
+        return TsuServer3.emote_blocked(server, *args)
+
+    assert not blocked("Phoenix", "Phoenix_HD", "", "normal")
+    assert blocked("Phoenix", "Edgeworth", "", "normal")
+    assert not blocked("Edgeworth", "Edgeworth", "", "../misc/blank")
+    assert not blocked("Phoenix", "phoenix", "pointpre", "point")
+    assert blocked("Phoenix", "Phoenix", "sweat", "sweat")
+    assert len(server.emote_verdicts) == 5
+    server.char_emotes["Phoenix"].emotes.add(("sweat", "sweat"))
+    # Cached until the server reloads characters
+    assert blocked("Phoenix", "Phoenix", "sweat", "sweat")
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+from server.client_manager import ClientManager
+from server.evidence import EvidenceList
+
+
+class FakeTransport:
+    def __init__(self):
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data.decode("utf-8"))
+
+
+def _client(area, pos="def", is_mod=False):
+    server = SimpleNamespace(
+        config={
+            "hostname": "Server",
+            "music_change_floodguard": {"interval_length": 1, "times_per_interval": 1},
+            "ooc_floodguard": {"interval_length": 1, "times_per_interval": 1},
+            "wtce_floodguard": {"interval_length": 1, "times_per_interval": 1},
+        },
+        hub_manager=SimpleNamespace(
+            default_hub=lambda: SimpleNamespace(default_area=lambda: area)
+        ),
+    )
+    client = ClientManager.Client(server, FakeTransport(), 0, 1)
+    client.pos = pos
+    client.is_mod = is_mod
+    return client
+
+
+def _area(evidence_mod="FFA", dark=False):
+    area = SimpleNamespace(
+        owners=set(), clients=set(), evidence_mod=evidence_mod, dark=dark,
+        id=0, name="Area", send_owner_command=lambda *args: None,
+    )
+    area.evi_list = EvidenceList()
+    area.evi_list.import_evidence([
+        {"name": "Knife #1", "desc": "50% & sharp", "image": "knife.png", "pos": "def"},
+        {"name": "Map", "desc": "Of the $ mansion", "image": "map.png", "pos": "all"},
+        {"name": "Note", "desc": "Dark only", "image": "", "pos": "all", "show_in_dark": 2},
+    ])
+    return area
+
+
+def test_rendered_packet_matches_send_command():
+    area = _area()
+    for client in (_client(area), _client(area, pos="pro"), _client(area, is_mod=True)):
+        mapping, evi_list, packet = area.evi_list.render(client)
+        client.send_command("LE", area.evi_list.area_header, *evi_list)
+        assert client.transport.written[-1] == packet.decode("utf-8")
+    assert area.evi_list.render(_client(area))[0] == (0, 0, 1, 2)
+    assert area.evi_list.render(_client(area, pos="pro"))[0] == (0, 0, 2)
+
+
+def test_rendering_is_shared_per_viewer_class_until_bumped():
+    area = _area(evidence_mod="HiddenCM")
+    first = area.evi_list.render(_client(area))
+    assert area.evi_list.render(_client(area)) is first
+    assert area.evi_list.render(_client(area, pos="wit")) is not first
+    owner = area.evi_list.render(_client(area, is_mod=True))
+    assert owner[1][0][1].startswith("<owner=def>\n")
+    area.dark = True
+    assert area.evi_list.render(_client(area))[0] == (0, 0, 3)
+    area.evi_list.evidence_swap(_client(area, is_mod=True), 0, 1)
+    assert area.evi_list.version == 2
+    assert area.evi_list.render(_client(area)) is not first
@@ -0,0 +1,88 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from server.web_view.gm_panel.fanout import Frame, SocketSender
+from server.web_view.gm_panel.sessions import GMSessionManager
+
+
+class FakeWS:
+    def __init__(self):
+        self.closed = False
+        self.sent = []
+
+    async def send_str(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self):
+        self.closed = True
+
+
+def _moved(client_id, from_area, to_area):
+    return Frame("client_moved", {
+        "client_id": client_id,
+        "from_area_id": from_area,
+        "to_area_id": to_area,
+        "from_hub_id": 0,
+        "to_hub_id": 0,
+    })
+
+
+def _run(sender):
+    async def main():
+        sender.start()
+        sender.close()
+        await sender._task
+    asyncio.run(main())
+
+
+def test_pending_moves_coalesce_per_client():
+    ws = FakeWS()
+    sender = SocketSender(ws)
+    sender.enqueue(_moved(1, 0, 1))
+    sender.enqueue(Frame("areas_changed", {"hub_id": 0}))
+    sender.enqueue(_moved(2, 0, 3))
+    sender.enqueue(_moved(1, 1, 2))
+    _run(sender)
+    assert [f["type"] for f in ws.sent] == ["areas_changed", "client_moved", "client_moved"]
+    assert ws.sent[1]["data"]["client_id"] == 2
+    # The merged move still starts where the unsent one did
+    assert ws.sent[2]["data"]["from_area_id"] == 0
+    assert ws.sent[2]["data"]["to_area_id"] == 2
+    assert ws.closed
+
+
+def test_queues_drop_oldest_when_full():
+    ws = FakeWS()
+    sender = SocketSender(ws, limit=2, monitor_limit=2)
+    for i in range(4):
+        sender.enqueue(Frame("monitor_ooc", {"n": i}))
+        sender.enqueue(Frame("areas_changed", {"hub_id": i}))
+    assert sender.dropped == 4
+    _run(sender)
+    assert [f["data"].get("hub_id", f["data"].get("n")) for f in ws.sent] == [2, 3, 2, 3]
+    assert [f["type"] for f in ws.sent[2:]] == ["monitor_ooc", "monitor_ooc"]
+
+
+class FakeSession:
+    def __init__(self, client):
+        self.bound_client = client
+
+    def current_hub(self):
+        return self.bound_client.area.area_manager
+
+
+def test_sessions_are_indexed_by_hub():
+    hub_a, hub_b = object(), object()
+    client = SimpleNamespace(area=SimpleNamespace(area_manager=hub_a))
+    session = FakeSession(client)
+    manager = GMSessionManager(SimpleNamespace(), {})
+    manager._register("token", session)
+    assert manager.sessions_in_hubs({hub_a}) == [session]
+    assert manager.sessions_in_hubs({hub_b}) == []
+    client.area = SimpleNamespace(area_manager=hub_b)
+    manager.reindex_client(client)
+    assert manager.sessions_in_hubs({hub_a}) == []
+    assert manager.sessions_in_hubs({hub_b}) == [session]
+    manager.remove_session(session)
+    assert manager.sessions_in_hubs({hub_b}) == []
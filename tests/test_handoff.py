@@ -0,0 +1,245 @@
+import asyncio
+import datetime
+import socket
+import threading
+from functools import partialmethod
+from types import SimpleNamespace
+
+import arrow
+import pytest
+import yaml
+
+from server import database, handoff
+from server.client_manager import ClientManager
+from server.database import Database
+from server.exceptions import ClientError, ServerError
+from server.hub_manager import HubManager
+from server.ip_ranges import IpRangeBans
+from server.network.aoprotocol import AOProtocol
+from server.playerstateobserver import PlayerStateObserver
+from server.timer import Timer
+from server.tsuserver import TsuServer3
+
+pytestmark = pytest.mark.skipif(not handoff.available(), reason="needs socket.send_fds")
+
+
+def test_running_timer_survives_snapshot_and_restore():
+    async def _run():
+        timer = Timer(0)
+        timer.set = True
+        timer.commands = ["/ooc done"]
+        timer.interval = 100
+        restored = Timer(0)
+        # A timer that was never set restores as unset.
+        assert Timer(0).snapshot()["seconds"] is None
+
+        timer.static = datetime.timedelta(seconds=90)
+        state = timer.snapshot()
+        assert state["seconds"] == 90
+        restored.restore(state)
+        assert restored.set and not restored.started
+        assert restored.static.total_seconds() == 90
+        assert restored.commands == ["/ooc done"] and restored.interval == 100
+
+        timer.started = True
+        timer.target = arrow.get().shift(seconds=30)
+        restored.restore(timer.snapshot())
+        assert restored.started
+        assert 28 < restored.static.total_seconds() <= 30
+        assert restored.schedule is not None
+        restored.schedule.cancel()
+
+    asyncio.run(_run())
+
+
+def test_state_and_sockets_cross_the_unix_socket(tmp_path):
+    path = str(tmp_path / "handoff.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(1)
+    old_end, new_end = socket.socketpair()
+    state = {"hubs": [], "clients": [{"id": 3, "buffer": "CT#a"}]}
+
+    def _send():
+        conn, _ = listener.accept()
+        with conn:
+            handoff.send_state(conn, state, [listener.fileno()], [new_end.fileno()])
+            assert conn.recv(2) == b"OK"
+
+    sender = threading.Thread(target=_send)
+    sender.start()
+    receiver = handoff.Receiver(path)
+    received, listeners, clients = receiver.receive()
+    receiver.confirm()
+    sender.join()
+    asyncio.run(receiver.wait_for_exit())
+
+    assert received["clients"] == state["clients"]
+    assert len(listeners) == 1 and len(clients) == 1
+    # The received socket is the same connection, not a copy of its data.
+    old_end.sendall(b"ping")
+    assert clients[0].recv(4) == b"ping"
+    for sock in listeners + clients + [listener, old_end, new_end]:
+        sock.close()
+
+
+def test_restore_client_keeps_its_player_id():
+    server = SimpleNamespace(config={"playerlimit": 4, "spam_delay_limit": 10})
+    manager = ClientManager(server)
+
+    class FakeClient:
+        def __init__(self, server, transport, user_id, ipid):
+            self.id = user_id
+
+    manager.Client = FakeClient
+    transport = SimpleNamespace()
+    client = manager.restore_client(transport, 2, 5)
+    assert client.id == 2 and client in manager.clients
+    assert manager.connections[5] == 1
+    assert 2 not in manager.cur_id
+    assert manager.cur_id[0] == 0
+    with pytest.raises(ClientError):
+        manager.restore_client(transport, 2, 5)
+
+
+class _Server(TsuServer3):
+    """The parts of a server a handoff touches, loaded from config_sample."""
+
+    def __init__(self):
+        with open("config_sample/config.yaml", encoding="utf-8") as f:
+            self.config, self.settings = TsuServer3.parse_config(yaml.safe_load(f))
+        self.char_list = ["Phoenix", "Maya"]
+        self.music_list = []
+        self.backgrounds = ["gs4"]
+        self.backgrounds_categories = {}
+        self.command_aliases = {}
+        with open("config_sample/censors.yaml", encoding="utf-8") as f:
+            self.censors = yaml.safe_load(f)
+        self.packet_trace = None
+        self.admission = None
+        self.gm_panel_bridge = None
+        self.ipRange_bans = IpRangeBans()
+        self.asn_lookup = None
+        self.hub_manager = HubManager(self)
+        self.client_manager = ClientManager(self)
+        self.player_state_observer = PlayerStateObserver(self)
+
+
+@pytest.fixture
+def servers(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "db.sqlite3"))
+    monkeypatch.setattr(database, "_database_singleton", Database())
+    monkeypatch.setattr(HubManager, "load", partialmethod(HubManager.load, "config_sample/areas.yaml"))
+    return _Server(), _Server()
+
+
+async def _handover(old, new, path, ok=True):
+    """Hand `old`'s clients to `new` over the Unix socket `path`; `new` runs in a thread."""
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(1)
+    listener.setblocking(False)
+    taken = {}
+
+    def _take_over():
+        async def _run():
+            receiver = handoff.Receiver(path)
+            if ok:
+                taken["ao_server"], taken["clients"] = await handoff.take_over(new, receiver)
+            else:
+                receiver.receive()
+                receiver.confirm(ok=False)
+            await receiver.wait_for_exit()
+            if ok:
+                # The listening socket came along: new players reach this process
+                port = taken["ao_server"].sockets[0].getsockname()[1]
+                taken["newcomer"] = await asyncio.to_thread(socket.create_connection, ("127.0.0.1", port))
+                await asyncio.sleep(0.1)
+
+        asyncio.run(_run())
+
+    thread = threading.Thread(target=_take_over)
+    thread.start()
+    conn, _ = await asyncio.get_running_loop().sock_accept(listener)
+    listener.close()
+    try:
+        return await handoff.send_over(old, conn), taken
+    finally:
+        conn.close()
+        await asyncio.to_thread(thread.join)
+
+
+async def _connect(server):
+    loop = asyncio.get_running_loop()
+    server.ao_server = await loop.create_server(lambda: AOProtocol(server), "127.0.0.1", 0)
+    port = server.ao_server.sockets[0].getsockname()[1]
+    player = await asyncio.to_thread(socket.create_connection, ("127.0.0.1", port))
+    await asyncio.sleep(0.1)
+    (client,) = server.client_manager.clients
+    assert player.recv(1024) == b"decryptor#NOENCRYPT#%"
+    client.joined = True
+    client.char_id = 1
+    client.name = "Larry"
+    return player, client
+
+
+def _read(player):
+    """Everything the player is sent until the connection goes quiet."""
+    data = b""
+    player.settimeout(0.5)
+    try:
+        while True:
+            data += player.recv(65536)
+    except socket.timeout:
+        return data.decode("utf-8")
+
+
+def test_clients_move_to_the_new_process_on_their_sockets(servers, tmp_path):
+    old, new = servers
+
+    async def _run():
+        player, client = await _connect(old)
+        area = old.hub_manager.hubs[0].areas[2]
+        client.change_area(area)
+        _read(player)
+        area.timers[0].set = True
+        area.timers[0].static = datetime.timedelta(seconds=60)
+
+        count, taken = await _handover(old, new, str(tmp_path / "handoff.sock"))
+        assert count == 1
+        assert not old.ao_server.is_serving()
+        assert old.client_manager.clients == set()
+        # Nothing the old process does any more reaches the player
+        client.send_ooc("stale")
+
+        (adopted,) = taken["clients"]
+        assert adopted.id == client.id and adopted.name == "Larry"
+        assert adopted.area is new.hub_manager.hubs[0].areas[2]
+        assert adopted.area.timers[0].static.total_seconds() == 60
+        # The new process brought the player up to date on the same connection
+        data = _read(player)
+        assert f"PV#{client.id}#CID#1#%" in data
+        assert "stale" not in data
+        assert len(new.client_manager.clients) == 2
+        taken["newcomer"].close()
+        player.close()
+
+    asyncio.run(_run())
+
+
+def test_a_refused_handoff_leaves_the_old_process_serving(servers, tmp_path):
+    old, new = servers
+
+    async def _run():
+        player, client = await _connect(old)
+        with pytest.raises(ServerError):
+            await _handover(old, new, str(tmp_path / "handoff.sock"), ok=False)
+        assert old.ao_server.is_serving()
+        assert old.client_manager.clients == {client}
+        assert client.transport.get_extra_info("socket") is not None
+        assert f"PV#{client.id}#CID#1#%" in _read(player)
+        client.send_ooc("still here")
+        assert "still here" in _read(player)
+        player.close()
+
+    asyncio.run(_run())
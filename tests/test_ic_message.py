@@ -0,0 +1,50 @@
+import pytest
+
+from server.network.ic_message import LAYOUTS, SCHEMAS, decode_ms
+
+BASE = ["chat", "-", "Phoenix", "normal", "Hello", "def", "1", "0", "3", "0", "0", "0", "1", "0", "2"]
+AO28 = BASE + ["Nick", "5^1", "10&0", "0", "0", "1", "normal^", "normal^", "normal^", "0", "||"]
+
+
+def test_layouts_have_distinct_argument_counts():
+    assert sorted(SCHEMAS) == [15, 18, 19, 26, 27, 28]
+    assert len(SCHEMAS) == len(LAYOUTS)
+
+
+def test_pre26_fills_defaults_and_converts_ints():
+    ic = decode_ms(list(BASE))
+    assert (ic.cid, ic.flip, ic.color) == (3, 1, 2)
+    assert ic.button == "0"
+    assert (ic.showname, ic.charid_pair, ic.sfx_looping, ic.third_charid, ic.video) == ("", -1, "0", -1, "")
+
+
+def test_dro_and_26_layouts():
+    ic = decode_ms(BASE + ["Nick", "", "1"])
+    assert (ic.showname, ic.video, ic.blankpost) == ("Nick", "", 1)
+    ic = decode_ms(BASE + ["", "4", "-20", "1"])
+    assert (ic.charid_pair, ic.offset_pair, ic.nonint_pre) == (4, -20, 1)
+
+
+def test_ao28_splits_charid_pair():
+    ic = decode_ms(AO28)
+    assert (ic.charid_pair, ic.pair_order, ic.offset_pair) == (5, "1", "10&0")
+    ic = decode_ms(AO28 + ["7", "clip.webm"])
+    assert (ic.third_charid, ic.video, ic.pair_order) == (7, "clip.webm", "1")
+    args = list(AO28)
+    args[16] = "-1"
+    assert decode_ms(args).pair_order == 0
+    args[16] = "x^1"
+    with pytest.raises(ValueError):
+        decode_ms(args)
+
+
+@pytest.mark.parametrize("index, value", [(0, ""), (2, ""), (8, "three"), (8, ""), (10, "")])
+def test_rejects_bad_fields(index, value):
+    args = list(AO28)
+    args[index] = value
+    assert decode_ms(args) is None
+
+
+def test_rejects_unknown_argument_count():
+    assert decode_ms(BASE[:-1]) is None
+    assert decode_ms(AO28 + ["7", "", "extra"]) is None
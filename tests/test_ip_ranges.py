@@ -0,0 +1,71 @@
+import asyncio
+from types import SimpleNamespace
+
+from server.ip_ranges import AsnLookup, IpRangeBans
+
+
+RULES = [
+    "# line 0",
+    "23.129.64.",
+    "104.244.7",
+    "185.220.100.0/22",
+    "2001:db8:",
+    "2a0b:f4c0::/32",
+    "AS13335",
+    "",
+    "10.0.0.0/8",
+    "10.1.",
+]
+
+
+def test_cidr_and_legacy_prefixes_match_like_the_file_says():
+    bans = IpRangeBans(RULES)
+    assert bans.match_address("23.129.64.7") == 1
+    # Legacy prefixes only count on a separator, as before
+    assert bans.match_address("23.129.640.1") is None
+    assert bans.match_address("104.244.7.1") is None
+    assert bans.match_address("185.220.103.255") == 3
+    assert bans.match_address("185.220.104.0") is None
+    assert bans.match_address("2001:db8:0:1::5") == 4
+    assert bans.match_address("2a0b:f4c0:ffff::1") == 5
+    assert bans.match_address("::ffff:185.220.101.1") == 3
+    # Both rules match; the earlier line wins
+    assert bans.match_address("10.1.2.3") == 8
+    assert bans.match_address("192.0.2.1") is None
+    assert len(bans) == 7
+
+
+def test_asns_are_matched_by_number():
+    bans = IpRangeBans(RULES)
+    assert bans.match_asn("13335") == 6
+    assert bans.match_asn(13335) == 6
+    assert bans.match_asn("1333") is None
+    assert bans.match_asn(None) is None
+
+
+class _Reader:
+    def __init__(self):
+        self.calls = []
+
+    def asn(self, ip):
+        self.calls.append(ip)
+        return SimpleNamespace(autonomous_system_number=int(ip.rsplit(".", 1)[1]))
+
+
+def test_asn_lookups_run_off_loop_and_are_cached_lru():
+    reader = _Reader()
+    lookup = AsnLookup(reader, max_entries=2)
+
+    async def run():
+        first, second = lookup.lookup("192.0.2.1"), lookup.lookup("192.0.2.1")
+        assert first is second
+        assert await first == "1"
+        await lookup.lookup("192.0.2.2")
+        lookup.cached("192.0.2.1")
+        await lookup.lookup("192.0.2.3")
+
+    asyncio.run(run())
+    assert reader.calls == ["192.0.2.1", "192.0.2.2", "192.0.2.3"]
+    assert lookup.cached("192.0.2.1") == ("1", True)
+    # 192.0.2.2 was the least recently used entry
+    assert lookup.cached("192.0.2.2") == (None, False)
@@ -0,0 +1,123 @@
+import asyncio
+import collections
+import time
+
+import pytest
+
+from server import loop_profiler
+from server.exceptions import ServerError
+
+
+def _spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+async def _busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        _spin(0.01)
+        await asyncio.sleep(0)
+
+
+def test_sampler_sees_event_loop_work():
+    async def run():
+        busy = asyncio.ensure_future(_busy_loop(0.3))
+        result = await loop_profiler.run_profile({"duration": 0.3, "interval_ms": 2, "format": "collapsed"})
+        await busy
+        return result
+
+    result = asyncio.run(run())
+    assert result["samples"] > 0
+    assert "_spin (tests/test_loop_profiler.py:" in result["profile"]
+    stack, count = result["profile"].splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+
+def test_speedscope_output_indexes_shared_frames():
+    profile = loop_profiler.LoopProfile(
+        collections.Counter({
+            (("a.py", "main", 1), ("b.py", "work", 5)): 3,
+            (("a.py", "main", 1),): 1,
+        }),
+        interval=0.005,
+        duration=0.02,
+    )
+    data = profile.speedscope()
+    frames = data["shared"]["frames"]
+    assert [f["name"] for f in frames] == ["main", "work"]
+    sampled = data["profiles"][0]
+    assert sampled["samples"] == [[0, 1], [0]]
+    assert sampled["weights"] == [15.0, 5.0]
+    assert profile.collapsed() == "main (a.py:1);work (b.py:5) 3\nmain (a.py:1) 1\n"
+
+
+def test_slow_callback_trace_names_the_culprit():
+    def slow_callback():
+        _spin(0.05)
+
+    async def slow_task():
+        await asyncio.sleep(0.01)
+        _spin(0.05)
+        await asyncio.sleep(0)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.02, slow_callback)
+        task = asyncio.ensure_future(slow_task())
+        result = await loop_profiler.run_slow_callback_trace({"duration": 0.2, "threshold_ms": 30})
+        await task
+        return result
+
+    callbacks = asyncio.run(run())["callbacks"]
+    names = [cb["callback"] for cb in callbacks]
+    assert any("slow_callback" in name for name in names)
+    assert any("slow_task" in name for name in names)
+    assert all(cb["ms"] >= 30 for cb in callbacks)
+    # The patch is undone afterwards
+    assert asyncio.events.Handle._run.__qualname__ == "Handle._run"
+
+
+def test_only_one_profile_at_a_time():
+    async def run():
+        first = asyncio.ensure_future(loop_profiler.sample_loop(0.2))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ServerError):
+            await loop_profiler.trace_slow_callbacks(0.1)
+        await first
+        # Free again once the first finished
+        await loop_profiler.trace_slow_callbacks(0.1)
+
+    asyncio.run(run())
+
+
+def test_bad_format_is_rejected():
+    with pytest.raises(ValueError):
+        asyncio.run(loop_profiler.run_profile({"format": "pstats"}))
+
+
+class _Request:
+    def __init__(self, body):
+        self._body = body
+
+    async def json(self):
+        return self._body
+
+
+def test_respond_maps_errors_to_statuses():
+    async def busy(options):
+        raise ServerError("A profile is already running.")
+
+    async def run():
+        bad_format = await loop_profiler.respond(_Request({"format": "pstats"}), loop_profiler.run_profile)
+        not_options = await loop_profiler.respond(_Request([]), loop_profiler.run_profile)
+        running = await loop_profiler.respond(_Request({}), busy)
+        ok = await loop_profiler.respond(_Request({"duration": 0.1}), loop_profiler.run_slow_callback_trace)
+        return bad_format, not_options, running, ok
+
+    bad_format, not_options, running, ok = asyncio.run(run())
+    assert bad_format.status == 400
+    assert not_options.status == 400 and b"invalid_request" in not_options.body
+    assert running.status == 409
+    assert ok.status == 200 and b'"callbacks"' in ok.body
@@ -0,0 +1,45 @@
+import json
+
+from server.medieval_parser import MedievalParser
+
+
+def _parser(tmp_path, rules):
+    data = {
+        "prepended_words": {"Forsooth, ": 1},
+        "appended_words": {"m'lord": 1},
+        "word_replacements": rules,
+    }
+    path = tmp_path / "autorp.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return MedievalParser(str(path))
+
+
+def _rule(words, replacement, plurals=(), plural_replacement=(), prev=()):
+    return {
+        "word": list(words),
+        "word_plural": list(plurals),
+        "prev": list(prev),
+        "replacement": [replacement],
+        "replacement_plural": list(plural_replacement),
+    }
+
+
+def test_replacements_match_case_insensitively(tmp_path):
+    parser = _parser(tmp_path, [_rule(["Friend"], "companion", ["friends"], ["companions"])])
+    assert parser._replace_word("FRIEND", "") == ("companion", False)
+    assert parser._replace_word("Friends", "") == ("companions", False)
+    assert parser._replace_word("fiend", "", word_list_only=True) == (None, False)
+
+
+def test_prev_word_rules_and_rule_order(tmp_path):
+    parser = _parser(
+        tmp_path,
+        [
+            _rule(["is"], "'tis", prev=["it"]),
+            _rule(["is"], "be"),
+        ],
+    )
+    assert parser._replace_word("is", "It") == ("'tis", True)
+    # The first rule needs "it" before the word, so the next one applies
+    assert parser._replace_word("is", "this") == ("be", False)
+    assert parser._replace_word("is", "") == ("be", False)
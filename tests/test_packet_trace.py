@@ -0,0 +1,71 @@
+import os
+
+from server.packet_trace import INBOUND, OPEN, OUTBOUND, CLOSE, PacketTrace, read_trace, trace_files
+
+
+def test_records_round_trip_with_anonymized_ips(tmp_path):
+    path = str(tmp_path / "packets.trace")
+    trace = PacketTrace(path, salt="k")
+    alice, bob = object(), object()
+    trace.opened(alice, "203.0.113.7")
+    trace.opened(bob, "203.0.113.8")
+    trace.inbound(alice, "CT#me#my ip is 203.0.113.7#%")
+    trace.outbound(bob, "CT#Server#hi v1.2#%")
+    trace.closed(alice)
+    trace.inbound(alice, "dropped after close#%")
+    trace.close()
+
+    with open(path, encoding="utf-8") as f:
+        assert "203.0.113" not in f.read()
+    records = list(read_trace(path))
+    assert [(conn[1], kind) for _, conn, kind, _ in records] == [
+        (0, OPEN), (1, OPEN), (0, INBOUND), (1, OUTBOUND), (0, CLOSE),
+    ]
+    token = records[0][3]
+    assert token.startswith("ip-") and token != records[1][3]
+    assert records[2][3] == f"CT#me#my ip is {token}#%"
+    assert records[3][3] == "CT#Server#hi v1.2#%"
+
+
+def test_ipv6_addresses_are_scrubbed_too(tmp_path):
+    trace = PacketTrace(str(tmp_path / "packets.trace"), salt="k")
+    trace.opened(object(), "2001:db8::7")
+    token = trace.scrub("2001:db8::7")
+    assert token.startswith("ip-")
+    # Any spelling of the address maps to the peer's token
+    assert trace.scrub("CT#me#[2001:DB8:0::7]:27016, or 2001:db8:0:0:0:0:0:7.#%") == (
+        f"CT#me#[{token}]:27016, or {token}.#%"
+    )
+    mapped = trace.scrub("::ffff:203.0.113.7")
+    assert mapped.startswith("ip-") and "203" not in mapped
+    # Times, emoticons and other colon runs are left alone
+    assert trace.scrub("CT#me#at 12:30:45 :D :: a:b#%") == "CT#me#at 12:30:45 :D :: a:b#%"
+    trace.close()
+
+
+def test_rotation_keeps_every_record_in_order(tmp_path):
+    path = str(tmp_path / "packets.trace")
+    trace = PacketTrace(path, max_bytes=200, backup_count=50)
+    client = object()
+    trace.opened(client, "127.0.0.1")
+    for i in range(20):
+        trace.inbound(client, f"CH#{i}#%")
+    trace.close()
+    assert len(trace_files(path)) > 1
+    inbound = [data for _, _, kind, data in read_trace(path) if kind == INBOUND]
+    assert inbound == [f"CH#{i}#%" for i in range(20)]
+
+
+def test_restart_starts_a_new_file(tmp_path):
+    path = str(tmp_path / "packets.trace")
+    for run in range(2):
+        trace = PacketTrace(path)
+        client = object()
+        trace.opened(client, "127.0.0.1")
+        trace.inbound(client, f"run {run}")
+        trace.close()
+    assert os.path.exists(path + ".1")
+    records = [r for r in read_trace(path) if r[2] == INBOUND]
+    assert [data for _, _, _, data in records] == ["run 0", "run 1"]
+    # Both runs numbered their connection 0, but the keys stay distinct
+    assert records[0][1] != records[1][1]
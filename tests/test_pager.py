@@ -0,0 +1,112 @@
+from types import SimpleNamespace
+
+import pytest
+
+from server import commands, pager
+from server.commands import command
+from server.exceptions import ClientError
+from server.pager import Pager, line_pages
+
+
+def test_line_pages_pack_lines_up_to_the_limit():
+    lines = ["a" * 4, "b" * 4, None, "c" * 4, "d" * 4]
+    # Pause points pass straight through while a page is being filled
+    assert list(line_pages(lines, limit=10)) == [None, "aaaa\nbbbb", "cccc\ndddd"]
+    # A line longer than the limit still gets a page of its own
+    assert list(line_pages(["x" * 20, "y"], limit=10)) == ["x" * 20, "y"]
+    assert list(line_pages([])) == []
+
+
+def test_pager_renders_lazily_and_pages_back():
+    rendered = []
+
+    def source():
+        for i in range(10):
+            rendered.append(i)
+            yield None
+            yield f"page {i}"
+
+    listing = Pager("key", source())
+    first = listing.page(0)
+    assert first.startswith("page 0\n") and "/next" in first and "/prev" not in first
+    # Only one page ahead of the one sent is rendered
+    assert rendered == [0, 1]
+
+    assert listing.next().startswith("page 1\n")
+    assert listing.prev().startswith("page 0\n")
+    assert listing.prev() is None
+    for i in range(1, 10):
+        page = listing.next()
+    assert page.startswith("page 9\n") and "/next" not in page and "/prev" in page
+    assert listing.next() is None
+
+
+def test_single_page_listing_has_no_footer():
+    listing = Pager("key", iter(["only"]))
+    assert listing.page(0) == "only"
+
+
+def test_pager_is_reused_only_briefly_and_for_the_same_key():
+    now = [100.0]
+    listing = Pager("key", iter([]), clock=lambda: now[0])
+    assert listing.fresh("key")
+    assert not listing.fresh("other")
+    now[0] += pager.PAGE_CACHE_SECONDS
+    assert not listing.fresh("key")
+
+
+renders = []
+
+
+@command(paged=True)
+def ooc_cmd_long_listing(client):
+    """
+    Usage: /long_listing
+    """
+    renders.append(client)
+    yield from line_pages((f"line {i}" for i in range(3000)), limit=100)
+
+
+@pytest.fixture(autouse=True)
+def _register(monkeypatch):
+    monkeypatch.setattr(commands, "ooc_cmd_long_listing", ooc_cmd_long_listing, raising=False)
+    renders.clear()
+
+
+def _client():
+    out = []
+    hub = SimpleNamespace(id=0, owners=[])
+    area = SimpleNamespace(id=1, area_manager=hub)
+    server = SimpleNamespace(command_aliases={})
+    return SimpleNamespace(
+        server=server, area=area, is_mod=True, owned_areas=set(),
+        pager=None, send_ooc=out.append, output=out,
+    )
+
+
+def test_in_game_call_sends_one_page_and_next_continues():
+    client = _client()
+    assert commands.call(client, "long_listing", "", paged=True) is None
+    assert len(client.output) == 1
+    assert client.output[0].startswith("line 0\n")
+
+    commands.call(client, "next", "", paged=True)
+    last_line = client.output[0].split("\n")[-2]
+    first_line = client.output[1].split("\n")[0]
+    assert int(first_line.split()[1]) == int(last_line.split()[1]) + 1
+    commands.call(client, "prev", "", paged=True)
+    assert client.output[2] == client.output[0]
+    with pytest.raises(ClientError):
+        commands.call(client, "prev", "", paged=True)
+
+    # Running it again right away starts over from the rendered pages
+    commands.call(client, "long_listing", "", paged=True)
+    assert client.output[3] == client.output[0]
+    assert len(renders) == 1
+
+
+def test_unpaged_callers_get_the_whole_listing():
+    client = _client()
+    commands.call(client, "long_listing", "")
+    assert len(client.output) > 100
+    assert client.pager is None
@@ -0,0 +1,71 @@
+import dataclasses
+import os
+
+import pytest
+import yaml
+
+from server.exceptions import ServerError
+from server.settings import Settings
+from server.tsuserver import TsuServer3
+
+
+def _config(**options):
+    config = {"hostname": "$H", "motd": "Hi\\nthere", "playerlimit": 100, "timeout": 250, "modpass": "mod"}
+    config.update(options)
+    return config
+
+
+def test_sample_config_loads():
+    path = os.path.join(os.path.dirname(__file__), "..", "config_sample", "config.yaml")
+    with open(path, encoding="utf-8") as f:
+        config, settings = TsuServer3.parse_config(yaml.safe_load(f))
+    assert settings.hostname == config["hostname"]
+    assert settings.asset_url == ""
+    assert settings.music_change_floodguard.times_per_interval == 3
+    assert settings.bridgebot is None
+
+
+def test_defaults_are_resolved_once():
+    config, settings = TsuServer3.parse_config(_config())
+    assert config["modpass"] == {"default": {"password": "mod"}}
+    assert config["motd"] == "Hi \nthere"
+    assert (settings.packet_size, settings.max_chars, settings.max_chars_ic) == (1024, 256, 256)
+    assert settings.block_repeat and not settings.block_relative
+    assert settings.ooc_floodguard.interval_length == 0
+    assert settings.doorman_webhook is None
+
+
+def test_options_read_from_the_dict_are_converted_in_place():
+    config, settings = TsuServer3.parse_config(_config(
+        playerlimit="50",
+        ooc_floodguard={"times_per_interval": "3", "interval_length": "5"},
+    ))
+    assert config["playerlimit"] == 50
+    assert config["ooc_floodguard"] == {"times_per_interval": 3, "interval_length": 5.0, "mute_length": 0}
+    assert config["music_change_floodguard"]["mute_length"] == 0
+    assert settings.ooc_floodguard.interval_length == 5.0
+
+
+def test_values_are_converted_and_frozen():
+    settings = Settings.from_config(_config(
+        max_chars_ic="300",
+        doorman_webhook={"enabled": True, "hub_id": "1", "area_id": 2, "delay": 30},
+        bridgebot={"enabled": True, "hub_id": 0, "area_id": 3, "ooc_chat": True},
+    ))
+    assert settings.max_chars_ic == 300
+    assert settings.doorman_webhook.hub_id == 1
+    assert settings.bridgebot.ooc_chat and not settings.bridgebot.ooc_system
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        settings.hostname = "other"
+
+
+@pytest.mark.parametrize("options, message", [
+    ({"hostname": None}, "'hostname' is required"),
+    ({"max_chars_ic": "lots"}, "'max_chars_ic' must be a number"),
+    ({"block_repeat": "yes"}, "'block_repeat' must be true or false"),
+    ({"ooc_floodguard": 5}, "'ooc_floodguard' must be a section"),
+    ({"doorman_webhook": {"enabled": True, "area_id": 0}}, "'doorman_webhook.hub_id' is required"),
+])
+def test_invalid_configs_fail_at_load(options, message):
+    with pytest.raises(ServerError, match=message):
+        TsuServer3.parse_config(_config(**options))
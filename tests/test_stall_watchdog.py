@@ -0,0 +1,62 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from server import stall_watchdog
+from server.stall_watchdog import StallWatchdog
+
+
+def _freeze(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_markers_nest_and_describe_clients():
+    client = SimpleNamespace(id=3, name="Mod", area=SimpleNamespace(id=7, name="Lobby"))
+    stall_watchdog.enter("net_cmd_ct", client)
+    stall_watchdog.enter("ooc_cmd_getareas", client)
+    ops = stall_watchdog.current_ops()
+    stall_watchdog.leave()
+    stall_watchdog.leave()
+    assert stall_watchdog.current_ops() == []
+    assert [label for label, _ in ops] == ["net_cmd_ct", "ooc_cmd_getareas"]
+    assert stall_watchdog.describe_op(*ops[1]) == "ooc_cmd_getareas [3] Mod in area 7 'Lobby'"
+    assert stall_watchdog.describe_op("demo step", None) == "demo step"
+
+
+def test_stall_is_attributed_and_logged(monkeypatch):
+    logged = []
+    monkeypatch.setattr(
+        stall_watchdog.database, "log_misc",
+        lambda subtype, client=None, target=None, data=None: logged.append((subtype, client, data)),
+        raising=False,
+    )
+    client = SimpleNamespace(id=1, name="GM", area=SimpleNamespace(id=0, name="Basement"))
+
+    def ooc_cmd_slow():
+        stall_watchdog.enter("ooc_cmd_slow", client)
+        try:
+            _freeze(0.3)
+        finally:
+            stall_watchdog.leave()
+
+    async def run():
+        watchdog = StallWatchdog(threshold_ms=100, heartbeat_ms=20)
+        watchdog.start(asyncio.get_running_loop())
+        try:
+            await asyncio.sleep(0.1)
+            ooc_cmd_slow()
+            # Let the watchdog notice the recovery and hand the report back
+            await asyncio.sleep(0.2)
+        finally:
+            watchdog.stop()
+        return watchdog
+
+    watchdog = asyncio.run(run())
+    assert watchdog.stalls == 1
+    subtype, who, data = logged[0]
+    assert subtype == "loop_stall" and who is client
+    assert data["ms"] >= 200
+    assert data["ops"] == ["ooc_cmd_slow [1] GM in area 0 'Basement'"]
+    assert any("in _freeze" in line for line in data["stack"])
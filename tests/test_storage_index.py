@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from server.storage_index import StorageIndex
+
+
+@pytest.fixture(params=[True, False], ids=["inotify", "poll"])
+def index(request):
+    index = StorageIndex(use_inotify=request.param)
+    if request.param and not index.uses_inotify:
+        pytest.skip("inotify is not available here")
+    return index
+
+
+def _touch(path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("a: 1\n")
+
+
+def test_listing_follows_adds_and_removes(index, tmp_path):
+    base = str(tmp_path)
+    _touch(os.path.join(base, "one.yaml"))
+    _touch(os.path.join(base, "notes.txt"))
+    assert index.yaml_names(base) == ["one"]
+    assert index.count_files(base) == 2
+    _touch(os.path.join(base, "two.YAML"))
+    assert index.has_file(base, "two.YAML")
+    assert index.yaml_names(base) == ["one", "two"]
+    os.remove(os.path.join(base, "one.yaml"))
+    assert index.yaml_names(base) == ["two"]
+    assert not index.has_file(base, "one.yaml")
+
+
+def test_missing_directory_is_empty_until_created(index, tmp_path):
+    path = os.path.join(str(tmp_path), "later")
+    assert index.yaml_names(path) == []
+    os.mkdir(path)
+    _touch(os.path.join(path, "x.yaml"))
+    assert index.yaml_names(path) == ["x"]
+
+
+def test_walk_yaml_skips_read_only_and_caps_depth(index, tmp_path):
+    base = str(tmp_path)
+    deep = os.path.join(base, "a", "b", "c", "d")
+    os.makedirs(deep)
+    os.makedirs(os.path.join(base, "read_only"))
+    _touch(os.path.join(base, "top.yaml"))
+    _touch(os.path.join(base, "read_only", "hidden.yaml"))
+    _touch(os.path.join(base, "a", "b", "mid.yaml"))
+    _touch(os.path.join(base, "a", "b", "c", "low.yaml"))
+    _touch(os.path.join(deep, "too_deep.yaml"))
+    assert index.walk_yaml(base, 3, skip=("read_only",)) == [
+        "a/b/c/low", "a/b/mid", "top",
+    ]
+    _touch(os.path.join(base, "a", "new.yaml"))
+    assert "a/new" in index.walk_yaml(base, 3, skip=("read_only",))
+
+
+def test_unreadable_directories_are_skipped(index, tmp_path, monkeypatch):
+    base = tmp_path / "base"
+    (base / "locked").mkdir(parents=True)
+    _touch(str(base / "top.yaml"))
+    scandir = os.scandir
+
+    def _scandir(path):
+        if os.path.basename(path) == "locked":
+            raise PermissionError(13, "Permission denied", path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", _scandir)
+    assert index.walk_yaml(str(base), 2) == ["top"]
+    assert index.files(str(base / "locked")) == frozenset()
+
+
+def test_shared_index_is_created_on_first_use(monkeypatch, tmp_path):
+    from server import storage_index
+
+    monkeypatch.setattr(storage_index, "_storage_index_singleton", None)
+    _touch(str(tmp_path / "one.yaml"))
+    assert storage_index._storage_index_singleton is None
+    assert storage_index.yaml_names(str(tmp_path)) == ["one"]
+    assert isinstance(storage_index._storage_index_singleton, StorageIndex)